@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import OutgoingEmail
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'status',
+        'attempts',
+        'next_attempt_at',
+        'created',
+        'sent_at',
+    )
+    list_filter = ('status',)
+    readonly_fields = ('created', 'sent_at')
@@ -0,0 +1,60 @@
+"""request.user из кеша вместо SELECT из auth_user на каждый запрос.
+
+Сессия проверяется так же, как в django.contrib.auth.get_user():
+по хешу пароля и флагу is_active. Сохранение и удаление пользователя
+сбрасывают запись в кеше, поэтому смена пароля, выход на всех
+устройствах и блокировка действуют с первого же запроса. Это верно
+только для кеша, общего для всех воркеров (CACHE_SHARED); с LocMemCache
+сброс не дошел бы до других процессов, и пользователь читается из базы.
+"""
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import get_user_model
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.crypto import constant_time_compare
+from django.utils.functional import SimpleLazyObject
+
+USER_KEY = 'auth:user:{}'
+
+
+def get_cached_user(request):
+    if not settings.CACHE_SHARED:
+        return auth.get_user(request)
+    session = request.session
+    try:
+        user_id = session[auth.SESSION_KEY]
+        backend_path = session[auth.BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    key = USER_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = auth.get_user(request)
+        if user.is_authenticated:
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+    session_hash = session.get(auth.HASH_SESSION_KEY)
+    if not user.is_active or not session_hash or not constant_time_compare(
+        session_hash, user.get_session_auth_hash()
+    ):
+        session.flush()
+        return AnonymousUser()
+    return user
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_user(sender, instance, **kwargs):
+    cache.delete(USER_KEY.format(instance.pk))
@@ -0,0 +1,64 @@
+"""Сжатие ответов gzip и brotli, в том числе потоковых."""
+import zlib
+
+from django.conf import settings
+
+from .static import accepted_encodings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class StreamCompressor:
+    """Сжимает данные по частям; каждая часть сразу готова к отправке."""
+
+    def __init__(self, encoding, level):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=level)
+            self._compress = compressor.process
+            self._flush = compressor.flush
+            self._finish = compressor.finish
+        else:
+            # wbits=31: формат gzip, а не «голый» deflate.
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._compress = compressor.compress
+            self._flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = compressor.flush
+
+    def compress(self, data, flush=True):
+        compressed = self._compress(data)
+        return compressed + self._flush() if flush else compressed
+
+    def finish(self):
+        return self._finish()
+
+
+def compress(data, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    return compressor.compress(data, flush=False) + compressor.finish()
+
+
+def compress_stream(chunks, encoding, level):
+    compressor = StreamCompressor(encoding, level)
+    for chunk in chunks:
+        if chunk:
+            yield compressor.compress(chunk)
+    yield compressor.finish()
+
+
+def choose_encoding(accept_encoding, options):
+    """Выбирает br, если он доступен и принят клиентом, иначе gzip."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if encoding in accepted and options.get(encoding):
+            return encoding
+    return None
+
+
+def compression_options(content_type):
+    """Настройки сжатия из COMPRESSION для типа ответа или None."""
+    return settings.COMPRESSION.get(content_type.split(';')[0].strip())
@@ -0,0 +1,192 @@
+"""Отправка почты через очередь в базе.
+
+OutboxBackend — EMAIL_BACKEND для view: он только сохраняет письма
+в OutgoingEmail (в той же транзакции, что и запрос), поэтому медленный
+почтовый сервер не задерживает ответ. Отправляет их manage.py
+send_emails через EMAIL_OUTBOX['backend'] пачками по одному
+соединению. Взятые в работу письма откладываются на lease секунд:
+если обработчик упадет, их подхватит следующий. Неудачная попытка
+переносится с растущей задержкой, после max_attempts письмо
+помечается FAILED. Если сервер недоступен, оставшиеся письма пачки
+возвращаются в очередь, а send_emails ждет и пробует снова.
+"""
+import base64
+import json
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+FIELDS = (
+    'subject', 'body', 'from_email', 'to', 'cc', 'bcc', 'reply_to',
+    'extra_headers',
+)
+
+
+def dump_message(message):
+    """EmailMessage -> JSON; вложения — только (имя, данные, тип)."""
+    data = {field: getattr(message, field) for field in FIELDS}
+    data['alternatives'] = list(getattr(message, 'alternatives', []))
+    data['attachments'] = []
+    for attachment in message.attachments:
+        if not isinstance(attachment, tuple):
+            raise ValueError('Вложения MIMEBase очередь не поддерживает.')
+        name, content, mimetype = attachment
+        if isinstance(content, bytes):
+            content = {'base64': base64.b64encode(content).decode('ascii')}
+        data['attachments'].append([name, content, mimetype])
+    return json.dumps(data, ensure_ascii=False)
+
+
+def load_message(payload):
+    data = json.loads(payload)
+    message = EmailMultiAlternatives(
+        headers=data.pop('extra_headers'),
+        alternatives=[tuple(item) for item in data.pop('alternatives')],
+        **{field: data[field] for field in FIELDS if field in data}
+    )
+    for name, content, mimetype in data['attachments']:
+        if isinstance(content, dict):
+            content = base64.b64decode(content['base64'])
+        message.attach(name, content, mimetype)
+    return message
+
+
+class OutboxBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        now = timezone.now()
+        emails = [
+            OutgoingEmail(payload=dump_message(message), next_attempt_at=now)
+            for message in email_messages
+            if message.recipients()
+        ]
+        OutgoingEmail.objects.bulk_create(emails)
+        return len(emails)
+
+
+def retry_delay(attempts):
+    """Секунды до следующей попытки: retry_delay * 2^(n-1), с потолком."""
+    options = settings.EMAIL_OUTBOX
+    return min(
+        options['retry_delay'] * 2 ** (attempts - 1),
+        options['max_retry_delay'],
+    )
+
+
+def claim(batch_size, now):
+    """Берет до batch_size писем, которым пора уйти.
+
+    Захват — условный UPDATE, как в jobs.queue.claim: письмо, которое
+    между выборкой и UPDATE забрал другой отправитель, уже не видно.
+    """
+    due = OutgoingEmail.objects.filter(
+        status=OutgoingEmail.PENDING, next_attempt_at__lte=now
+    )
+    candidates = due.order_by('next_attempt_at').values_list(
+        'id', flat=True
+    )
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    if skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+    lease = uuid.uuid4().hex
+    while True:
+        with transaction.atomic() if skip_locked else nullcontext():
+            ids = list(candidates[:batch_size])
+            if not ids:
+                return []
+            claimed = due.filter(id__in=ids).update(
+                lease=lease,
+                attempts=F('attempts') + 1,
+                next_attempt_at=now + timedelta(
+                    seconds=settings.EMAIL_OUTBOX['lease']
+                ),
+            )
+        if claimed:
+            return list(
+                OutgoingEmail.objects.filter(lease=lease).order_by('id')
+            )
+
+
+class MailerUnavailable(Exception):
+    """Почтовый сервер недоступен; неотправленные письма ждут в очереди."""
+
+
+def release(emails):
+    """Возвращает взятые, но не отправленные письма в очередь.
+
+    Попытка не засчитывается, следующая — через retry_delay секунд.
+    """
+    retry_at = timezone.now() + timedelta(seconds=retry_delay(1))
+    for email in emails:
+        email.attempts -= 1
+        email.next_attempt_at = retry_at
+    OutgoingEmail.objects.bulk_update(
+        emails, ['attempts', 'next_attempt_at']
+    )
+
+
+def deliver(mailer, emails):
+    """Отправляет пачку по открытому соединению; возвращает (ушло, нет)."""
+    sent = failed = 0
+    for number, email in enumerate(emails):
+        try:
+            mailer.send_messages([load_message(email.payload)])
+        except Exception as error:
+            failed += 1
+            email.last_error = f'{type(error).__name__}: {error}'[:1000]
+            now = timezone.now()
+            if email.attempts >= settings.EMAIL_OUTBOX['max_attempts']:
+                email.status = OutgoingEmail.FAILED
+            else:
+                email.next_attempt_at = now + timedelta(
+                    seconds=retry_delay(email.attempts)
+                )
+            email.save(
+                update_fields=['status', 'next_attempt_at', 'last_error']
+            )
+            # Сервер мог разорвать соединение: следующее письмо — по новому.
+            mailer.close()
+            try:
+                mailer.open()
+            except Exception as error:
+                release(emails[number + 1:])
+                raise MailerUnavailable(error) from error
+        else:
+            sent += 1
+            email.status = OutgoingEmail.SENT
+            email.sent_at = timezone.now()
+            email.save(update_fields=['status', 'sent_at'])
+    return sent, failed
+
+
+def send_outbox(batch_size=None):
+    """Отправляет все письма, которым пора уйти; возвращает (ушло, нет).
+
+    Если до сервера не достучаться, бросает MailerUnavailable.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX['batch_size']
+    sent = failed = 0
+    mailer = get_connection(settings.EMAIL_OUTBOX['backend'])
+    try:
+        mailer.open()
+    except Exception as error:
+        raise MailerUnavailable(error) from error
+    try:
+        while True:
+            emails = claim(batch_size, timezone.now())
+            if not emails:
+                break
+            batch_sent, batch_failed = deliver(mailer, emails)
+            sent += batch_sent
+            failed += batch_failed
+    finally:
+        mailer.close()
+    return sent, failed
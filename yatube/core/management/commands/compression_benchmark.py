@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.compression import brotli, compress
+from posts.models import Group, Post, User
+
+FEED_TEMPLATES = (
+    'posts/index.html', 'posts/group_list.html', 'posts/profile.html',
+)
+LEVELS = {'gzip': (1, 6, 9), 'br': (1, 4, 5, 8, 11)}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время сжатия и экономию трафика gzip и brotli '
+        'на страницах ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def render_feeds(self):
+        """Страницы ленты с постами, созданными в памяти."""
+        author = User(id=1, username='leo', first_name='Лев',
+                      last_name='Толстой')
+        group = Group(id=1, title='Классика', slug='classic',
+                      description='Русская литература')
+        text = 'Все счастливые семьи похожи друг на друга. ' * 8
+        posts = [
+            Post(id=number, text=text, author=author, group=group,
+                 pub_date=timezone.now())
+            for number in range(1, settings.POSTS_COUNT * 3)
+        ]
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        context = {
+            'page_obj': Paginator(posts, settings.POSTS_COUNT).get_page(1),
+            'group': group,
+            'author': author,
+        }
+        return {
+            name: render_to_string(name, context, request).encode()
+            for name in FEED_TEMPLATES
+        }
+
+    def handle(self, *args, **options):
+        encodings = ['gzip'] + (['br'] if brotli else [])
+        for name, content in self.render_feeds().items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{name}: {len(content)} байт'
+            ))
+            for encoding in encodings:
+                for level in LEVELS[encoding]:
+                    start = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        compressed = compress(content, encoding, level)
+                    duration = (
+                        (time.perf_counter() - start) * 1000
+                        / options['repeat']
+                    )
+                    saved = 100 - len(compressed) * 100 / len(content)
+                    self.stdout.write(
+                        f'  {encoding:>4} {level:>2}: {duration:7.3f} мс, '
+                        f'{len(compressed):6} байт, экономия {saved:4.1f}%'
+                    )
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.mail import MailerUnavailable, send_outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди OutgoingEmail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между проверками очереди в секундах.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Отправить то, что есть, и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                sent, failed = send_outbox(options['batch_size'])
+            except MailerUnavailable as error:
+                message = f'Почтовый сервер недоступен: {error}'
+                if options['once']:
+                    raise CommandError(message)
+                self.stderr.write(message)
+                time.sleep(options['interval'])
+                continue
+            if sent or failed or options['once']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Отправлено писем: {sent}, с ошибкой: {failed} '
+                    f'за {time.perf_counter() - started:.2f} с.'
+                ))
+            if options['once']:
+                return
+            time.sleep(options['interval'])
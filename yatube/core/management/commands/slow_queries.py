@@ -0,0 +1,46 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.slow_queries import report
+
+
+class Command(BaseCommand):
+    help = 'Показывает самые медленные SQL-запросы из журнала.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument(
+            '--order',
+            choices=('total', 'max', 'avg', 'count'),
+            default='total',
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Очистить журнал после вывода отчета.',
+        )
+
+    def handle(self, *args, **options):
+        items = report(order=options['order'], limit=options['limit'])
+        if not items:
+            self.stdout.write('Медленных запросов не найдено.')
+        for number, item in enumerate(items, start=1):
+            sample = item['sample']
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{number}. {item["fingerprint"]}: '
+                f'{item["count"]} раз, всего {item["total"]:.1f} мс, '
+                f'макс. {item["max"]:.1f} мс, '
+                f'в среднем {item["avg"]:.1f} мс'
+            ))
+            self.stdout.write(f'  SQL: {sample["sql"]}')
+            self.stdout.write(f'  Параметры: {sample["params"]}')
+            self.stdout.write(
+                f'  Представления: {", ".join(sorted(item["views"])) or "-"}'
+            )
+            self.stdout.write(f'  Код: {sample["code"] or "-"}')
+            self.stdout.write(f'  Шаблон: {sample["template"] or "-"}')
+            for line in sample['plan'] or ():
+                self.stdout.write(f'  План: {line}')
+        if options['clear'] and os.path.exists(settings.SLOW_QUERY_LOG):
+            os.remove(settings.SLOW_QUERY_LOG)
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import warmup
+
+IMPORT_SCRIPT = (
+    'import json, sys, yatube.wsgi; print(json.dumps(sorted(sys.modules)))'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет импорт WSGI-приложения (python -X importtime) '
+        'и время прогрева.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, WSGI_WARMUP='0')
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            _, own, cumulative, name = (
+                part.strip() for part in line.replace(':', '|', 1).split('|')
+            )
+            imports.append((int(cumulative), int(own), name))
+        total = sum(own for _, own, _ in imports)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Импорт yatube.wsgi: {total / 1000:.1f} мс, '
+            f'модулей: {len(imports)}'
+        ))
+        for cumulative, own, name in sorted(imports, reverse=True)[
+            :options['limit']
+        ]:
+            self.stdout.write(
+                f'  {cumulative / 1000:8.1f} мс {own / 1000:8.1f} мс  '
+                f'{name}'
+            )
+        loaded = set(json.loads(result.stdout))
+        for module in settings.LAZY_MODULES:
+            if module in loaded:
+                self.stdout.write(self.style.WARNING(
+                    f'{module} импортируется при старте, '
+                    'хотя нужен только при загрузке картинок.'
+                ))
+        self.stdout.write(self.style.MIGRATE_HEADING('Прогрев:'))
+        for step, duration in warmup().items():
+            self.stdout.write(f'  {duration:8.1f} мс  {step}')
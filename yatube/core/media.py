@@ -0,0 +1,153 @@
+"""Раздача MEDIA_ROOT из WSGI: условные GET-запросы и Range.
+
+Используется, когда перед приложением нет nginx/Apache
+(MEDIA_SERVE_MODE = 'wsgi'). Файл целиком отдается через
+wsgi.file_wrapper, то есть через os.sendfile() там, где сервер
+это умеет (gunicorn, uWSGI).
+"""
+import mimetypes
+import os
+import stat
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from .static import BLOCK_SIZE
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Разбирает Range с одним диапазоном байтов.
+
+    Возвращает (start, end) включительно или None, если заголовок
+    нужно проигнорировать и отдать файл целиком.
+    """
+    units, _, value = header.partition('=')
+    if units.strip() != 'bytes' or ',' in value:
+        return None
+    start, _, end = value.strip().partition('-')
+    try:
+        if not start:
+            length = int(end)
+            if length == 0 or size == 0:
+                # В пустом файле нет ни одного байта для диапазона.
+                raise RangeNotSatisfiable
+            return max(size - length, 0), size - 1
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if start > end:
+        if start < size:
+            return None
+        raise RangeNotSatisfiable
+    return start, end
+
+
+def read_range(file, length):
+    try:
+        while length > 0:
+            chunk = file.read(min(BLOCK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+class MediaFilesApplication:
+    """WSGI-обертка над приложением: перехватывает запросы к MEDIA_URL."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.MEDIA_ROOT
+        self.prefix = prefix or settings.MEDIA_URL
+
+    def find(self, environ):
+        # PATH_INFO по PEP 3333 — байты UTF-8, прочитанные как latin-1.
+        path = environ.get('PATH_INFO', '').encode('latin-1').decode(
+            'utf-8', 'replace'
+        )
+        if not path.startswith(self.prefix):
+            return None, None
+        try:
+            full_path = safe_join(self.root, path[len(self.prefix):])
+            file_stat = os.stat(full_path)
+        except (SuspiciousFileOperation, OSError):
+            return None, None
+        if not stat.S_ISREG(file_stat.st_mode):
+            return None, None
+        return full_path, file_stat
+
+    def not_modified(self, environ, etag, mtime):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return etag in tags or '*' in tags
+        since = parse_http_date_safe(
+            environ.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        return since is not None and int(mtime) <= since
+
+    def requested_range(self, environ, etag, last_modified, size):
+        header = environ.get('HTTP_RANGE')
+        if_range = environ.get('HTTP_IF_RANGE')
+        if not header or if_range not in (None, etag, last_modified):
+            return None
+        return parse_range(header, size)
+
+    def __call__(self, environ, start_response):
+        full_path = None
+        if environ.get('REQUEST_METHOD') in ('GET', 'HEAD'):
+            full_path, file_stat = self.find(environ)
+        if full_path is None:
+            return self.application(environ, start_response)
+        size = file_stat.st_size
+        etag = f'"{int(file_stat.st_mtime):x}-{size:x}"'
+        last_modified = http_date(file_stat.st_mtime)
+        headers = [
+            ('Cache-Control', settings.MEDIA_CACHE_CONTROL),
+            ('ETag', etag),
+            ('Last-Modified', last_modified),
+            ('Accept-Ranges', 'bytes'),
+        ]
+        if self.not_modified(environ, etag, file_stat.st_mtime):
+            start_response('304 Not Modified', headers)
+            return []
+        try:
+            byte_range = self.requested_range(
+                environ, etag, last_modified, size
+            )
+        except RangeNotSatisfiable:
+            start_response('416 Range Not Satisfiable', headers + [
+                ('Content-Range', f'bytes */{size}'),
+            ])
+            return []
+        start, end = byte_range or (0, size - 1)
+        headers += [
+            ('Content-Type', (
+                mimetypes.guess_type(full_path)[0]
+                or 'application/octet-stream'
+            )),
+            ('Content-Length', str(end - start + 1)),
+        ]
+        if byte_range:
+            headers.append(('Content-Range', f'bytes {start}-{end}/{size}'))
+            start_response('206 Partial Content', headers)
+        else:
+            start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        file = open(full_path, 'rb')
+        if not byte_range:
+            file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+            return file_wrapper(file, BLOCK_SIZE)
+        file.seek(start)
+        return read_range(file, end - start + 1)
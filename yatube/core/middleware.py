@@ -0,0 +1,68 @@
+from contextlib import ExitStack
+
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from .compression import choose_encoding, compress, compress_stream
+from .compression import compression_options
+from .slow_queries import SlowQueryRecorder
+
+
+class SlowQueryMiddleware:
+    """Подключает журнал медленных запросов ко всем соединениям."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(request)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
+
+
+class CompressionMiddleware:
+    """Сжимает ответы с типами из COMPRESSION.
+
+    В отличие от GZipMiddleware, поддерживает brotli и сжимает потоковые
+    ответы по частям, не собирая их целиком в памяти.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        options = compression_options(response.get('Content-Type', ''))
+        if (
+            options is None
+            or response.status_code in (204, 206, 304)
+            or response.has_header('Content-Encoding')
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''), options
+        )
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, options[encoding]
+            )
+            del response['Content-Length']
+        else:
+            content = response.content
+            if len(content) < options['min_size']:
+                return response
+            compressed = compress(content, encoding, options[encoding])
+            if len(compressed) >= len(content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_outgoing_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='lease',
+            field=models.CharField(blank=True, db_index=True, max_length=32, verbose_name='Аренда'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+"""Ограничение частоты запросов к пишущим view.
+
+Лимиты задаются в RATE_LIMITS как 'число/период' (s, m, h, d).
+Счетчики лежат в кеше и увеличиваются атомарно через cache.incr();
+окно скользящее: запросы прошлого окна учитываются с весом, который
+убывает по мере хода текущего окна. Ключ — id пользователя, для
+анонимов — IP-адрес.
+
+Лимит общий для сайта только с общим кешем (CACHE_SHARED). С LocMemCache
+у каждого процесса свои счетчики: лимит действует на процесс, и из
+N воркеров можно выжать до N раз больше запросов.
+"""
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60)."""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.strip().lower()[0]]
+
+
+def client_key(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    return 'ip' + request.META.get(settings.RATE_LIMIT_IP_HEADER, '').split(
+        ','
+    )[0].strip()
+
+
+def hit(key, limit, period, now=None):
+    """Учитывает запрос; 0 — пропустить, иначе секунды до повтора."""
+    now = time.time() if now is None else now
+    window = int(now // period)
+    current_key = f'ratelimit:{key}:{window}'
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:
+        # Ключ вытеснили между add() и incr().
+        cache.set(current_key, 1, period * 2)
+        current = 1
+    previous = cache.get(f'ratelimit:{key}:{window - 1}', 0)
+    elapsed = now - window * period
+    weight = 1 - elapsed / period
+    excess = previous * weight + current - limit
+    if excess <= 0:
+        return 0
+    wait = period - elapsed
+    if previous:
+        wait = min(wait, excess * period / previous)
+    return max(1, math.ceil(wait))
+
+
+def ratelimit(name, methods=('POST',)):
+    """Декоратор view: лимит RATE_LIMITS[name] на методы methods."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate = settings.RATE_LIMITS.get(name)
+            if rate and request.method in methods:
+                limit, period = parse_rate(rate)
+                retry_after = hit(
+                    f'{name}:{client_key(request)}', limit, period
+                )
+                if retry_after:
+                    response = HttpResponse(
+                        'Слишком много запросов, попробуйте позже.',
+                        content_type='text/plain; charset=utf-8',
+                        status=429,
+                    )
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
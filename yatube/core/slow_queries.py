@@ -0,0 +1,167 @@
+"""Журнал медленных SQL-запросов.
+
+Работает и при DEBUG = False: обертка курсора замеряет каждый запрос,
+а те, что дольше SLOW_QUERY_THRESHOLD миллисекунд, записываются
+в SLOW_QUERY_LOG вместе с параметрами, местом вызова и планом запроса.
+"""
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.template.base import Node
+from django.utils import timezone
+
+_state = threading.local()
+_write_lock = threading.Lock()
+# План запроса строится один раз на отпечаток в процессе.
+_plans = {}
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(
+    r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE
+)
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Убирает из запроса литералы и длину списков IN."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACES_RE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.md5(normalize(sql).encode()).hexdigest()
+
+
+def _is_project_file(filename):
+    return (
+        filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in filename
+        and filename != __file__
+    )
+
+
+def find_source():
+    """Ищет в стеке строку кода проекта и строку шаблона."""
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and (code is None or template is None):
+        if code is None and _is_project_file(frame.f_code.co_filename):
+            code = f'{frame.f_code.co_filename}:{frame.f_lineno}'
+        if template is None:
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and getattr(node, 'token', None):
+                template = f'{node.origin.name}:{node.token.lineno}'
+        frame = frame.f_back
+    return code, template
+
+
+def explain(connection, sql, params):
+    """Возвращает план запроса; изменяющие запросы не выполняем."""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else (
+        'EXPLAIN '
+    )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def write_entry(entry, path=None):
+    path = path or settings.SLOW_QUERY_LOG
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    line = json.dumps(entry, ensure_ascii=False, default=str)
+    with _write_lock:
+        with open(path, 'a', encoding='utf-8') as log:
+            log.write(line + '\n')
+
+
+class SlowQueryRecorder:
+    """Обертка для connection.execute_wrapper()."""
+
+    def __init__(self, request=None, threshold=None):
+        self.request = request
+        if threshold is None:
+            threshold = settings.SLOW_QUERY_THRESHOLD
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_state, 'active', False):
+            return execute(sql, params, many, context)
+        start = time.monotonic()
+        result = execute(sql, params, many, context)
+        duration = (time.monotonic() - start) * 1000
+        if duration >= self.threshold:
+            _state.active = True
+            try:
+                self.record(context['connection'], sql, params, many,
+                            duration)
+            finally:
+                _state.active = False
+        return result
+
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else None
+
+    def record(self, connection, sql, params, many, duration):
+        key = fingerprint(sql)
+        if key not in _plans and not many:
+            _plans[key] = explain(connection, sql, params)
+        code, template = find_source()
+        write_entry({
+            'fingerprint': key,
+            'sql': normalize(sql),
+            'params': list(params)[:1] if many else list(params or ()),
+            'duration': round(duration, 3),
+            'view': self.view_name(),
+            'code': code,
+            'template': template,
+            'plan': _plans.get(key),
+            'time': timezone.now().isoformat(),
+        })
+
+
+def report(path=None, order='total', limit=10):
+    """Сводка по отпечаткам: количество, суммарное и худшее время."""
+    path = path or settings.SLOW_QUERY_LOG
+    stats = defaultdict(lambda: {
+        'count': 0, 'total': 0.0, 'max': 0.0, 'views': set(),
+    })
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as log:
+        for line in log:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            item = stats[entry['fingerprint']]
+            item['count'] += 1
+            item['total'] += entry['duration']
+            if entry['duration'] >= item['max']:
+                item['max'] = entry['duration']
+                item['sample'] = entry
+            if entry.get('view'):
+                item['views'].add(entry['view'])
+    for key, item in stats.items():
+        item['fingerprint'] = key
+        item['avg'] = item['total'] / item['count']
+    return sorted(
+        stats.values(), key=lambda item: item[order], reverse=True
+    )[:limit]
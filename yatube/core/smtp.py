@@ -0,0 +1,82 @@
+"""Локальный SMTP-сервер для тестов и разработки.
+
+Принимает письма на 127.0.0.1 и складывает их в messages; первые
+fail_first писем отклоняет ответом 451, чтобы проверять повторы.
+"""
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost SMTP')
+        envelope = {}
+        for line in self.rfile:
+            command = line.decode('ascii', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                envelope = {'from': command[10:].strip('<> '), 'to': []}
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                envelope.setdefault('to', []).append(command[8:].strip('<> '))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                self.reply(self.server.accept(envelope, self.read_data()))
+                envelope = {}
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # RSET, NOOP и прочее.
+                self.reply('250 OK')
+
+    def read_data(self):
+        lines = []
+        for line in self.rfile:
+            if line.rstrip(b'\r\n') == b'.':
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines)
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, fail_first=0):
+        super().__init__(('127.0.0.1', port), SMTPHandler)
+        self.port = self.server_address[1]
+        self.fail_first = fail_first
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def accept(self, envelope, data):
+        with self.lock:
+            if self.fail_first:
+                self.fail_first -= 1
+                return '451 Try again later'
+            message = message_from_bytes(data, policy=policy.default)
+            message.envelope = envelope
+            self.messages.append(message)
+        return '250 OK: queued'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
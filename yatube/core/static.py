@@ -0,0 +1,117 @@
+"""Раздача собранной статики прямо из WSGI, без обращения к Django.
+
+Файлы из STATIC_ROOT индексируются при старте. Для каждого запроса
+выбирается заранее сжатая копия (.br или .gz) по Accept-Encoding;
+имена с хешем из манифеста отдаются с кешированием на год.
+"""
+import mimetypes
+import os
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=60'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+BLOCK_SIZE = 64 * 1024
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных через q=0."""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if name and params not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.cache_control = IMMUTABLE if immutable else REVALIDATE
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        self.variants = {}
+        for encoding, suffix in ((None, ''),) + ENCODINGS:
+            if os.path.exists(path + suffix):
+                stat = os.stat(path + suffix)
+                self.variants[encoding] = (
+                    path + suffix,
+                    stat.st_size,
+                    f'"{int(stat.st_mtime):x}-{stat.st_size:x}"',
+                )
+        self.last_modified = formatdate(
+            os.stat(path).st_mtime, usegmt=True
+        )
+
+    def headers(self, encoding):
+        path, size, etag = self.variants[encoding]
+        headers = [
+            ('Content-Type', self.content_type),
+            ('Content-Length', str(size)),
+            ('Cache-Control', self.cache_control),
+            ('Last-Modified', self.last_modified),
+            ('ETag', etag),
+        ]
+        if len(self.variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return headers
+
+    def choose(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, _ in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return encoding
+        return None
+
+
+class StaticFilesApplication:
+    """WSGI-обертка над приложением: перехватывает запросы к STATIC_URL."""
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan()
+
+    def scan(self):
+        hashed = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        files = {}
+        for root, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.root).replace(
+                    os.sep, '/'
+                )
+                files[self.prefix + relative] = StaticFile(
+                    path, immutable=relative in hashed
+                )
+        return files
+
+    def __call__(self, environ, start_response):
+        static = self.files.get(environ.get('PATH_INFO', ''))
+        method = environ.get('REQUEST_METHOD')
+        if static is None or method not in ('GET', 'HEAD'):
+            return self.application(environ, start_response)
+        encoding = static.choose(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        headers = static.headers(encoding)
+        path, _, etag = static.variants[encoding]
+        if environ.get('HTTP_IF_NONE_MATCH') == etag:
+            start_response('304 Not Modified', [
+                header for header in headers
+                if header[0] in ('Cache-Control', 'ETag', 'Vary')
+            ])
+            return []
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
@@ -0,0 +1,222 @@
+"""Хранилище статики: имена с хешем, gzip/brotli-копии, чистка CSS."""
+import gzip
+import io
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.template.utils import get_app_template_dirs
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = (
+    '.css', '.js', '.svg', '.ico', '.txt', '.html', '.json', '.map', '.xml',
+)
+
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+_PARENS_RE = re.compile(r'\([^()]*\)')
+_CLASS_RE = re.compile(r'\.(-?[_a-zA-Z][\w-]*)')
+_WORD_RE = re.compile(r'[\w-]+')
+
+
+def gzip_compress(data):
+    # mtime=0, чтобы повторная сборка давала те же байты.
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as archive:
+        archive.write(data)
+    return buffer.getvalue()
+
+
+def compressed_variants(data):
+    """Возвращает пары (расширение, данные), которые меньше оригинала."""
+    variants = [('gz', gzip_compress(data))]
+    if brotli is not None:
+        variants.append(('br', brotli.compress(data)))
+    return [
+        (suffix, compressed) for suffix, compressed in variants
+        if len(compressed) < len(data)
+    ]
+
+
+def _skip(css, index):
+    """Возвращает индекс конца строки или комментария, начатых в index."""
+    char = css[index]
+    if char in '"\'':
+        while True:
+            index += 1
+            if index >= len(css) or css[index] == char:
+                return index
+            if css[index] == '\\':
+                index += 1
+    if css.startswith('/*', index):
+        end = css.find('*/', index + 2)
+        return len(css) if end == -1 else end + 1
+    return None
+
+
+def split_rules(css):
+    """Делит CSS на правила верхнего уровня с учетом строк и комментариев."""
+    rules = []
+    depth = start = index = 0
+    while index < len(css):
+        char = css[index]
+        skipped = _skip(css, index)
+        if skipped is not None:
+            index = skipped
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:index + 1])
+                start = index + 1
+        elif char == ';' and depth == 0:
+            rules.append(css[start:index + 1])
+            start = index + 1
+        index += 1
+    if css[start:].strip():
+        rules.append(css[start:])
+    return rules
+
+
+def split_selectors(selector):
+    """Делит список селекторов по запятым вне скобок."""
+    parts = []
+    depth = start = 0
+    for index, char in enumerate(selector):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(selector[start:index])
+            start = index + 1
+    parts.append(selector[start:])
+    return parts
+
+
+def is_used(selector, words):
+    # Классы внутри :not(...) и подобных не обязаны встречаться в шаблонах.
+    while True:
+        stripped = _PARENS_RE.sub('', selector)
+        if stripped == selector:
+            break
+        selector = stripped
+    return all(name in words for name in _CLASS_RE.findall(selector))
+
+
+def prune_css(css, words):
+    """Удаляет правила с классами, которых нет среди words."""
+    result = []
+    for rule in split_rules(css):
+        if '{' not in rule:
+            result.append(rule)
+            continue
+        prelude, body = rule.split('{', 1)
+        comments = ''.join(_COMMENT_RE.findall(prelude))
+        selector = _COMMENT_RE.sub('', prelude).strip()
+        if selector.startswith(('@media', '@supports')):
+            inner = prune_css(body[:-1], words)
+            if inner.strip():
+                result.append(f'{prelude}{{{inner}}}')
+            elif comments:
+                result.append(comments)
+        elif selector.startswith('@'):
+            result.append(rule)
+        else:
+            selectors = [
+                part for part in split_selectors(selector)
+                if is_used(part, words)
+            ]
+            if selectors:
+                result.append(f'{comments}{",".join(selectors)}{{{body}')
+            elif comments:
+                result.append(comments)
+    return ''.join(result)
+
+
+def template_words():
+    """Все слова из шаблонов проекта: в их числе и имена CSS-классов."""
+    directories = list(get_app_template_dirs('templates'))
+    for engine in settings.TEMPLATES:
+        directories.extend(engine.get('DIRS', ()))
+    words = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.endswith(('.html', '.txt', '.xml')):
+                    path = os.path.join(root, name)
+                    with open(path, encoding='utf-8') as template:
+                        words.update(_WORD_RE.findall(template.read()))
+    return words
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest-хранилище, которое кладет рядом .gz и .br копии файлов.
+
+    Файлы из STATIC_PRUNE_CSS при сборке очищаются от правил,
+    не используемых в шаблонах. Пока collectstatic не выполнен
+    (тесты, разработка), url() отдает имя без хеша.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def prune(self, paths):
+        """Очищает CSS из STATIC_PRUNE_CSS до хеширования.
+
+        Дальше post_process читает файл отсюда, а не из исходников,
+        поэтому хеш, копия с хешем и .gz/.br считаются от очищенного.
+        """
+        words = None
+        for name in settings.STATIC_PRUNE_CSS:
+            if name not in paths:
+                continue
+            words = template_words() if words is None else words
+            storage, path = paths[name]
+            with storage.open(path) as source:
+                css = source.read().decode('utf-8')
+            if self.exists(name):
+                self.delete(name)
+            self._save(name, ContentFile(
+                prune_css(css, words).encode('utf-8')
+            ))
+            paths[name] = (self, name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            self.prune(paths)
+        # CSS проходит несколько раз; сжимаем итоговые имена в конце.
+        processed_names = {}
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not isinstance(processed, Exception):
+                processed_names[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name, hashed_name in processed_names.items():
+            for path in {name, hashed_name} - {None}:
+                self.compress(path)
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        for suffix, compressed in compressed_variants(data):
+            path = f'{name}.{suffix}'
+            if self.exists(path):
+                self.delete(path)
+            self._save(path, ContentFile(compressed))
@@ -1,4 +1,58 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage, get_connection
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts.utils import GROUP_DIRECTORY_KEY
+
+from .compression import brotli
+from .mail import MailerUnavailable, claim, send_outbox
+from .media import MediaFilesApplication
+from .middleware import CompressionMiddleware
+from .models import OutgoingEmail
+from .ratelimit import hit
+from .slow_queries import normalize, report
+from .smtp import SMTPServer
+from .static import IMMUTABLE, StaticFilesApplication
+from .storage import prune_css
+from .views import media
+from .warmup import (template_names, warm_database, warm_templates,
+                     warm_urls, warmup)
+
+TEMP_LOG_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SLOW_QUERY_LOG = os.path.join(TEMP_LOG_DIR, 'slow_queries.log')
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def call_wsgi(application, path, **environ):
+    response = {}
+
+    def start_response(status, headers):
+        response['status'] = status
+        response['headers'] = dict(headers)
+
+    environ.setdefault('REQUEST_METHOD', 'GET')
+    environ['PATH_INFO'] = path
+    response['body'] = b''.join(application(environ, start_response))
+    return response
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +60,508 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG=SLOW_QUERY_LOG)
+class SlowQueryTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_LOG_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_normalize(self):
+        """Запросы с разными литералами дают один отпечаток."""
+        self.assertEqual(
+            normalize("SELECT * FROM t WHERE id IN (%s, %s) AND a = 'x'"),
+            normalize("SELECT  *  FROM t WHERE id IN (%s) AND a = 'yy'"),
+        )
+
+    def test_report(self):
+        """Запросы страницы попадают в отчет с планом и представлением."""
+        self.client.get('/')
+        items = report(SLOW_QUERY_LOG, limit=100)
+        self.assertTrue(items)
+        views = set().union(*(item['views'] for item in items))
+        self.assertIn('posts:index', views)
+        plans = [item['sample']['plan'] for item in items]
+        self.assertTrue(any(plans))
+
+
+class WarmupTests(TestCase):
+    def test_warmup(self):
+        """Прогрев разбирает URLconf и компилирует все шаблоны."""
+        self.assertGreater(warm_urls(), 0)
+        self.assertIn('posts/index.html', template_names())
+        self.assertEqual(warm_templates(), len(list(template_names())))
+        self.assertEqual(
+            set(warmup()),
+            {'warm_urls', 'warm_templates', 'warm_translations',
+             'warm_database'},
+        )
+
+    def test_group_directory_only_in_shared_cache(self):
+        """Каталог групп прогревается только в общий для воркеров кеш."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        warm_database()
+        self.assertIsNone(cache.get(GROUP_DIRECTORY_KEY))
+        with override_settings(CACHE_SHARED=True):
+            warm_database()
+        self.assertIsNotNone(cache.get(GROUP_DIRECTORY_KEY))
+
+
+@override_settings(
+    STATIC_ROOT=TEMP_STATIC_ROOT, STATIC_PRUNE_CSS=['css/bootstrap.min.css']
+)
+class StaticFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+
+    def get(self, path, **environ):
+        application = StaticFilesApplication(
+            lambda environ, start_response: [b'django']
+        )
+        return call_wsgi(application, path, **environ)
+
+    def test_prune_css(self):
+        """Правила с неиспользуемыми классами удаляются."""
+        css = '.a,.b{x:1}.c:not(.d){y:2}@media (min-width:1px){.b{z:3}}'
+        self.assertEqual(prune_css(css, {'a', 'c'}), '.a{x:1}.c:not(.d){y:2}')
+
+    def test_pruned_before_hashing(self):
+        """Копия с хешем и ее .gz очищены, хеш посчитан по очищенному."""
+        name = 'css/bootstrap.min.css'
+        hashed = staticfiles_storage.stored_name(name)
+        with staticfiles_storage.open(hashed) as pruned:
+            data = pruned.read()
+        self.assertEqual(
+            staticfiles_storage.file_hash(name, ContentFile(data)),
+            hashed.split('.')[-2],
+        )
+        source = os.path.join(settings.STATICFILES_DIRS[0], name)
+        self.assertLess(len(data), os.path.getsize(source))
+        with staticfiles_storage.open(name) as plain:
+            self.assertEqual(plain.read(), data)
+        with staticfiles_storage.open(f'{hashed}.gz') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), data)
+
+    def test_hashed_precompressed(self):
+        """Файл с хешем отдается сжатым и кешируется навсегда."""
+        url = staticfiles_storage.url('css/bootstrap.min.css')
+        self.assertRegex(url, r'bootstrap\.min\.[0-9a-f]{12}\.css$')
+        response = self.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['headers']['Content-Encoding'], 'gzip')
+        self.assertEqual(response['headers']['Cache-Control'], IMMUTABLE)
+        self.assertEqual(
+            len(response['body']),
+            int(response['headers']['Content-Length']),
+        )
+        response = self.get(
+            url, HTTP_IF_NONE_MATCH=response['headers']['ETag'],
+            HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(response['status'], '304 Not Modified')
+
+    def test_identity_and_fallthrough(self):
+        """Без Accept-Encoding файл отдается как есть, прочее идет в Django."""
+        response = self.get(staticfiles_storage.url('img/logo.png'))
+        self.assertNotIn('Content-Encoding', response['headers'])
+        self.assertEqual(self.get('/')['body'], b'django')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaFilesTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'a.gif'), 'wb') as f:
+            f.write(b'0123456789')
+        open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'empty.gif'), 'wb').close()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, path, **environ):
+        application = MediaFilesApplication(
+            lambda environ, start_response: [b'django']
+        )
+        return call_wsgi(application, path, **environ)
+
+    def test_full_and_conditional(self):
+        """Файл отдается целиком, повторный запрос с ETag получает 304."""
+        response = self.get('/media/posts/a.gif')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['body'], b'0123456789')
+        self.assertEqual(response['headers']['Content-Type'], 'image/gif')
+        etag = response['headers']['ETag']
+        response = self.get('/media/posts/a.gif', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['status'], '304 Not Modified')
+        self.assertEqual(response['body'], b'')
+
+    def test_ranges(self):
+        """Range отдает часть файла, диапазон за концом файла — 416."""
+        cases = {
+            'bytes=2-4': ('206 Partial Content', b'234', 'bytes 2-4/10'),
+            'bytes=-3': ('206 Partial Content', b'789', 'bytes 7-9/10'),
+            'bytes=8-': ('206 Partial Content', b'89', 'bytes 8-9/10'),
+            'bytes=20-': ('416 Range Not Satisfiable', b'', 'bytes */10'),
+        }
+        for header, (status, body, content_range) in cases.items():
+            with self.subTest(header=header):
+                response = self.get('/media/posts/a.gif', HTTP_RANGE=header)
+                self.assertEqual(response['status'], status)
+                self.assertEqual(response['body'], body)
+                self.assertEqual(
+                    response['headers']['Content-Range'], content_range
+                )
+
+    def test_empty_file(self):
+        """В пустом файле любой диапазон — 416, без Range — пустой 200."""
+        for header in ('bytes=-5', 'bytes=0-'):
+            with self.subTest(header=header):
+                response = self.get(
+                    '/media/posts/empty.gif', HTTP_RANGE=header
+                )
+                self.assertEqual(
+                    response['status'], '416 Range Not Satisfiable'
+                )
+                self.assertEqual(
+                    response['headers']['Content-Range'], 'bytes */0'
+                )
+        response = self.get('/media/posts/empty.gif')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['body'], b'')
+
+    def test_fallthrough(self):
+        """Отсутствующие файлы и выход за MEDIA_ROOT уходят в Django."""
+        for path in ('/media/posts/none.gif', '/media/../settings.py', '/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.get(path)['body'], b'django')
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel')
+    def test_accel_redirect(self):
+        """В режиме x-accel файл отдает nginx по внутреннему адресу."""
+        response = media(RequestFactory().get('/'), 'posts/a.gif')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/a.gif'
+        )
+        self.assertEqual(response.content, b'')
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_html_gzip(self):
+        """HTML сжимается, если клиент принимает gzip."""
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn(
+            'Последние обновления', gzip.decompress(response.content).decode()
+        )
+        response = self.client.get('/')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_and_skipped_types(self):
+        """Потоковый ответ сжимается по частям, картинки не трогаются."""
+        chunks = [b'<p>' + b'x' * 300 + b'</p>'] * 3
+        request = RequestFactory().get(
+            '/', HTTP_ACCEPT_ENCODING='gzip, br;q=0'
+        )
+        response = CompressionMiddleware(
+            lambda request: StreamingHttpResponse(iter(chunks))
+        )(request)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        parts = list(response.streaming_content)
+        self.assertEqual(len(parts), len(chunks) + 1)
+        self.assertEqual(gzip.decompress(b''.join(parts)), b''.join(chunks))
+        response = CompressionMiddleware(
+            lambda request: HttpResponse(
+                b'x' * 1000, content_type='image/png'
+            )
+        )(request)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_brotli_preferred(self):
+        if brotli is None:
+            self.skipTest('brotli не установлен')
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertIn(
+            'Последние обновления',
+            brotli.decompress(response.content).decode(),
+        )
+
+
+@override_settings(RATE_LIMITS={'post_create': '2/m', 'login': '1/m'})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_sliding_window(self):
+        """Прошлое окно учитывается с убывающим весом."""
+        for _ in range(4):
+            self.assertEqual(hit('test', 4, 60, now=60 * 10 + 59), 0)
+        self.assertGreater(hit('test', 4, 60, now=60 * 10 + 59), 0)
+        # Начало нового окна: прошлые 5 запросов весят почти полностью.
+        self.assertGreater(hit('test', 4, 60, now=60 * 11 + 1), 0)
+        # Конец нового окна: вес прошлых почти нулевой.
+        self.assertEqual(hit('test', 4, 60, now=60 * 11 + 59), 0)
+
+    def test_views(self):
+        """429 с Retry-After; пользователи и анонимы считаются отдельно."""
+        user = get_user_model().objects.create_user(username='auth')
+        self.client.force_login(user)
+        for _ in range(2):
+            response = self.client.post('/create/', {'text': 'Пост'})
+            self.assertEqual(response.status_code, 302)
+        response = self.client.post('/create/', {'text': 'Пост'})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.client.get('/create/').status_code, 200)
+        self.client.logout()
+        self.client.post('/auth/login/', {'username': 'auth'})
+        response = self.client.post('/auth/login/', {'username': 'auth'})
+        self.assertEqual(response.status_code, 429)
+
+
+class SessionTests(TestCase):
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db'
+    )
+    def test_session_from_cache(self):
+        """С общим кешем сессия читается из него, а не из django_session."""
+        user = get_user_model().objects.create_user(username='auth')
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/about/author/')
+        self.assertEqual(response.context['user'], user)
+        self.assertFalse(any(
+            'django_session' in query['sql'] for query in queries
+        ))
+
+    def test_purge(self):
+        """Просроченные сессии удаляются пачками, живые остаются."""
+        past = timezone.now() - timedelta(days=1)
+        for i in range(5):
+            Session.objects.create(
+                session_key=f'old{i}', session_data='', expire_date=past
+            )
+        Session.objects.create(
+            session_key='alive', session_data='',
+            expire_date=timezone.now() + timedelta(days=1),
+        )
+        call_command(
+            'purge_sessions', '--chunk-size', '2', '--pause', '0',
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'],
+        )
+
+
+@override_settings(
+    CACHE_SHARED=True,
+    SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+)
+class CachedUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='auth', password='old-password'
+        )
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_no_queries(self):
+        """Повторный запрос не обращается ни к сессиям, ни к auth_user."""
+        self.client.get('/about/author/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/about/author/')
+        self.assertEqual(response.context['user'], self.user)
+
+    def test_logout_and_password_change(self):
+        """Выход и смена пароля сразу лишают старую сессию доступа."""
+        self.client.get('/about/author/')
+        other = self.client_class()
+        other.force_login(self.user)
+        other.get('/about/author/')
+        self.client.get('/auth/logout/')
+        response = self.client.get('/about/author/')
+        self.assertFalse(response.context['user'].is_authenticated)
+        self.assertTrue(
+            other.get('/about/author/').context['user'].is_authenticated
+        )
+        self.user.set_password('new-password')
+        self.user.save()
+        response = other.get('/about/author/')
+        self.assertFalse(response.context['user'].is_authenticated)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_process_local_cache(self):
+        """Без общего кеша пользователь читается из базы каждый раз."""
+        self.client.get('/about/author/')
+        # Изменение из другого процесса: сигнал здесь не сработает.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False
+        )
+        response = self.client.get('/about/author/')
+        self.assertFalse(response.context['user'].is_authenticated)
+
+
+@override_settings(EMAIL_BACKEND='core.mail.OutboxBackend')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.smtp = SMTPServer().__enter__()
+        self.delivery = override_settings(
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.smtp.port,
+            EMAIL_OUTBOX=dict(
+                settings.EMAIL_OUTBOX,
+                backend='django.core.mail.backends.smtp.EmailBackend',
+            ),
+        )
+        self.delivery.enable()
+
+    def tearDown(self):
+        self.delivery.disable()
+        self.smtp.__exit__()
+
+    def test_password_reset_is_queued(self):
+        """Сброс пароля только ставит письмо в очередь."""
+        get_user_model().objects.create_user(
+            username='mailer', email='mailer@example.com',
+            password='password',
+        )
+        self.client.post(
+            '/auth/password_reset/', {'email': 'mailer@example.com'}
+        )
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+        self.assertEqual(self.smtp.messages, [])
+        call_command('send_emails', '--once', stdout=io.StringIO())
+        message, = self.smtp.messages
+        self.assertEqual(message.envelope['to'], ['mailer@example.com'])
+        self.assertIn('/auth/reset/', message.get_content())
+        self.assertEqual(
+            OutgoingEmail.objects.get().status, OutgoingEmail.SENT
+        )
+
+    def test_batch_over_one_connection(self):
+        """Пачка уходит по одному соединению, вложения сохраняются."""
+        messages = [
+            EmailMessage(f'Письмо {number}', 'Текст', 'site@example.com',
+                         [f'user{number}@example.com'])
+            for number in range(5)
+        ]
+        messages[0].attach('data.bin', b'\x00\x01', 'application/pdf')
+        get_connection().send_messages(messages)
+        self.assertEqual(send_outbox(batch_size=2), (5, 0))
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(
+            [message['Subject'] for message in self.smtp.messages],
+            [f'Письмо {number}' for number in range(5)],
+        )
+        attachment = self.smtp.messages[0].get_payload()[1]
+        self.assertEqual(attachment.get_payload(decode=True), b'\x00\x01')
+
+    def test_retry_with_backoff(self):
+        """Отклоненное письмо откладывается и уходит со второй попытки."""
+        self.smtp.fail_first = 1
+        get_connection().send_messages([EmailMessage(
+            'Тема', 'Текст', 'site@example.com', ['user@example.com']
+        )])
+        self.assertEqual(send_outbox(), (0, 1))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertIn('451', email.last_error)
+        self.assertGreater(
+            email.next_attempt_at,
+            timezone.now() + timedelta(
+                seconds=settings.EMAIL_OUTBOX['retry_delay'] - 5
+            ),
+        )
+        self.assertEqual(send_outbox(), (0, 0))
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_outbox(), (1, 0))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_server_down(self):
+        """При недоступном сервере остаток пачки ждет следующего прохода."""
+        get_connection().send_messages([
+            EmailMessage(f'Письмо {number}', 'Текст', 'site@example.com',
+                         ['user@example.com'])
+            for number in range(3)
+        ])
+        self.smtp.fail_first = 1
+        # Первое письмо отклонено, после него сервер перестает отвечать.
+        self.smtp.accept = self.shut_down(self.smtp.accept)
+        with self.assertRaises(MailerUnavailable):
+            send_outbox()
+        attempts = sorted(
+            OutgoingEmail.objects.values_list('attempts', flat=True)
+        )
+        self.assertEqual(attempts, [0, 0, 1])
+        self.assertFalse(OutgoingEmail.objects.filter(
+            next_attempt_at__lte=timezone.now()
+        ).exists())
+        with self.assertRaises(CommandError):
+            call_command('send_emails', '--once', stdout=io.StringIO())
+
+    def test_claim_race(self):
+        """Письмо, взятое соседом между выборкой и UPDATE, не берется."""
+        get_connection().send_messages([
+            EmailMessage(f'Письмо {number}', 'Текст', 'site@example.com',
+                         ['user@example.com'])
+            for number in range(2)
+        ])
+        now = timezone.now()
+        neighbour = []
+
+        def race(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if not neighbour and sql.startswith('SELECT'):
+                neighbour.append(None)
+                neighbour.extend(email.pk for email in claim(1, now))
+            return result
+
+        with connection.execute_wrapper(race):
+            mine = [email.pk for email in claim(2, now)]
+        self.assertEqual(len(neighbour[1:]), 1)
+        self.assertEqual(
+            sorted(mine + neighbour[1:]),
+            list(OutgoingEmail.objects.values_list('id', flat=True)),
+        )
+
+    def shut_down(self, accept):
+        def wrapper(envelope, data):
+            reply = accept(envelope, data)
+            self.smtp.server_close()
+            return reply
+        return wrapper
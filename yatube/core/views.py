@@ -1,4 +1,12 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.views.static import serve
 
 
 def page_not_found(request, exception):
@@ -15,3 +23,27 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def media(request, path):
+    """Передает отдачу файла фронтовому серверу (nginx, Apache)."""
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404
+    response = HttpResponse(
+        content_type=mimetypes.guess_type(full_path)[0]
+        or 'application/octet-stream'
+    )
+    if settings.MEDIA_SERVE_MODE == 'x-accel':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_ACCEL_PREFIX + path
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    response['Cache-Control'] = settings.MEDIA_CACHE_CONTROL
+    return response
+
+
+def sitemap(request, path):
+    """Файлы карты сайта, если их не отдает фронтовой сервер."""
+    return serve(request, path, document_root=settings.SITEMAP_ROOT)
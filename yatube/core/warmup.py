@@ -0,0 +1,85 @@
+"""Прогрев процесса до fork-а воркеров.
+
+Все, что первый запрос в воркере иначе делал бы сам: разбор URLconf,
+компиляция шаблонов (кешируются загрузчиком при DEBUG = False), каталоги
+переводов для LANGUAGE_CODE. Соединения с базой закрываются в конце,
+чтобы воркеры не унаследовали открытый дескриптор.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+from django.utils import formats, translation
+
+
+def warm_urls(resolver=None):
+    """Заполняет таблицы reverse() у корневого и вложенных резолверов."""
+    resolver = resolver or get_resolver()
+    count = len(resolver.reverse_dict)
+    for _, sub_resolver in resolver.namespace_dict.values():
+        count += warm_urls(sub_resolver)
+    return count
+
+
+def template_names():
+    for engine in settings.TEMPLATES:
+        for directory in engine.get('DIRS', ()):
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if name.endswith('.html'):
+                        path = os.path.relpath(
+                            os.path.join(root, name), directory
+                        )
+                        yield path.replace(os.sep, '/')
+
+
+def warm_templates():
+    count = 0
+    for name in template_names():
+        try:
+            get_template(name)
+        except TemplateSyntaxError:
+            continue
+        count += 1
+    return count
+
+
+def warm_translations():
+    translation.gettext('')
+    for name in ('DATE_FORMAT', 'DATETIME_FORMAT', 'DATE_INPUT_FORMATS'):
+        formats.get_format(name)
+    return settings.LANGUAGE_CODE
+
+
+def warm_database():
+    # Граф подписок строится в мастере и наследуется воркерами.
+    # Каталог групп — только в общий кеш: копию в LocMemCache мастера
+    # сигналы из воркеров не сбросили бы.
+    from posts.graph import get_graph
+    from posts.utils import group_directory
+
+    try:
+        if settings.FOLLOW_GRAPH['enabled']:
+            get_graph()
+        return len(group_directory()) if settings.CACHE_SHARED else 0
+    except DatabaseError:
+        # База еще не создана или не мигрирована: воркеры справятся сами.
+        return 0
+    finally:
+        connections.close_all()
+
+
+def warmup():
+    """Прогревает процесс, возвращает время шагов в миллисекундах."""
+    timings = {}
+    with translation.override(settings.LANGUAGE_CODE):
+        for step in (warm_urls, warm_templates, warm_translations,
+                     warm_database):
+            start = time.monotonic()
+            step()
+            timings[step.__name__] = (time.monotonic() - start) * 1000
+    return timings
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk',
+        'name',
+        'priority',
+        'status',
+        'attempts',
+        'run_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
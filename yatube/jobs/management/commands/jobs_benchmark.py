@@ -0,0 +1,49 @@
+import io
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from jobs.models import Job
+from jobs.queue import enqueue
+from jobs.tasks import sleep
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет постановку в очередь и выполнение пустых задач '
+        'при разном числе процессов и потоков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument(
+            '--io', type=float, default=0,
+            help='Сколько секунд «ждет» каждая задача.',
+        )
+        parser.add_argument(
+            '--configs', default='1x1,1x4,4x1,4x4',
+            help='Варианты «процессы x потоки» через запятую.',
+        )
+
+    def handle(self, *args, **options):
+        for config in options['configs'].split(','):
+            processes, threads = map(int, config.split('x'))
+            started = time.perf_counter()
+            with transaction.atomic():
+                for _ in range(options['jobs']):
+                    enqueue(sleep, [options['io']])
+            queued = time.perf_counter() - started
+            started = time.perf_counter()
+            call_command(
+                'run_workers', processes=processes, threads=threads,
+                burst=True, stdout=io.StringIO(),
+            )
+            worked = time.perf_counter() - started
+            left = Job.objects.filter(name=sleep.job_name).count()
+            self.stdout.write(self.style.SUCCESS(
+                f'{config}: в очередь {options["jobs"] / queued:.0f}/с, '
+                f'выполнено {options["jobs"] / worked:.0f}/с, '
+                f'осталось {left}.'
+            ))
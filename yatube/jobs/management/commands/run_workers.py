@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import work
+
+
+def serve(threads, batch_size, burst, results=None):
+    """Обработчик процесса; SIGTERM и SIGINT дают дописать задачи."""
+    stop = threading.Event()
+    for number in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(number, lambda *args: stop.set())
+    counts = work(threads, batch_size, burst, stop)
+    if results is not None:
+        results.put(counts)
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1)
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Процессов, в каждом --threads потоков.',
+        )
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда очередь опустеет.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        worker_options = (
+            options['threads'], options['batch_size'], options['burst']
+        )
+        if options['processes'] == 1:
+            done, failed = serve(*worker_options)
+        else:
+            done, failed = self.fork(options['processes'], worker_options)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено задач: {done}, с ошибкой: {failed} '
+            f'за {time.perf_counter() - started:.2f} с.'
+        ))
+
+    def fork(self, processes, worker_options):
+        # Соединения с базой не должны достаться потомкам.
+        connections.close_all()
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=serve, args=(*worker_options, results)
+            )
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def forward(number, frame):
+            for worker in workers:
+                if worker.is_alive():
+                    os.kill(worker.pid, signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, forward)
+        signal.signal(signal.SIGINT, forward)
+        for worker in workers:
+            worker.join()
+        counts = [results.get() for _ in range(results.qsize())]
+        return sum(done for done, _ in counts), sum(
+            failed for _, failed in counts
+        )
@@ -0,0 +1,216 @@
+"""Очередь задач в базе без внешнего брокера.
+
+Задача — функция, помеченная @task; enqueue() записывает ее вызов
+в таблицу Job в текущей транзакции, так что обработчик увидит задачу
+только после коммита. manage.py run_workers выполняет задачи.
+
+Обработчик берет задачи пачкой и сдвигает run_at на
+visibility_timeout вперед: это аренда. Захват — условный UPDATE
+(run_at <= сейчас), поэтому два обработчика не возьмут одну задачу
+даже в SQLite без SELECT ... FOR UPDATE; там, где есть SKIP LOCKED,
+он тоже используется. Если обработчик упал, аренда истечет и задачу
+возьмет другой. Выполненные задачи удаляются одним запросом на пачку,
+упавшая повторяется с растущей задержкой, после max_attempts остается
+со статусом FAILED. Запросы после захвата повторяются, если база занята:
+иначе взятые задачи пролежат до конца аренды.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    DatabaseError, OperationalError, connection, transaction,
+)
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+TASKS = {}
+LOCK_RETRIES = 5
+
+logger = logging.getLogger(__name__)
+
+
+def task(func=None, *, priority=0, max_attempts=None):
+    """Регистрирует функцию как задачу; аргументы — параметры по умолчанию.
+
+    Аргументы вызова должны сериализоваться в JSON.
+    """
+    def register(func):
+        func.job_name = f'{func.__module__}.{func.__qualname__}'
+        func.job_priority = priority
+        func.job_max_attempts = max_attempts
+        TASKS[func.job_name] = func
+        return func
+    return register if func is None else register(func)
+
+
+def enqueue(func, args=(), kwargs=None, priority=None, delay=0):
+    """Ставит вызов func(*args, **kwargs) в очередь."""
+    if getattr(func, 'job_name', None) not in TASKS:
+        raise ValueError(f'{func!r} не зарегистрирована через @task.')
+    return Job.objects.create(
+        name=func.job_name,
+        arguments=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+        priority=func.job_priority if priority is None else priority,
+        max_attempts=(
+            func.job_max_attempts or settings.JOBS['max_attempts']
+        ),
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def when_free(query):
+    """Выполняет query(), повторяя его, пока база занята соседом."""
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return query()
+        except OperationalError:
+            if attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(0.01 * 2 ** attempt)
+
+
+def claim(limit, now=None):
+    """Берет в аренду до limit видимых задач, старшие приоритеты первыми."""
+    now = now or timezone.now()
+    visible = Job.objects.filter(
+        status__in=(Job.QUEUED, Job.RUNNING), run_at__lte=now
+    )
+    candidates = visible.order_by('-priority', 'run_at').values_list(
+        'id', flat=True
+    )
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    if skip_locked:
+        candidates = candidates.select_for_update(skip_locked=True)
+    lease = uuid.uuid4().hex
+    while True:
+        # В SQLite чтение и запись в одной транзакции мешают соседним
+        # обработчикам; от двойного захвата защищает условие UPDATE.
+        with transaction.atomic() if skip_locked else nullcontext():
+            ids = list(candidates[:limit])
+            if not ids:
+                return []
+            claimed = visible.filter(id__in=ids).update(
+                status=Job.RUNNING,
+                lease=lease,
+                attempts=F('attempts') + 1,
+                run_at=now + timedelta(
+                    seconds=settings.JOBS['visibility_timeout']
+                ),
+            )
+        if claimed:
+            break
+        # Эти задачи только что забрал сосед: берем следующие.
+    return when_free(lambda: list(
+        Job.objects.filter(lease=lease).order_by('-priority', 'id')
+    ))
+
+
+def retry_delay(attempts):
+    """Секунды до повтора: retry_delay * 2^(n-1), с потолком."""
+    return min(
+        settings.JOBS['retry_delay'] * 2 ** (attempts - 1),
+        settings.JOBS['max_retry_delay'],
+    )
+
+
+def fail(job, error):
+    if job.attempts >= job.max_attempts:
+        changes = {'status': Job.FAILED}
+    else:
+        changes = {
+            'status': Job.QUEUED,
+            'run_at': timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            ),
+        }
+    # Аренда могла истечь, и задачу уже взял другой обработчик.
+    when_free(lambda: Job.objects.filter(pk=job.pk, lease=job.lease).update(
+        lease='', last_error=error[:2000], **changes
+    ))
+
+
+def run(job):
+    """Выполняет задачу; False — если она упала и отложена."""
+    func = TASKS.get(job.name)
+    if func is None:
+        fail(job, f'Задача {job.name} не зарегистрирована.')
+        return False
+    if job.attempts > job.max_attempts:
+        # Аренды истекали, пока задача выполнялась: дальше не пробуем.
+        fail(job, 'Истекла аренда последней попытки.')
+        return False
+    arguments = json.loads(job.arguments)
+    try:
+        func(*arguments['args'], **arguments['kwargs'])
+    except Exception as error:
+        fail(job, f'{type(error).__name__}: {error}')
+        return False
+    return True
+
+
+def run_batch(jobs):
+    """Выполняет пачку одной аренды; выполненные удаляет одним запросом."""
+    if not jobs:
+        return 0, 0
+    done = [job.pk for job in jobs if run(job)]
+    when_free(
+        Job.objects.filter(pk__in=done, lease=jobs[0].lease).delete
+    )
+    return len(done), len(jobs) - len(done)
+
+
+def work_loop(counts, batch_size, burst, stop):
+    try:
+        while not stop.is_set():
+            try:
+                jobs = claim(batch_size)
+                if jobs:
+                    done, failed = run_batch(jobs)
+                    counts[0] += done
+                    counts[1] += failed
+                    continue
+            except DatabaseError as error:
+                # Занятая SQLite или оборванное соединение не должны
+                # останавливать поток: недоделанное вернется с арендой.
+                logger.warning('Ошибка базы в обработчике: %s', error)
+                connection.close()
+            else:
+                if burst:
+                    return
+            stop.wait(settings.JOBS['poll_interval'])
+    finally:
+        connection.close()
+
+
+def work(threads=1, batch_size=None, burst=False, stop=None):
+    """Обработчик на threads потоках; возвращает (успешно, с ошибкой).
+
+    В режиме burst выходит, когда очередь опустела, иначе — по stop.
+    """
+    batch_size = batch_size or settings.JOBS['batch_size']
+    stop = stop or threading.Event()
+    counts = [[0, 0] for _ in range(threads)]
+    workers = [
+        threading.Thread(
+            target=work_loop, args=(count, batch_size, burst, stop)
+        )
+        for count in counts
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        while any(worker.is_alive() for worker in workers):
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+    return tuple(map(sum, zip(*counts)))
@@ -0,0 +1,9 @@
+import time
+
+from .queue import task
+
+
+@task
+def sleep(seconds):
+    """Пустая задача: нагрузка для jobs_benchmark."""
+    time.sleep(seconds)
@@ -0,0 +1,85 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim, enqueue, run_batch, task, work
+
+CALLS = []
+
+
+@task
+def remember(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('сбой')
+
+
+class QueueTests(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def test_priority_and_delay(self):
+        """Сначала старшие приоритеты; отложенная задача не видна."""
+        enqueue(remember, ['обычная'])
+        enqueue(remember, ['срочная'], priority=5)
+        enqueue(remember, ['позже'], delay=60)
+        jobs = claim(10)
+        self.assertEqual(len(jobs), 2)
+        self.assertEqual(run_batch(jobs), (2, 0))
+        self.assertEqual(CALLS, ['срочная', 'обычная'])
+        self.assertEqual(claim(10), [])
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_lease(self):
+        """Взятая задача не видна, пока не истечет аренда."""
+        enqueue(remember, [1])
+        first, = claim(10)
+        self.assertEqual(claim(10), [])
+        later = timezone.now() + timedelta(hours=1)
+        second, = claim(10, now=later)
+        self.assertEqual(second.attempts, 2)
+        # Первый обработчик опоздал: его аренда уже не действует.
+        self.assertEqual(run_batch([first]), (1, 0))
+        self.assertTrue(Job.objects.filter(pk=second.pk).exists())
+        self.assertEqual(run_batch([second]), (1, 0))
+        self.assertFalse(Job.objects.exists())
+
+    def test_retries(self):
+        """Упавшая задача откладывается, после max_attempts — FAILED."""
+        job = enqueue(explode)
+        self.assertEqual(run_batch(claim(10)), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('RuntimeError: сбой', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_batch(claim(10)), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(claim(10, now=timezone.now() + timedelta(days=1)),
+                         [])
+
+    def test_unregistered(self):
+        with self.assertRaises(ValueError):
+            enqueue(print)
+
+
+@override_settings(JOBS=dict(settings.JOBS, poll_interval=0.01))
+class WorkerTests(TransactionTestCase):
+    def test_threads(self):
+        """Каждая задача выполнена ровно один раз, очередь пуста."""
+        CALLS.clear()
+        for number in range(50):
+            enqueue(remember, [number])
+        self.assertEqual(
+            work(threads=4, batch_size=3, burst=True), (50, 0)
+        )
+        self.assertEqual(Counter(CALLS), Counter(range(50)))
+        self.assertFalse(Job.objects.exists())
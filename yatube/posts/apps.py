@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        if settings.FOLLOW_GRAPH['enabled'] and not settings.CACHE_SHARED:
+            # Журнал изменений графа в LocMemCache не виден соседям:
+            # каждый воркер видел бы только свои подписки.
+            raise ImproperlyConfigured(
+                'FOLLOW_GRAPH требует общего для воркеров кеша '
+                '(CACHE_LOCATION или CACHE_SHARED=1).'
+            )
+        from . import signals  # noqa: F401
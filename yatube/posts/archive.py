@@ -0,0 +1,168 @@
+"""Холодный архив постов (manage.py archive_posts).
+
+Посты старше порога вместе с комментариями переносятся пачками
+в ArchivedPost и ArchivedComment с теми же id. Горячие таблицы
+и их индексы остаются маленькими, а лента, подписки и группы
+работают только с ними. Страница поста и профиль смотрят в обе
+таблицы: find_post() и TieredPosts.
+"""
+import heapq
+from itertools import islice
+
+from django.db import DatabaseError, connection, transaction
+from django.shortcuts import get_object_or_404
+from django.utils.functional import cached_property
+
+from .models import (ArchivedComment, ArchivedPost, Comment, Mention,
+                     Notification, Post, PostTag, TrendingPost)
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'group_id', 'author_id', 'image')
+COMMENT_FIELDS = ('id', 'post_id', 'author_id', 'text', 'pub_date')
+
+
+def find_post(post_id):
+    """Пост из горячей таблицы или из архива; 404, если нет нигде."""
+    post = Post.objects.select_related('author', 'group').filter(
+        id=post_id
+    ).first()
+    if post is None:
+        post = get_object_or_404(
+            ArchivedPost.objects.select_related('author', 'group'),
+            id=post_id,
+        )
+    return post
+
+
+class TieredPosts:
+    """Посты из двух таблиц для Paginator по убыванию (pub_date, id).
+
+    Обычно архивные старше любого горячего, и страница — срез одной
+    таблицы или стык двух. Если таблицы перекрываются по датам
+    (импорт старых постов после архивации), страница собирается
+    слиянием первых stop строк каждой таблицы.
+    """
+
+    def __init__(self, hot, archived):
+        self.hot = hot.order_by('-pub_date', '-id')
+        self.archived = archived.order_by('-pub_date', '-id')
+
+    @cached_property
+    def hot_count(self):
+        return self.hot.count()
+
+    @cached_property
+    def disjoint(self):
+        """Самый новый архивный пост старше самого старого горячего."""
+        oldest = self.hot.values_list('pub_date', 'id').last()
+        newest = self.archived.values_list('pub_date', 'id').first()
+        return oldest is None or newest is None or newest < oldest
+
+    def count(self):
+        return self.hot_count + self.archived.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        start, stop = index.start or 0, index.stop
+        if not self.disjoint:
+            stop = self.count() if stop is None else stop
+            return list(islice(heapq.merge(
+                self.hot[:stop], self.archived[:stop],
+                key=lambda post: (post.pub_date, post.id), reverse=True,
+            ), start, stop))
+        items = []
+        if start < self.hot_count:
+            items = list(self.hot[start:stop])
+        if stop is None or stop > self.hot_count:
+            items += list(self.archived[
+                max(start - self.hot_count, 0):
+                None if stop is None else stop - self.hot_count
+            ])
+        return items
+
+
+def author_posts(author):
+    return TieredPosts(
+        author.posts.select_related('author', 'group'),
+        author.archived_posts.select_related('author', 'group'),
+    )
+
+
+def delete_rows(model, ids):
+    """DELETE по id в обход Collector.
+
+    Сигналы Post здесь не нужны, а зависимые строки уже удалены.
+    """
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+            f'WHERE id IN ({placeholders})',
+            ids,
+        )
+
+
+def archive_batch(cutoff, chunk_size):
+    """Переносит до chunk_size постов старше cutoff.
+
+    Возвращает (постов, комментариев); (0, 0) — переносить нечего.
+    Пост, чей id в архиве уже занят, остается в горячей таблице:
+    вставка без ignore_conflicts, и удаляется только скопированное.
+    """
+    ids = list(
+        Post.objects.filter(pub_date__lt=cutoff)
+        .exclude(id__in=ArchivedPost.objects.values('id'))
+        .order_by('id').values_list('id', flat=True)[:chunk_size]
+    )
+    if not ids:
+        return 0, 0
+    with transaction.atomic():
+        posts = Post.objects.filter(id__in=ids).values(*POST_FIELDS)
+        ArchivedPost.objects.bulk_create(
+            [ArchivedPost(**row) for row in posts]
+        )
+        archived_comments = [
+            ArchivedComment(**row) for row in Comment.objects.filter(
+                post_id__in=ids
+            ).values(*COMMENT_FIELDS)
+        ]
+        ArchivedComment.objects.bulk_create(archived_comments)
+        # Комментарий, добавленный после выборки, не удаляется молча:
+        # на нем споткнется внешний ключ, и пачка откатится.
+        Comment.objects.filter(
+            id__in=[comment.id for comment in archived_comments]
+        ).delete()
+        Notification.objects.filter(post_id__in=ids).delete()
+        TrendingPost.objects.filter(post_id__in=ids).delete()
+        PostTag.objects.filter(post_id__in=ids).delete()
+        Mention.objects.filter(post_id__in=ids).delete()
+        delete_rows(Post, ids)
+    return len(ids), len(archived_comments)
+
+
+def table_sizes(names):
+    """Размер таблиц и их индексов в байтах (SQLite с dbstat), иначе {}."""
+    if connection.vendor != 'sqlite':
+        return {}
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                'SELECT tbl_name, name FROM sqlite_master '
+                "WHERE type IN ('table', 'index') AND tbl_name IN "
+                f"({', '.join(['%s'] * len(names))})",
+                names,
+            )
+            owners = dict((name, table) for table, name in cursor.fetchall())
+            cursor.execute(
+                'SELECT name, SUM(pgsize) FROM dbstat GROUP BY name'
+            )
+            sizes = cursor.fetchall()
+        except DatabaseError:
+            return {}
+    result = {name: {'table': 0, 'indexes': 0} for name in names}
+    for name, size in sizes:
+        table = owners.get(name)
+        if table:
+            result[table]['table' if name == table else 'indexes'] += size
+    return result
@@ -0,0 +1,9 @@
+from .utils import unread_count
+
+
+def notifications(request):
+    """Счетчик для шапки; считается, только если шаблон его выводит."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'unread_notifications': lambda: unread_count(user)}
@@ -0,0 +1,116 @@
+"""Выгрузка всего, что опубликовал пользователь.
+
+Посты и комментарии читаются курсором через .iterator(chunk_size)
+и отдаются построчно в JSONL; ZIP собирается на лету в поток
+без перемотки (zipfile пишет дескрипторы данных после файлов),
+картинки копируются в архив блоками. В памяти держится не больше
+одной пачки строк и одного блока файла.
+"""
+import zipfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+BLOCK_SIZE = 64 * 1024
+POST_FIELDS = ('id', 'text', 'pub_date', 'group__slug', 'image')
+COMMENT_FIELDS = ('id', 'post_id', 'text', 'pub_date')
+
+
+def export_rows(author, chunk_size=None):
+    """Посты, затем комментарии автора (с архивными) в порядке id."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    for kind, model, fields in (
+        ('post', Post, POST_FIELDS),
+        ('post', ArchivedPost, POST_FIELDS),
+        ('comment', Comment, COMMENT_FIELDS),
+        ('comment', ArchivedComment, COMMENT_FIELDS),
+    ):
+        rows = model.objects.filter(author=author).order_by('id').values(
+            *fields
+        ).iterator(chunk_size=chunk_size)
+        for row in rows:
+            row['type'] = kind
+            yield row
+
+
+def export_jsonl(author, chunk_size=None):
+    """Строки JSONL в байтах, склеенные в блоки около BLOCK_SIZE."""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    block = []
+    size = 0
+    for row in export_rows(author, chunk_size):
+        line = (encoder.encode(row) + '\n').encode('utf-8')
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            yield b''.join(block)
+            block, size = [], 0
+    if block:
+        yield b''.join(block)
+
+
+class StreamBuffer:
+    """Файл только на запись: zipfile пишет сюда, генератор забирает."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def image_names(author, chunk_size=None):
+    for model in (Post, ArchivedPost):
+        yield from model.objects.filter(author=author).exclude(
+            image=''
+        ).order_by('id').values_list('image', flat=True).iterator(
+            chunk_size=chunk_size
+        )
+
+
+def copy_images(archive, stream, author, chunk_size=None):
+    for name in image_names(author, chunk_size):
+        if not default_storage.exists(name):
+            continue
+        # Картинки уже сжаты: кладем как есть.
+        info = zipfile.ZipInfo(name)
+        info.compress_type = zipfile.ZIP_STORED
+        with default_storage.open(name) as source:
+            with archive.open(info, 'w', force_zip64=True) as target:
+                for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+                    target.write(block)
+                    if stream.size >= BLOCK_SIZE:
+                        yield stream.pop()
+
+
+def export_zip(author, chunk_size=None, images=True):
+    """ZIP с data.jsonl и, если images, оригиналами картинок."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    stream = StreamBuffer()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('data.jsonl', 'w', force_zip64=True) as data:
+            for block in export_jsonl(author, chunk_size):
+                data.write(block)
+                if stream.size >= BLOCK_SIZE:
+                    yield stream.pop()
+        if images:
+            yield from copy_images(archive, stream, author, chunk_size)
+    yield stream.pop()
+
+
+def export_filename(author, archive):
+    return f'{author.username}.{"zip" if archive else "jsonl"}'
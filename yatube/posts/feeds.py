@@ -0,0 +1,167 @@
+"""RSS и Atom ленты: весь сайт, группа, автор.
+
+У каждой ленты есть метка в кеше — время последнего изменения ее
+постов. Сигналы Post обновляют метки (touch_feeds), а из метки
+получаются ETag и Last-Modified. Поэтому ответ 304 на повторный
+опрос не обращается к базе, а готовый XML лежит в кеше под ключом
+с меткой и устаревает сам, как только метка сменится. Без общего
+кеша метки и XML живут FEED_LOCAL_CACHE_TIMEOUT секунд: сброс
+из другого процесса сюда не дойдет.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatechars
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date
+
+from .models import Group, Post, User
+
+STAMP_KEY = 'feed:stamp:{}'
+BODY_KEY = 'feed:body:{}:{}:{}'
+
+
+def feed_scopes(post, group_slug=None):
+    """Метки лент, в которые попадает пост."""
+    scopes = ['index', f'author:{post.author.username}']
+    if post.group_id:
+        scopes.append(f'group:{post.group.slug}')
+    if group_slug:
+        scopes.append(f'group:{group_slug}')
+    return scopes
+
+
+def feed_timeout():
+    if settings.CACHE_SHARED:
+        return settings.FEED_CACHE_TIMEOUT
+    return settings.FEED_LOCAL_CACHE_TIMEOUT
+
+
+def touch_feeds(scopes):
+    now = timezone.now()
+    cache.set_many(
+        {STAMP_KEY.format(scope): now for scope in scopes}, feed_timeout()
+    )
+
+
+def feed_stamp(scope):
+    """Метка ленты; если ее вытеснили, лента считается измененной сейчас."""
+    key = STAMP_KEY.format(scope)
+    stamp = cache.get(key)
+    if stamp is None:
+        stamp = timezone.now()
+        if not cache.add(key, stamp, feed_timeout()):
+            stamp = cache.get(key, stamp)
+    return stamp
+
+
+class LatestPostsFeed(Feed):
+    title = 'Yatube: последние записи'
+    description = 'Новые посты всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def posts(self, obj):
+        return Post.objects.select_related('author', 'group')
+
+    def items(self, obj):
+        return self.posts(obj)[:settings.FEED_ITEMS]
+
+    def item_title(self, item):
+        return truncatechars(item.text, 60)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group_id else []
+
+
+class GroupFeed(LatestPostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def posts(self, obj):
+        return obj.posts.select_related('author', 'group')
+
+
+class AuthorFeed(LatestPostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Посты пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def posts(self, obj):
+        return obj.posts.select_related('author', 'group')
+
+
+def atom(feed_class):
+    """Atom-вариант ленты: тот же класс с другим генератором."""
+    return type(f'Atom{feed_class.__name__}', (feed_class,), {
+        'feed_type': Atom1Feed,
+        'subtitle': feed_class.description,
+    })
+
+
+def cached_feed(feed_class, scope):
+    """View ленты с условным GET и кешем XML.
+
+    scope — шаблон метки, например 'group:{slug}'.
+    """
+    feed = feed_class()
+    name = feed_class.__name__
+
+    def view(request, **kwargs):
+        label = scope.format(**kwargs)
+        stamp = feed_stamp(label)
+        etag = f'"{name}-{stamp.timestamp():.6f}"'
+        last_modified = int(stamp.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = BODY_KEY.format(name, label, stamp.timestamp())
+            cached = cache.get(key)
+            if cached is None:
+                response = feed(request, **kwargs)
+                cache.set(
+                    key, (response.content, response['Content-Type']),
+                    feed_timeout(),
+                )
+            else:
+                response = HttpResponse(cached[0], content_type=cached[1])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+    return view
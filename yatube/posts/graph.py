@@ -0,0 +1,282 @@
+"""Граф подписок в памяти процесса.
+
+Подписки хранятся в двух CSR-массивах NumPy, индексированных id
+пользователя: для каждого пользователя — отсортированные id авторов,
+на которых он подписан, и для каждого автора — отсортированные id
+подписчиков. is_following() — бинарный поиск в срезе.
+
+Граф строится из posts_follow или читается через mmap из снимка
+(manage.py follow_graph snapshot): страницы файла общие для всех
+воркеров. Подписки и отписки после снимка сигналы пишут в журнал
+в кеше; каждый процесс перед чтением догоняет журнал и держит
+изменения в небольшом наложении поверх массивов. Если запись журнала
+вытеснена из кеша, граф загружается заново.
+
+Граф читают потоки воркера без блокировки, поэтому он не меняется
+на месте: наложение подменяется целиком одной парой frozenset,
+а сжатие строит новый граф, который get_graph() ставит вместо старого.
+"""
+import os
+import struct
+import threading
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Follow
+
+VERSION_KEY = 'follow_graph:version'
+CHANGE_KEY = 'follow_graph:change:{}'
+MAGIC = b'YTFG'
+HEADER = struct.Struct('<4s4xqqq')
+INDPTR = np.int64
+INDICES = np.int32
+
+_lock = threading.Lock()
+_graph = None
+
+
+def csr(owners, members, size):
+    """indptr и отсортированные внутри строк члены для пар (owner, member)."""
+    order = np.lexsort((members, owners))
+    indptr = np.zeros(size + 1, INDPTR)
+    np.cumsum(np.bincount(owners, minlength=size), out=indptr[1:])
+    return indptr, members[order].astype(INDICES)
+
+
+class FollowGraph:
+    def __init__(self, following_indptr, following, followers_indptr,
+                 followers, version=0):
+        self.following_indptr = following_indptr
+        self.following_ids = following
+        self.followers_indptr = followers_indptr
+        self.followers_ids = followers
+        self.version = version
+        # (добавленные, удаленные) пары (подписчик, автор).
+        self.overlay = (frozenset(), frozenset())
+
+    @property
+    def added(self):
+        return self.overlay[0]
+
+    @property
+    def removed(self):
+        return self.overlay[1]
+
+    @classmethod
+    def from_pairs(cls, pairs, version=0):
+        """Граф из массива пар (user_id, author_id)."""
+        pairs = np.asarray(pairs, np.int64).reshape(-1, 2)
+        size = int(pairs.max()) + 1 if len(pairs) else 0
+        users, authors = pairs[:, 0], pairs[:, 1]
+        return cls(
+            *csr(users, authors, size), *csr(authors, users, size),
+            version=version,
+        )
+
+    @classmethod
+    def from_database(cls, chunk_size=10000):
+        version = cache.get(VERSION_KEY, 0)
+        rows = Follow.objects.order_by().values_list(
+            'user_id', 'author_id'
+        ).iterator(chunk_size=chunk_size)
+        return cls.from_pairs(
+            np.fromiter(chain.from_iterable(rows), np.int64), version
+        )
+
+    @property
+    def size(self):
+        return len(self.following_indptr) - 1
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.following_indptr, self.following_ids,
+            self.followers_indptr, self.followers_ids,
+        ))
+
+    def _row(self, indptr, indices, pk):
+        if not 0 <= pk < self.size:
+            return indices[:0]
+        return indices[indptr[pk]:indptr[pk + 1]]
+
+    def is_following(self, user_id, author_id):
+        added, removed = self.overlay
+        if (user_id, author_id) in added:
+            return True
+        if (user_id, author_id) in removed:
+            return False
+        row = self._row(self.following_indptr, self.following_ids, user_id)
+        index = np.searchsorted(row, author_id)
+        return bool(index < len(row) and row[index] == author_id)
+
+    def _members(self, indptr, indices, pk, position):
+        row = self._row(indptr, indices, pk)
+        added, removed = self.overlay
+        if not added and not removed:
+            return row
+        # Пара изменения: (подписчик, автор); position — сторона ответа.
+        added = [pair[position] for pair in added if pair[1 - position] == pk]
+        removed = [
+            pair[position] for pair in removed if pair[1 - position] == pk
+        ]
+        row = np.setdiff1d(row, removed, assume_unique=True)
+        return np.union1d(row, np.array(added, INDICES))
+
+    def following(self, user_id):
+        """Отсортированные id авторов, на которых подписан user_id."""
+        return self._members(
+            self.following_indptr, self.following_ids, user_id, 1
+        )
+
+    def followers(self, author_id):
+        """Отсортированные id подписчиков author_id."""
+        return self._members(
+            self.followers_indptr, self.followers_ids, author_id, 0
+        )
+
+    def common_following(self, user_id, other_id):
+        return np.intersect1d(
+            self.following(user_id), self.following(other_id),
+            assume_unique=True,
+        )
+
+    def common_followers(self, author_id, other_id):
+        return np.intersect1d(
+            self.followers(author_id), self.followers(other_id),
+            assume_unique=True,
+        )
+
+    def apply(self, changes):
+        """Накладывает изменения на копию наложения и подменяет его."""
+        added, removed = map(set, self.overlay)
+        for follows, user_id, author_id in changes:
+            pair = (user_id, author_id)
+            if follows:
+                removed.discard(pair)
+                added.add(pair)
+            else:
+                added.discard(pair)
+                removed.add(pair)
+        self.overlay = (frozenset(added), frozenset(removed))
+
+    def compact(self):
+        """Новый граф с наложением в массивах: O(E), вызывается изредка."""
+        counts = np.diff(self.following_indptr)
+        users = np.repeat(np.arange(self.size, dtype=np.int64), counts)
+        authors = np.asarray(self.following_ids, np.int64)
+        removed = np.array(
+            [(user << 32) | author for user, author in self.removed],
+            np.int64,
+        )
+        keep = ~np.isin((users << 32) | authors, removed)
+        pairs = np.concatenate((
+            np.column_stack((users[keep], authors[keep])),
+            np.array(list(self.added), np.int64).reshape(-1, 2),
+        ))
+        return FollowGraph.from_pairs(np.unique(pairs, axis=0), self.version)
+
+    def sync(self):
+        """Догоняет журнал изменений; False, если журнал неполон."""
+        current = cache.get(VERSION_KEY, 0)
+        if current < self.version:
+            return False
+        if current == self.version:
+            return True
+        keys = [
+            CHANGE_KEY.format(number)
+            for number in range(self.version + 1, current + 1)
+        ]
+        changes = cache.get_many(keys)
+        if len(changes) < len(keys):
+            return False
+        self.apply(changes[key] for key in keys)
+        self.version = current
+        return True
+
+    def needs_compaction(self):
+        return sum(map(len, self.overlay)) > settings.FOLLOW_GRAPH[
+            'max_overlay'
+        ]
+
+    def save(self, path):
+        """Записывает снимок атомарно: воркеры со старым mmap не заметят."""
+        graph = self.compact() if any(self.overlay) else self
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'wb') as snapshot:
+            snapshot.write(HEADER.pack(
+                MAGIC, graph.version, graph.size, len(graph.following_ids)
+            ))
+            for array, dtype in (
+                (graph.following_indptr, INDPTR),
+                (graph.followers_indptr, INDPTR),
+                (graph.following_ids, INDICES),
+                (graph.followers_ids, INDICES),
+            ):
+                snapshot.write(np.ascontiguousarray(array, dtype).tobytes())
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Открывает снимок через mmap, без копирования в память."""
+        with open(path, 'rb') as snapshot:
+            magic, version, size, edges = HEADER.unpack(
+                snapshot.read(HEADER.size)
+            )
+        if magic != MAGIC:
+            raise ValueError(f'{path} не является снимком графа подписок')
+        arrays = []
+        offset = HEADER.size
+        for dtype, length in (
+            (INDPTR, size + 1), (INDPTR, size + 1),
+            (INDICES, edges), (INDICES, edges),
+        ):
+            arrays.append(np.memmap(
+                path, dtype, mode='r', offset=offset, shape=(length,)
+            ) if length else np.zeros(0, dtype))
+            offset += np.dtype(dtype).itemsize * length
+        following_indptr, followers_indptr, following, followers = arrays
+        return cls(
+            following_indptr, following, followers_indptr, followers,
+            version,
+        )
+
+
+def record_change(follows, user_id, author_id):
+    """Дописывает подписку или отписку в журнал (posts.signals)."""
+    cache.add(VERSION_KEY, 0, None)
+    version = cache.incr(VERSION_KEY)
+    cache.set(
+        CHANGE_KEY.format(version), (follows, user_id, author_id),
+        settings.FOLLOW_GRAPH['log_timeout'],
+    )
+
+
+def build_graph():
+    path = settings.FOLLOW_GRAPH['snapshot']
+    if path and os.path.exists(path):
+        graph = FollowGraph.load(path)
+        if graph.sync():
+            return graph
+    graph = FollowGraph.from_database()
+    graph.sync()
+    return graph
+
+
+def get_graph():
+    """Граф процесса, догнавший журнал изменений."""
+    global _graph
+    with _lock:
+        if _graph is None or not _graph.sync():
+            _graph = build_graph()
+        if _graph.needs_compaction():
+            _graph = _graph.compact()
+        return _graph
+
+
+def reset_graph():
+    global _graph
+    with _lock:
+        _graph = None
@@ -0,0 +1,275 @@
+"""Массовый импорт постов и комментариев (manage.py import_posts).
+
+Записи читаются из JSONL или CSV и вставляются через bulk_create
+пачками, каждая пачка — в своей транзакции. id из источника
+сохраняются (со сдвигом id_offset), поэтому комментарии ссылаются
+на посты без промежуточной таблицы, а повтор уже вставленной пачки
+после сбоя ничего не дублирует, в том числе если пачку уже перенес
+в архив archive_posts. Если id занят чужой строкой в горячей таблице
+или в архиве, импорт останавливается (IdConflict), а не смешивает данные.
+
+Формат записи:
+    {"type": "post", "id": 1, "author": "leo", "group": "cats",
+     "text": "...", "pub_date": "2019-01-01T10:00:00Z",
+     "image": "path/relative/to/media-dir.jpg"}
+    {"type": "comment", "id": 7, "post": 1, "author": "leo",
+     "text": "...", "pub_date": "..."}
+"""
+import csv
+import json
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import (ArchivedComment, ArchivedPost, Comment, Group, Post,
+                     User)
+from .tags import index_posts
+
+
+def read_records(path, file_format=None):
+    """Пары (номер строки, запись) из JSONL или CSV."""
+    file_format = file_format or (
+        'csv' if path.endswith('.csv') else 'jsonl'
+    )
+    with open(path, encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            yield from enumerate(csv.DictReader(source), 1)
+            return
+        for number, line in enumerate(source, 1):
+            if line.strip():
+                yield number, json.loads(line)
+
+
+def parse_date(value):
+    """Дата из источника; наивная считается в TIME_ZONE."""
+    date = parse_datetime(value) if value else None
+    if date is None:
+        return timezone.now()
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+@contextmanager
+def keep_pub_date(*models):
+    """Отключает auto_now_add, чтобы pub_date из источника сохранился."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def store_image(media_dir, name):
+    """Проверяет картинку и кладет в хранилище; выполняется в пуле.
+
+    Возвращает имя в хранилище или '' для битого или пропавшего файла.
+    """
+    from PIL import Image
+
+    path = os.path.join(media_dir, name)
+    target = f'posts/{os.path.basename(name)}'
+    try:
+        # Пачка, повторенная после сбоя, не плодит копии файлов.
+        if default_storage.exists(target) and default_storage.size(
+            target
+        ) == os.path.getsize(path):
+            return target
+        with Image.open(path) as image:
+            image.verify()
+        with open(path, 'rb') as source:
+            return default_storage.save(target, File(source))
+    except (OSError, SyntaxError, ValueError):
+        return ''
+
+
+def reset_sequences():
+    """После вставки с явными id сдвигает счетчики id в PostgreSQL и т.п."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [Post, Comment]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+class IdConflict(Exception):
+    """Id из источника (со сдвигом) занят строкой не из этого импорта."""
+
+
+class Importer:
+    def __init__(self, id_offset=0, create_missing=False, media_dir=None,
+                 pool=None):
+        self.id_offset = id_offset
+        self.create_missing = create_missing
+        self.media_dir = media_dir
+        self.pool = pool
+        self.authors = dict(User.objects.values_list('username', 'id'))
+        self.groups = dict(Group.objects.values_list('slug', 'id'))
+        self.touched_groups = set()
+        self.touched_authors = set()
+        self.skipped = 0
+
+    def resolve(self, records):
+        """Заводит недостающих авторов и группы одним запросом на пачку."""
+        usernames = {record['author'] for record in records} - set(
+            self.authors
+        )
+        slugs = {
+            record['group'] for record in records if record.get('group')
+        } - set(self.groups)
+        if not self.create_missing or not (usernames or slugs):
+            return
+        User.objects.bulk_create(
+            [
+                User(username=name, password=make_password(None))
+                for name in usernames
+            ],
+            ignore_conflicts=True,
+        )
+        self.authors.update(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'id'))
+        Group.objects.bulk_create(
+            [Group(slug=slug, title=slug, description='') for slug in slugs],
+            ignore_conflicts=True,
+        )
+        self.groups.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'id')
+        )
+
+    def images(self, records):
+        names = [record.get('image') or '' for record in records]
+        if not self.media_dir or not any(names):
+            return [''] * len(records)
+        wanted = [name for name in names if name]
+        if self.pool is None:
+            stored = [store_image(self.media_dir, name) for name in wanted]
+        else:
+            stored = list(self.pool.map(
+                store_image, [self.media_dir] * len(wanted), wanted,
+                chunksize=8,
+            ))
+        stored = iter(stored)
+        return [next(stored) if name else '' for name in names]
+
+    def build_posts(self, records):
+        posts = []
+        for record, image in zip(records, self.images(records)):
+            author_id = self.authors.get(record['author'])
+            if author_id is None:
+                self.skipped += 1
+                continue
+            self.touched_authors.add(author_id)
+            group_id = self.groups.get(record.get('group') or '')
+            if group_id:
+                self.touched_groups.add(group_id)
+            posts.append(Post(
+                id=int(record['id']) + self.id_offset,
+                author_id=author_id,
+                group_id=group_id,
+                text=record['text'],
+                pub_date=parse_date(record.get('pub_date')),
+                image=image,
+            ))
+        return posts
+
+    def build_comments(self, records):
+        comments = []
+        for record in records:
+            author_id = self.authors.get(record['author'])
+            if author_id is None:
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                id=int(record['id']) + self.id_offset,
+                post_id=int(record['post']) + self.id_offset,
+                author_id=author_id,
+                text=record['text'],
+                pub_date=parse_date(record.get('pub_date')),
+            ))
+        return comments
+
+    def feed_scopes(self):
+        """Метки лент (posts.feeds), в которые попали импортированные посты."""
+        usernames = {pk: name for name, pk in self.authors.items()}
+        slugs = {pk: slug for slug, pk in self.groups.items()}
+        return ['index'] + [
+            f'author:{usernames[pk]}' for pk in self.touched_authors
+        ] + [f'group:{slugs[pk]}' for pk in self.touched_groups]
+
+    def fresh(self, models, rows, fields):
+        """Строки, которых еще нет ни в одной из таблиц models.
+
+        Горячая таблица и архив делят id: пост, перенесенный
+        archive_posts, тоже занимает свой id. Совпадающие по fields —
+        этот же импорт, повтор пачки: их пропускаем. Id, занятый
+        чужой строкой, — IdConflict.
+        """
+        ids = [row.id for row in rows]
+        existing = {}
+        for model in models:
+            existing.update(
+                (row[0], row[1:]) for row in model.objects.filter(
+                    id__in=ids
+                ).values_list('id', *fields)
+            )
+        clashes = [
+            row.id for row in rows if row.id in existing
+            and existing[row.id] != tuple(getattr(row, f) for f in fields)
+        ]
+        if clashes:
+            raise IdConflict(
+                f'{models[0]._meta.verbose_name_plural}: id '
+                f'{", ".join(map(str, clashes[:5]))} уже заняты'
+            )
+        return [row for row in rows if row.id not in existing]
+
+    def attached(self, comments, posts):
+        """Комментарии к постам из пачки или из базы; прочие пропускает."""
+        known = {post.id for post in posts}
+        missing = {comment.post_id for comment in comments} - known
+        known.update(
+            Post.objects.filter(id__in=missing).values_list('id', flat=True)
+        )
+        kept = [comment for comment in comments if comment.post_id in known]
+        # Повтор пачки, которую уже перенесли в архив, — не пропуск.
+        archived = ArchivedComment.objects.filter(id__in=[
+            comment.id for comment in comments
+            if comment.post_id not in known
+        ]).count()
+        self.skipped += len(comments) - len(kept) - archived
+        return kept
+
+    def insert(self, records):
+        """Вставляет пачку в одной транзакции; возвращает число новых строк."""
+        self.resolve(records)
+        posts = self.build_posts(
+            [record for record in records if record['type'] == 'post']
+        )
+        comments = self.attached(self.build_comments(
+            [record for record in records if record['type'] == 'comment']
+        ), posts)
+        posts = self.fresh(
+            (Post, ArchivedPost), posts, ('author_id', 'text')
+        )
+        comments = self.fresh(
+            (Comment, ArchivedComment), comments,
+            ('post_id', 'author_id', 'text'),
+        )
+        with keep_pub_date(Post, Comment), transaction.atomic():
+            Post.objects.bulk_create(posts, ignore_conflicts=True)
+            Comment.objects.bulk_create(comments, ignore_conflicts=True)
+            # Только новые строки: связи чужих постов не трогаем.
+            index_posts(posts, fresh=True)
+        return len(posts) + len(comments)
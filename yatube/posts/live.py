@@ -0,0 +1,187 @@
+"""Новые посты без перезагрузки страницы: long-poll и Server-Sent Events.
+
+Клиент присылает курсор (pub_date, id) последнего увиденного поста.
+Курсор самого свежего поста — водяной знак — хранится в памяти
+процесса: сигнал Post сдвигает его после коммита и будит ждущие
+запросы. Пока знак не дальше курсора клиента, ответ готовится без
+базы. О постах из других процессов процесс узнает не чаще раза
+в LIVE_UPDATES['refresh'] секунд: из общего кеша (CACHE_SHARED),
+а без него — одним запросом к базе на процесс, не на клиента.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import Post
+
+CURSOR_KEY = 'live:latest'
+ZERO = (datetime(1970, 1, 1, tzinfo=dt_timezone.utc), 0)
+MICROSECOND = timedelta(microseconds=1)
+# Больший id не поместится в BIGINT базы.
+MAX_ID = 2 ** 63 - 1
+
+
+def encode_cursor(cursor):
+    """(pub_date, id) -> 'микросекунды.id', безопасно для адреса."""
+    pub_date, pk = cursor
+    return f'{(pub_date - ZERO[0]) // MICROSECOND}.{pk}'
+
+
+def decode_cursor(value):
+    """Обратное encode_cursor(); None для пустого или битого курсора."""
+    micros, _, pk = (value or '').partition('.')
+    if not (micros.isdigit() and pk.isdigit()) or int(pk) > MAX_ID:
+        return None
+    try:
+        return ZERO[0] + int(micros) * MICROSECOND, int(pk)
+    except (OverflowError, ValueError):
+        # Дата за пределами datetime.
+        return None
+
+
+class Watermark:
+    """Курсор самого свежего поста и ожидание его сдвига."""
+
+    def __init__(self):
+        self.latest = None
+        self.synced_at = 0
+        self.condition = threading.Condition()
+
+    def advance(self, cursor):
+        with self.condition:
+            if self.latest is None or cursor > self.latest:
+                self.latest = cursor
+                self.condition.notify_all()
+
+    def sync(self, force=False):
+        """Подтягивает курсор из общего кеша; при пустом — из базы."""
+        now = time.monotonic()
+        if not force and now - self.synced_at < settings.LIVE_UPDATES[
+            'refresh'
+        ]:
+            return
+        self.synced_at = now
+        if not settings.CACHE_SHARED:
+            # Свой LocMemCache у процесса не видит чужих публикаций.
+            self.advance(latest_cursor())
+            return
+        cursor = cache.get(CURSOR_KEY)
+        if cursor is None:
+            cursor = latest_cursor()
+            cache.add(CURSOR_KEY, cursor, None)
+        self.advance(cursor)
+
+    def current(self):
+        if self.latest is None:
+            self.sync(force=True)
+        else:
+            self.sync()
+        return self.latest
+
+    def wait_past(self, cursor, timeout):
+        """Ждет поста новее cursor до timeout секунд; True — дождались."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.current() <= cursor:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(
+                    min(remaining, settings.LIVE_UPDATES['refresh'])
+                )
+        return True
+
+
+watermark = Watermark()
+shared_results = {}
+shared_lock = threading.Lock()
+
+
+def latest_cursor():
+    post = Post.objects.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id'
+    ).first()
+    return post or ZERO
+
+
+def publish(cursor):
+    """Сдвигает знак в этом процессе и в кеше для остальных."""
+    watermark.advance(cursor)
+    shared = cache.get(CURSOR_KEY)
+    if shared is None or cursor > shared:
+        cache.set(CURSOR_KEY, cursor, None)
+
+
+def query_newer(cursor, latest, user=None):
+    pub_date, pk = cursor
+    posts = Post.objects.filter(
+        Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk)
+    )
+    if user is not None:
+        posts = posts.filter(author__following__user=user)
+    limit = settings.LIVE_UPDATES['max_posts']
+    posts = list(
+        posts.select_related('author', 'group').order_by('pub_date', 'id')
+        [:limit]
+    )
+    if posts:
+        last = (posts[-1].pub_date, posts[-1].id)
+        latest = last if len(posts) == limit else max(latest, last)
+    return [post_data(post) for post in posts], latest
+
+
+def newer_posts(cursor, user=None):
+    """Посты новее cursor (словари post_data) и курсор продолжения.
+
+    Если постов больше max_posts, отдается первая часть, и клиент
+    сразу спрашивает снова. Новый пост будит всех ждущих разом; для
+    общей ленты у них один и тот же курсор, поэтому запрос к базе
+    делает первый, а остальные берут его результат.
+    """
+    latest = watermark.current()
+    if user is not None:
+        return query_newer(cursor, latest, user)
+    key = (cursor, latest)
+    with shared_lock:
+        if key not in shared_results:
+            if len(shared_results) >= 100:
+                shared_results.clear()
+            shared_results[key] = query_newer(cursor, latest)
+        return shared_results[key]
+
+
+def post_data(post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'url': reverse('posts:post_detail', args=[post.id]),
+    }
+
+
+def stream_events(cursor, user=None):
+    """События SSE: пачки новых постов, между ними — пинги."""
+    options = settings.LIVE_UPDATES
+    deadline = time.monotonic() + options['stream_duration']
+    yield f'retry: {options["retry"] * 1000}\n\n'
+    while time.monotonic() < deadline:
+        if not watermark.wait_past(cursor, options['heartbeat']):
+            # Комментарий держит соединение живым через прокси.
+            yield ': ping\n\n'
+            continue
+        posts, cursor = newer_posts(cursor, user)
+        if posts:
+            data = json.dumps(posts, ensure_ascii=False)
+            yield (
+                f'id: {encode_cursor(cursor)}\nevent: posts\n'
+                f'data: {data}\n\n'
+            )
@@ -0,0 +1,68 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from posts.archive import archive_batch, table_sizes
+
+TABLES = [
+    'posts_post', 'posts_comment',
+    'posts_archivedpost', 'posts_archivedcomment',
+]
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты с комментариями в архивные таблицы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int,
+            help='Возраст поста в днях; по умолчанию из ARCHIVE.',
+        )
+        parser.add_argument('--chunk-size', type=int)
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='Пауза между пачками в секундах.',
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='SQLite: пересобрать файл, чтобы освободить место.',
+        )
+
+    def handle(self, *args, **options):
+        days = options['older_than'] or settings.ARCHIVE['older_than_days']
+        chunk_size = options['chunk_size'] or settings.ARCHIVE['chunk_size']
+        cutoff = timezone.now() - timedelta(days=days)
+        self.report('До переноса')
+        started = time.perf_counter()
+        total_posts = total_comments = 0
+        while True:
+            posts, comments = archive_batch(cutoff, chunk_size)
+            if not posts:
+                break
+            total_posts += posts
+            total_comments += comments
+            time.sleep(options['pause'])
+        elapsed = time.perf_counter() - started
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+        self.report('После переноса')
+        self.stdout.write(self.style.SUCCESS(
+            f'В архив перенесено постов: {total_posts}, комментариев: '
+            f'{total_comments} за {elapsed:.1f} с.'
+        ))
+
+    def report(self, title):
+        sizes = table_sizes(TABLES)
+        if not sizes:
+            return
+        self.stdout.write(f'{title}:')
+        for table, size in sizes.items():
+            self.stdout.write(
+                f'  {table}: данные {size["table"] / 2 ** 20:.1f} МБ, '
+                f'индексы {size["indexes"] / 2 ** 20:.1f} МБ'
+            )
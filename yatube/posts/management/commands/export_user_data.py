@@ -0,0 +1,64 @@
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import export_jsonl, export_zip
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты и комментарии пользователя в JSONL или ZIP '
+        'и сообщает скорость и пиковый RSS.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument(
+            '--output', '-o', help='Файл; по умолчанию stdout.'
+        )
+        parser.add_argument('--zip', action='store_true')
+        parser.add_argument(
+            '--no-images', action='store_true',
+            help='Не класть картинки в ZIP.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}')
+        if options['zip']:
+            blocks = export_zip(
+                author, options['chunk_size'],
+                images=not options['no_images'],
+            )
+        else:
+            blocks = export_jsonl(author, options['chunk_size'])
+        output = (
+            open(options['output'], 'wb') if options['output']
+            else sys.stdout.buffer
+        )
+        start = time.monotonic()
+        size = 0
+        try:
+            for block in blocks:
+                output.write(block)
+                size += len(block)
+        finally:
+            if options['output']:
+                output.close()
+        elapsed = time.monotonic() - start
+        # ru_maxrss в Linux — в килобайтах, в macOS — в байтах.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            peak *= 1024
+        rows = author.posts.count() + author.comments.count()
+        self.stderr.write(self.style.SUCCESS(
+            f'{rows} строк, {size / 2 ** 20:.1f} МБ за {elapsed:.1f} с '
+            f'({rows / max(elapsed, 1e-6):,.0f} строк/с), '
+            f'пиковый RSS процесса {peak / 2 ** 20:.1f} МБ.'
+        ))
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = (
+        'snapshot — записывает снимок графа подписок для mmap в воркерах; '
+        'benchmark — память и скорость графа на случайных подписках.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('snapshot', 'benchmark'))
+        parser.add_argument('--path', default=None)
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--edges', type=int, default=5_000_000)
+        parser.add_argument('--lookups', type=int, default=100_000)
+        parser.add_argument(
+            '--compare-sets', action='store_true',
+            help='Замерить и словарь множеств Python (медленно).',
+        )
+
+    def handle(self, *args, **options):
+        if options['action'] == 'snapshot':
+            self.snapshot(options['path'] or settings.FOLLOW_GRAPH['snapshot'])
+        else:
+            self.benchmark(options)
+
+    def snapshot(self, path):
+        start = time.monotonic()
+        graph = FollowGraph.from_database()
+        graph.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок {path}: {len(graph.following_ids)} подписок, '
+            f'{graph.nbytes / 2 ** 20:.1f} МБ, версия журнала '
+            f'{graph.version}, {(time.monotonic() - start):.1f} с.'
+        ))
+
+    def timed(self, label, function, *args):
+        start = time.monotonic()
+        result = function(*args)
+        self.stdout.write(f'{label}: {(time.monotonic() - start):.2f} с')
+        return result
+
+    def benchmark(self, options):
+        random = np.random.default_rng(0)
+        users, edges = options['users'], options['edges']
+        # Популярность авторов по Ципфу, как в реальных соцсетях.
+        authors = np.minimum(random.zipf(1.5, edges) - 1, users - 1)
+        pairs = np.unique(
+            np.column_stack((random.integers(0, users, edges), authors)),
+            axis=0,
+        )
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        self.stdout.write(f'{len(pairs)} подписок, {users} пользователей')
+        graph = self.timed('Построение', FollowGraph.from_pairs, pairs)
+        self.stdout.write(f'Массивы: {graph.nbytes / 2 ** 20:.1f} МБ')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.bin')
+            self.timed('Запись снимка', graph.save, path)
+            loaded = self.timed('Открытие через mmap', FollowGraph.load, path)
+            self.lookups(loaded, pairs, options['lookups'])
+            del loaded
+        if options['compare_sets']:
+            self.sets(pairs)
+
+    def lookups(self, graph, pairs, count):
+        random = np.random.default_rng(1)
+        sample = pairs[random.integers(0, len(pairs), count)].tolist()
+        start = time.monotonic()
+        for user_id, author_id in sample:
+            graph.is_following(user_id, author_id)
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f'is_following: {count / elapsed:,.0f} проверок/с'
+        )
+        start = time.monotonic()
+        for user_id, author_id in sample[:1000]:
+            graph.common_followers(author_id, user_id)
+        self.stdout.write(
+            f'common_followers: '
+            f'{(time.monotonic() - start):.3f} с на 1000 пар'
+        )
+
+    def sets(self, pairs):
+        tracemalloc.start()
+        following = defaultdict(set)
+        followers = defaultdict(set)
+        for user_id, author_id in pairs.tolist():
+            following[user_id].add(author_id)
+            followers[author_id].add(user_id)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.stdout.write(
+            f'Словарь множеств Python: {size / 2 ** 20:.1f} МБ'
+        )
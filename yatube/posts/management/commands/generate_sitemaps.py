@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.sitemaps import generate_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Пишет sitemap.xml и сжатые файлы карты сайта в SITEMAP_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--root', help='Каталог вместо SITEMAP_ROOT.')
+        parser.add_argument('--base-url', help='Адрес сайта вместо SITE_URL.')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        counts = generate_sitemaps(
+            root=options['root'],
+            base_url=options['base_url'],
+            chunk_size=options['chunk_size'],
+        )
+        sections = ', '.join(
+            f'{section}: {count}' for section, count in counts.items()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Карта сайта готова ({sections}) '
+            f'за {(time.monotonic() - start):.1f} с.'
+        ))
@@ -0,0 +1,131 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.feeds import touch_feeds
+from posts.importer import (IdConflict, Importer, read_records,
+                            reset_sequences)
+from posts.live import latest_cursor, publish
+from posts.models import GroupStats
+from posts.months import rebuild_months
+from posts.utils import GROUP_DIRECTORY_KEY
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты и комментарии из JSONL или CSV пачками '
+        'bulk_create. Формат записей — в posts.importer.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--media-dir', help='Каталог с картинками из поля image.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессы для обработки картинок.',
+        )
+        parser.add_argument(
+            '--id-offset', type=int, default=0,
+            help='Сдвиг id из источника, если таблицы не пусты.',
+        )
+        parser.add_argument(
+            '--create-missing', action='store_true',
+            help='Создавать неизвестных авторов и группы.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней вставленной строки.',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать сначала, не глядя на checkpoint.',
+        )
+
+    def read_checkpoint(self, path):
+        if not os.path.exists(path):
+            return 0
+        with open(path) as checkpoint:
+            return json.load(checkpoint)['line']
+
+    def write_checkpoint(self, path, line):
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump({'line': line}, checkpoint)
+        os.replace(temporary, path)
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint'] or f'{options["source"]}.checkpoint'
+        done = 0 if options['restart'] else self.read_checkpoint(checkpoint)
+        if done:
+            self.stdout.write(f'Продолжаем после строки {done}.')
+        pool = None
+        if options['media_dir'] and options['workers'] > 1:
+            pool = ProcessPoolExecutor(options['workers'])
+        importer = Importer(
+            id_offset=options['id_offset'],
+            create_missing=options['create_missing'],
+            media_dir=options['media_dir'],
+            pool=pool,
+        )
+        start = time.monotonic()
+        total = 0
+        batch = []
+        last = done
+        try:
+            for number, record in read_records(
+                options['source'], options['format']
+            ):
+                if number <= done:
+                    continue
+                batch.append(record)
+                last = number
+                if len(batch) >= options['batch_size']:
+                    total += self.flush(importer, batch, checkpoint, last)
+                    batch = []
+                    self.progress(total, start)
+            if batch:
+                total += self.flush(importer, batch, checkpoint, last)
+        except IdConflict as error:
+            self.finish(importer, total, start)
+            raise CommandError(
+                f'{error}: задайте --id-offset больше наибольшего id.'
+            )
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        self.finish(importer, total, start)
+
+    def flush(self, importer, batch, checkpoint, last):
+        count = importer.insert(batch)
+        self.write_checkpoint(checkpoint, last)
+        return count
+
+    def progress(self, total, start):
+        elapsed = time.monotonic() - start
+        self.stdout.write(
+            f'{total} записей, {total / max(elapsed, 1e-6):,.0f} в секунду'
+        )
+
+    def finish(self, importer, total, start):
+        # bulk_create не шлет сигналы: счетчики пересчитываем сами.
+        for group_id in importer.touched_groups:
+            GroupStats.refresh(group_id)
+        cache.delete(GROUP_DIRECTORY_KEY)
+        touch_feeds(importer.feed_scopes())
+        rebuild_months()
+        publish(latest_cursor())
+        reset_sequences()
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано {total} записей за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-6):,.0f} в секунду), '
+            f'пропущено без автора или поста: {importer.skipped}.'
+        ))
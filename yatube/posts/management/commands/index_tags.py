@@ -0,0 +1,40 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max, Min
+
+from posts.models import Post
+from posts.tags import index_range
+
+
+class Command(BaseCommand):
+    help = (
+        'Разбирает хештеги и упоминания в уже сохраненных постах '
+        'пачками по диапазонам id, при --processes > 1 параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=1)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        bounds = Post.objects.aggregate(first=Min('id'), last=Max('id'))
+        total = 0
+        if bounds['first'] is not None:
+            size = options['chunk_size']
+            starts = range(bounds['first'], bounds['last'] + 1, size)
+            stops = [start + size for start in starts]
+            if options['processes'] == 1:
+                total = sum(map(index_range, starts, stops))
+            else:
+                # Соединения с базой не должны достаться потомкам.
+                connections.close_all()
+                with ProcessPoolExecutor(options['processes']) as pool:
+                    total = sum(pool.map(index_range, starts, stops))
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано постов: {total} за '
+            f'{time.perf_counter() - started:.2f} с.'
+        ))
@@ -0,0 +1,108 @@
+import resource
+import selectors
+import socket
+import socketserver
+import statistics
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+
+from posts.live import encode_cursor, watermark
+from posts.models import Post, User
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 4096
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест /live/: тысячи ждущих long-poll клиентов '
+        'на многопоточном сервере, затем один новый пост.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=2000)
+        parser.add_argument(
+            '--idle', type=float, default=5,
+            help='Сколько секунд клиенты ждут без новых постов.',
+        )
+
+    def handle(self, *args, **options):
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def watch(sender, connection, **kwargs):
+            connection.execute_wrappers.append(count_queries)
+
+        author, _ = User.objects.get_or_create(username='live-benchmark')
+        cursor = encode_cursor(watermark.current())
+        connection_created.connect(watch)
+        server = make_server(
+            '127.0.0.1', 0, WSGIHandler(),
+            server_class=ThreadingServer, handler_class=QuietHandler,
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        request = (
+            f'GET /live/?after={cursor}&wait=60 HTTP/1.0\r\n'
+            f'Host: localhost\r\n\r\n'
+        ).encode()
+        clients = selectors.DefaultSelector()
+        started = time.perf_counter()
+        for _ in range(options['clients']):
+            client = socket.create_connection(('127.0.0.1', port))
+            client.sendall(request)
+            clients.register(client, selectors.EVENT_READ, [])
+        connected = time.perf_counter() - started
+        time.sleep(options['idle'])
+        idle_queries = len(queries)
+        threads = threading.active_count()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        published = time.perf_counter()
+        post = Post.objects.create(author=author, text='live benchmark')
+        latencies, answered = self.collect(clients, published, post.pk)
+        post.delete()
+        server.shutdown()
+        connection_created.disconnect(watch)
+        self.stdout.write(self.style.SUCCESS(
+            f'{options["clients"]} клиентов подключены за {connected:.2f} с, '
+            f'потоков: {threads}, RSS {rss:.0f} МБ; '
+            f'за {options["idle"]:.0f} с ожидания запросов к базе: '
+            f'{idle_queries}.\n'
+            f'Пост получили {answered} клиентов: медиана '
+            f'{statistics.median(latencies) * 1000:.0f} мс, максимум '
+            f'{max(latencies) * 1000:.0f} мс; запросов к базе после '
+            f'публикации: {len(queries) - idle_queries}.'
+        ))
+
+    def collect(self, clients, published, post_id):
+        """Читает ответы; задержка — от публикации до конца ответа."""
+        latencies = []
+        answered = 0
+        marker = f'"id": {post_id}'.encode()
+        while clients.get_map():
+            for key, _ in clients.select(timeout=30):
+                data = key.fileobj.recv(65536)
+                if data:
+                    key.data.append(data)
+                    continue
+                latencies.append(time.perf_counter() - published)
+                answered += marker in b''.join(key.data)
+                clients.unregister(key.fileobj)
+                key.fileobj.close()
+        return latencies, answered
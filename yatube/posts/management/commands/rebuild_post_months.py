@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.months import rebuild_months
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает помесячные счетчики постов (PostMonth) '
+        'по постам и архиву.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_months()
+        self.stdout.write(self.style.SUCCESS(
+            f'Счетчиков месяцев: {count} за '
+            f'{time.perf_counter() - started:.2f} с.'
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import update_follow_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рекомендации «кого читать» по графу подписок.'
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        count = update_follow_suggestions()
+        self.stdout.write(self.style.SUCCESS(
+            f'Сохранено {count} рекомендаций, '
+            f'расчет занял {(time.monotonic() - start) * 1000:.0f} мс.'
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинг популярных постов для /trending/.'
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        count = update_trending()
+        self.stdout.write(self.style.SUCCESS(
+            f'В рейтинге {count} постов, '
+            f'расчет занял {(time.monotonic() - start) * 1000:.0f} мс.'
+        ))
@@ -0,0 +1,39 @@
+from django.db import migrations
+from django.db.models import Count, DateField
+from django.db.models.functions import TruncMonth
+
+
+def fill_post_months(apps, schema_editor):
+    PostMonth = apps.get_model('posts', 'PostMonth')
+    counts = {}
+    for name in ('Post', 'ArchivedPost'):
+        model = apps.get_model('posts', name)
+        for field, prefix in ((None, ''), ('author_id', 'author:'),
+                              ('group_id', 'group:')):
+            rows = model.objects.annotate(
+                month=TruncMonth('pub_date', output_field=DateField())
+            ).values(*['month'] + ([field] if field else [])).annotate(
+                count=Count('id')
+            ).order_by()
+            for row in rows:
+                if field and row[field] is None:
+                    continue
+                scope = prefix + (str(row[field]) if field else '')
+                key = (scope, row['month'])
+                counts[key] = counts.get(key, 0) + row['count']
+    PostMonth.objects.all().delete()
+    PostMonth.objects.bulk_create(
+        PostMonth(scope=scope, month=month, count=count)
+        for (scope, month), count in counts.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_tags_mentions'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_post_months, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, F, Max
+from django.db.models.functions import Greatest
 
 User = get_user_model()
 
@@ -26,6 +28,41 @@ class Group(models.Model):
         return self.title
 
 
+class GroupStats(models.Model):
+    """Счетчики группы. Обновляются сигналами Post (posts.signals)."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа',
+    )
+    post_count = models.PositiveIntegerField('Число постов', default=0)
+    last_post_at = models.DateTimeField(
+        'Последний пост',
+        null=True,
+        blank=True,
+        db_index=True,
+    )
+
+    @classmethod
+    def refresh(cls, group_id):
+        """Пересчитывает счетчики группы по постам и архиву."""
+        stats = Post.objects.filter(group_id=group_id).aggregate(
+            post_count=Count('id'),
+            last_post_at=Max('pub_date'),
+        )
+        archived = ArchivedPost.objects.filter(group_id=group_id).aggregate(
+            post_count=Count('id'),
+            last_post_at=Max('pub_date'),
+        )
+        stats['post_count'] += archived['post_count']
+        stats['last_post_at'] = (
+            stats['last_post_at'] or archived['last_post_at']
+        )
+        cls.objects.update_or_create(group_id=group_id, defaults=stats)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         'Текст поста',
@@ -57,6 +94,12 @@ class Post(CreatedModel):
 
     class Meta:
         ordering = ['-pub_date']
+        # Архив группы и автора по датам (posts.months) — диапазоны
+        # по этим индексам.
+        indexes = [
+            models.Index(fields=['group', '-pub_date']),
+            models.Index(fields=['author', '-pub_date']),
+        ]
 
 
 class Comment(CreatedModel):
@@ -99,3 +142,227 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ['user', 'author']
+        # Списки подписчиков и подписок листаются по id (posts.views).
+        indexes = [
+            models.Index(fields=['author', '-id']),
+            models.Index(fields=['user', '-id']),
+        ]
+
+
+class FollowStats(models.Model):
+    """Счетчики подписок пользователя. Обновляются сигналами Follow."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='follow_stats',
+        verbose_name='Пользователь',
+    )
+    followers_count = models.PositiveIntegerField('Подписчики', default=0)
+    following_count = models.PositiveIntegerField('Подписки', default=0)
+
+    @classmethod
+    def refresh(cls, user_id):
+        """Пересчитывает счетчики пользователя по таблице подписок."""
+        cls.objects.update_or_create(user_id=user_id, defaults={
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        })
+
+    @classmethod
+    def shift(cls, user_id, author_id, delta):
+        """Сдвигает счетчики после подписки (delta=1) или отписки (-1).
+
+        Строки нет — при подписке она пересчитывается, а при отписке
+        пользователь, скорее всего, удаляется каскадом: не создаем ее.
+        """
+        for pk, field in (
+            (user_id, 'following_count'), (author_id, 'followers_count'),
+        ):
+            if not cls.objects.filter(user_id=pk).update(
+                **{field: Greatest(F(field) + delta, 0)}
+            ) and delta > 0:
+                cls.refresh(pk)
+
+
+class TrendingPost(models.Model):
+    """Готовый рейтинг популярных постов (manage.py update_trending)."""
+    rank = models.PositiveIntegerField('Место', primary_key=True)
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='trending',
+        verbose_name='Пост',
+    )
+    score = models.FloatField('Рейтинг')
+
+    class Meta:
+        ordering = ['rank']
+
+
+class FollowSuggestion(models.Model):
+    """Рекомендация автора (manage.py update_follow_suggestions)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name='Автор',
+    )
+    score = models.FloatField('Оценка')
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        ordering = ['user', 'rank']
+
+
+class Notification(models.Model):
+    """Новый пост автора, на которого подписан пользователь."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Получатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Пост',
+    )
+    is_read = models.BooleanField('Прочитано', default=False)
+
+    class Meta:
+        ordering = ['-id']
+        # Повтор рассылки после сбоя не дублирует уведомления.
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-id']),
+            models.Index(fields=['user', 'is_read']),
+        ]
+
+
+class ArchivedPost(models.Model):
+    """Пост старше ARCHIVE['older_than_days'] (manage.py archive_posts).
+
+    id сохраняется, поэтому адрес поста не меняется.
+    """
+    archived = True
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField('Текст поста')
+    pub_date = models.DateTimeField('Дата публикации')
+    group = models.ForeignKey(
+        Group,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+        verbose_name='Группа',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts',
+        verbose_name='Автор',
+    )
+    image = models.ImageField('Картинка', upload_to='posts/', blank=True)
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+            models.Index(fields=['author', '-pub_date']),
+        ]
+
+    def __str__(self):
+        return self.text[:15]
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к архивному посту."""
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='Автор',
+    )
+    text = models.TextField('Текст комментария')
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+
+
+class PostMonth(models.Model):
+    """Число постов за месяц на сайте (scope ''), в группе или у автора.
+
+    scope — '', 'group:<id>' или 'author:<id>'. Обновляется сигналами
+    Post (posts.months); manage.py rebuild_post_months считает заново.
+    """
+    scope = models.CharField('Область', max_length=40)
+    month = models.DateField('Месяц')
+    count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        unique_together = ['scope', 'month']
+
+
+class Tag(models.Model):
+    """Хештег в нижнем регистре, без '#'."""
+    name = models.CharField('Тег', max_length=50, unique=True)
+    posts = models.ManyToManyField(
+        Post,
+        through='PostTag',
+        related_name='tags',
+        verbose_name='Посты',
+    )
+
+    def __str__(self):
+        return f'#{self.name}'
+
+
+class PostTag(models.Model):
+    """Хештег в тексте поста; ведет posts.tags.index_posts()."""
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+
+    class Meta:
+        # Индекс (tag, post) отдает ленту тега по убыванию id поста.
+        unique_together = ['tag', 'post']
+
+
+class Mention(models.Model):
+    """Упоминание @username в тексте поста."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Упомянутый',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Пост',
+    )
+
+    class Meta:
+        unique_together = ['user', 'post']
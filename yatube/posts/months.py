@@ -0,0 +1,169 @@
+"""Архив по датам: /archive/<год>/[<месяц>/] для сайта, группы, автора.
+
+Страница — диапазон pub_date, который читается по индексу
+(pub_date или составному с группой/автором) с курсором ?before
+вместо OFFSET из горячей таблицы и ArchivedPost со слиянием.
+Гистограмма по месяцам хранится в PostMonth: миграция 0022 заполняет
+ее, сигналы Post сдвигают счетчики, а в кеше лежит готовый список
+для боковой панели.
+"""
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DateField, F, Q
+from django.db.models.functions import Greatest, TruncMonth
+from django.urls import reverse
+from django.utils import timezone
+
+from .live import decode_cursor, encode_cursor
+from .models import ArchivedPost, Post, PostMonth
+
+MONTHS_KEY = 'months:{}'
+
+
+def month_of(pub_date):
+    return timezone.localtime(pub_date).date().replace(day=1)
+
+
+def post_scopes(post):
+    """Гистограммы, в которые входит пост: сайт, автор, группа."""
+    scopes = ['', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def shift_months(scopes, month, delta):
+    """Сдвигает счетчики месяца на delta и сбрасывает их кеш.
+
+    Ниже нуля счетчик не уходит, а для уменьшения строки не заводятся:
+    пост мог появиться до подсчета (bulk_create, старая база).
+    """
+    with transaction.atomic():
+        if delta > 0:
+            PostMonth.objects.bulk_create(
+                [PostMonth(scope=scope, month=month) for scope in scopes],
+                ignore_conflicts=True,
+            )
+        PostMonth.objects.filter(scope__in=scopes, month=month).update(
+            count=Greatest(F('count') + delta, 0)
+        )
+    cache.delete_many([MONTHS_KEY.format(scope) for scope in scopes])
+
+
+def rebuild_months():
+    """Пересчитывает все гистограммы по обеим таблицам постов."""
+    counts = {}
+    for model in (Post, ArchivedPost):
+        for field, prefix in ((None, ''), ('author', 'author:'),
+                              ('group', 'group:')):
+            fields = ['month'] + ([f'{field}_id'] if field else [])
+            rows = model.objects.annotate(
+                month=TruncMonth('pub_date', output_field=DateField())
+            ).values(*fields).annotate(count=Count('id')).order_by()
+            for row in rows:
+                if field and row[f'{field}_id'] is None:
+                    continue
+                scope = prefix + (str(row[f'{field}_id']) if field else '')
+                key = (scope, row['month'])
+                counts[key] = counts.get(key, 0) + row['count']
+    with transaction.atomic():
+        PostMonth.objects.all().delete()
+        PostMonth.objects.bulk_create(
+            PostMonth(scope=scope, month=month, count=count)
+            for (scope, month), count in counts.items()
+        )
+    cache.delete_many(
+        [MONTHS_KEY.format(scope) for scope in {key[0] for key in counts}]
+    )
+    return len(counts)
+
+
+def month_histogram(scope):
+    """[(первое число месяца, постов)] по убыванию месяца, из кеша."""
+    key = MONTHS_KEY.format(scope)
+    months = cache.get(key)
+    if months is None:
+        months = list(
+            PostMonth.objects.filter(scope=scope, count__gt=0)
+            .order_by('-month').values_list('month', 'count')
+        )
+        cache.set(
+            key, months,
+            settings.MONTH_ARCHIVE_CACHE_TIMEOUT if settings.CACHE_SHARED
+            else settings.MONTH_ARCHIVE_LOCAL_TIMEOUT,
+        )
+    return months
+
+
+def date_range(year, month=None):
+    """Границы [начало, конец) года или месяца в текущем часовом поясе."""
+    if month is None:
+        start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    else:
+        start = datetime(year, month, 1)
+        end = start + timedelta(days=monthrange(year, month)[1])
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def range_page(filters, start, end, request, size=None):
+    """Посты из [start, end) по убыванию даты, страница после ?before.
+
+    Горячие и архивные посты могут чередоваться по дате (импорт старых
+    постов после архивации), поэтому берем по size + 1 из каждой
+    таблицы и сливаем по (pub_date, id).
+    """
+    size = size or settings.POSTS_COUNT
+    cursor = decode_cursor(request.GET.get('before'))
+    items = []
+    for model in (Post, ArchivedPost):
+        posts = model.objects.filter(
+            pub_date__gte=start, pub_date__lt=end, **filters
+        )
+        if cursor:
+            posts = posts.filter(
+                Q(pub_date__lt=cursor[0])
+                | Q(pub_date=cursor[0], id__lt=cursor[1])
+            )
+        items += posts.select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )[:size + 1]
+    items.sort(key=lambda post: (post.pub_date, post.id), reverse=True)
+    next_before = None
+    if len(items) > size:
+        last = items[size - 1]
+        next_before = encode_cursor((last.pub_date, last.id))
+    return {'items': items[:size], 'next_before': next_before}
+
+
+def valid_month(year, month):
+    return 1 <= year < 9999 and (month is None or 1 <= month <= 12)
+
+
+def archive_url(year, month=None, slug=None, username=None):
+    prefix = 'group_' if slug else 'profile_' if username else ''
+    kwargs = {'year': year}
+    if month:
+        kwargs['month'] = month
+    if slug:
+        kwargs['slug'] = slug
+    if username:
+        kwargs['username'] = username
+    period = 'month' if month else 'year'
+    return reverse(f'posts:{prefix}archive_{period}', kwargs=kwargs)
+
+
+def archive_links(scope, slug=None, username=None):
+    """Боковая панель: месяцы со ссылками, свежие сверху."""
+    return [
+        {
+            'month': month,
+            'count': count,
+            'url': archive_url(month.year, month.month, slug, username),
+            'year_url': archive_url(month.year, None, slug, username),
+        }
+        for month, count in month_histogram(scope)
+    ]
@@ -0,0 +1,120 @@
+"""Рекомендации «кого читать» по графу подписок.
+
+Подписки загружаются в разреженную матрицу A (подписчик × автор).
+Для пачки строк R считаются две оценки кандидатов:
+
+    друзья друзей:  A[R] @ A
+    общие подписки: S @ A, где S = A[R] @ A.T, нормированная
+                    на корни из числа подписок обоих пользователей
+
+Авторы, у которых больше FOLLOW_SUGGESTIONS['popular_limit'] подписчиков,
+не учитываются при поиске похожих читателей: иначе S для пачки
+становится почти плотной. Уже прочитанные авторы и сам пользователь
+отбрасываются, лучшие FOLLOW_SUGGESTIONS['count'] пишутся
+в FollowSuggestion.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from .models import Follow, FollowSuggestion
+
+
+def load_graph():
+    """id пользователей и матрица подписок в их порядковых номерах."""
+    pairs = np.array(
+        list(Follow.objects.order_by().values_list('user_id', 'author_id')),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    ids, index = np.unique(pairs, return_inverse=True)
+    index = index.reshape(-1, 2)
+    graph = sparse.csr_matrix(
+        (np.ones(len(index), np.float32), (index[:, 0], index[:, 1])),
+        shape=(len(ids), len(ids)),
+    )
+    return ids, graph
+
+
+def weights(graph, options=None):
+    """Маска не слишком популярных авторов и нормы строк для S."""
+    options = options or settings.FOLLOW_SUGGESTIONS
+    followers = np.asarray(graph.sum(axis=0)).ravel()
+    following = np.asarray(graph.sum(axis=1)).ravel()
+    return (
+        sparse.diags((followers <= options['popular_limit']).astype(
+            np.float32
+        )),
+        1 / np.sqrt(np.maximum(following, 1)),
+    )
+
+
+def score(graph, rows, mask, norm, options=None):
+    """Разреженная матрица оценок кандидатов для строк rows."""
+    options = options or settings.FOLLOW_SUGGESTIONS
+    chunk = graph[rows]
+    friends = chunk @ graph
+    similar = (
+        sparse.diags(norm[rows]) @ (chunk @ mask @ graph.T)
+        @ sparse.diags(norm)
+    ).tocsr()
+    # Сам с собой пользователь похож всегда, эта пара не нужна.
+    positions = np.arange(len(rows))
+    similar = similar - sparse.csr_matrix(
+        (similar[positions, rows].A1, (positions, rows)), shape=similar.shape
+    )
+    similar.eliminate_zeros()
+    return (
+        options['friends_weight'] * friends
+        + options['cofollow_weight'] * (similar @ graph)
+    ).tocsr(), chunk
+
+
+def best(scores, chunk, position, row, limit):
+    """Лучшие кандидаты строки без своих подписок и себя самого."""
+    start, end = scores.indptr[position], scores.indptr[position + 1]
+    authors = scores.indices[start:end]
+    values = scores.data[start:end]
+    followed = chunk.indices[
+        chunk.indptr[position]:chunk.indptr[position + 1]
+    ]
+    keep = (authors != row) & ~np.isin(authors, followed) & (values > 0)
+    authors, values = authors[keep], values[keep]
+    if len(authors) > limit:
+        top = np.argpartition(-values, limit - 1)[:limit]
+        authors, values = authors[top], values[top]
+    order = np.argsort(-values, kind='stable')
+    return authors[order], values[order]
+
+
+def update_follow_suggestions(options=None):
+    """Пересчитывает рекомендации пачками по chunk_size пользователей."""
+    options = options or settings.FOLLOW_SUGGESTIONS
+    ids, graph = load_graph()
+    mask, norm = weights(graph, options)
+    total = 0
+    FollowSuggestion.objects.exclude(
+        user_id__in=Follow.objects.values('user_id')
+    ).delete()
+    for start in range(0, len(ids), options['chunk_size']):
+        rows = np.arange(start, min(start + options['chunk_size'], len(ids)))
+        scores, chunk = score(graph, rows, mask, norm, options)
+        suggestions = []
+        for position, row in enumerate(rows):
+            authors, values = best(
+                scores, chunk, position, row, options['count']
+            )
+            suggestions.extend(
+                FollowSuggestion(
+                    user_id=int(ids[row]), author_id=int(ids[author]),
+                    score=float(value), rank=rank,
+                )
+                for rank, (author, value) in enumerate(zip(authors, values), 1)
+            )
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(
+                user_id__in=ids[rows].tolist()
+            ).delete()
+            FollowSuggestion.objects.bulk_create(suggestions)
+        total += len(suggestions)
+    return total
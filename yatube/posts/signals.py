@@ -0,0 +1,174 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+
+from .feeds import feed_scopes, touch_feeds
+from .live import publish
+from .models import Follow, FollowStats, Group, GroupStats, Post
+from .months import month_of, post_scopes, shift_months
+from .tags import index_posts
+from .tasks import make_thumbnails, notify_followers
+from .utils import GROUP_DIRECTORY_KEY
+
+
+@receiver(pre_save, sender=Post)
+def remember_group(sender, instance, raw, **kwargs):
+    """Запоминает прежние группу, картинку и текст поста."""
+    if instance.pk and not raw:
+        (
+            instance._previous_group_id,
+            instance._previous_image,
+            instance._previous_text,
+        ) = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first() or (None, None, None)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        if instance.group_id:
+            stats = GroupStats.objects.filter(group_id=instance.group_id)
+            if not stats.update(post_count=F('post_count') + 1):
+                GroupStats.refresh(instance.group_id)
+            stats.filter(
+                Q(last_post_at__isnull=True)
+                | Q(last_post_at__lt=instance.pub_date)
+            ).update(last_post_at=instance.pub_date)
+    else:
+        previous = getattr(instance, '_previous_group_id', None)
+        if previous == instance.group_id:
+            return
+        for group_id in (previous, instance.group_id):
+            if group_id:
+                GroupStats.refresh(group_id)
+    cache.delete(GROUP_DIRECTORY_KEY)
+
+
+@receiver(post_save, sender=Post)
+def count_post_month(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    month = month_of(instance.pub_date)
+    if created:
+        shift_months(post_scopes(instance), month, 1)
+        return
+    previous = getattr(instance, '_previous_group_id', None)
+    if previous != instance.group_id:
+        if previous:
+            shift_months([f'group:{previous}'], month, -1)
+        if instance.group_id:
+            shift_months([f'group:{instance.group_id}'], month, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post_month(sender, instance, **kwargs):
+    shift_months(post_scopes(instance), month_of(instance.pub_date), -1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    if instance.group_id and Group.objects.filter(
+        pk=instance.group_id
+    ).exists():
+        GroupStats.refresh(instance.group_id)
+        cache.delete(GROUP_DIRECTORY_KEY)
+
+
+@receiver(post_save, sender=Post)
+def touch_saved_post_feeds(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_group_id', None)
+    slug = None
+    if previous and previous != instance.group_id:
+        slug = Group.objects.filter(pk=previous).values_list(
+            'slug', flat=True
+        ).first()
+    touch_feeds(feed_scopes(instance, slug))
+
+
+@receiver(post_save, sender=Post)
+def queue_thumbnails(sender, instance, raw, **kwargs):
+    image = instance.image.name
+    if image and not raw and image != getattr(
+        instance, '_previous_image', None
+    ):
+        enqueue(make_thumbnails, [instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def index_post_tags(sender, instance, created, raw, **kwargs):
+    if raw or instance.text == getattr(instance, '_previous_text', None):
+        return
+    index_posts([instance], fresh=created)
+
+
+@receiver(post_save, sender=Post)
+def queue_notifications(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        enqueue(notify_followers, [instance.pk])
+
+
+@receiver(post_save, sender=Post)
+def publish_live(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        transaction.on_commit(
+            lambda: publish((instance.pub_date, instance.pk))
+        )
+
+
+@receiver(post_delete, sender=Post)
+def touch_deleted_post_feeds(sender, instance, **kwargs):
+    touch_feeds(feed_scopes(instance))
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        GroupStats.objects.get_or_create(group=instance)
+    cache.delete(GROUP_DIRECTORY_KEY)
+
+
+@receiver(post_delete, sender=Group)
+def forget_group(sender, instance, **kwargs):
+    cache.delete(GROUP_DIRECTORY_KEY)
+
+
+def log_follow_change(follows, instance):
+    # posts.graph тянет NumPy: импортируем, только когда граф включен.
+    from .graph import record_change
+
+    transaction.on_commit(lambda: record_change(
+        follows, instance.user_id, instance.author_id
+    ))
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        FollowStats.shift(instance.user_id, instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    FollowStats.shift(instance.user_id, instance.author_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def log_follow(sender, instance, created, raw, **kwargs):
+    if created and not raw and settings.FOLLOW_GRAPH['enabled']:
+        log_follow_change(True, instance)
+
+
+@receiver(post_delete, sender=Follow)
+def log_unfollow(sender, instance, **kwargs):
+    if settings.FOLLOW_GRAPH['enabled']:
+        log_follow_change(False, instance)
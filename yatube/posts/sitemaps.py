@@ -0,0 +1,157 @@
+"""Карта сайта для поисковиков (manage.py generate_sitemaps).
+
+Посты, профили и группы читаются диапазонами id (id > последний
+прочитанный, без OFFSET) и сразу пишутся в сжатые файлы по
+SITEMAP_LIMIT адресов. Каждый файл пишется под временным именем
+и подменяется через os.replace(), индекс sitemap.xml — последним,
+так что сервер не отдает недописанных файлов.
+"""
+import gzip
+import os
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ArchivedPost, Group, Post, User
+
+URLSET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+INDEX_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+INDEX_NAME = 'sitemap.xml'
+PLACEHOLDER = '00000000'
+
+
+def keyset(queryset, fields, chunk_size):
+    """Строки (id, *fields) по возрастанию id пачками по chunk_size."""
+    last = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last).order_by('id')
+            .values_list('id', *fields)[:chunk_size]
+        )
+        if not rows:
+            return
+        yield from rows
+        last = rows[-1][0]
+
+
+def url_pattern(name):
+    """reverse() один раз: дальше адреса собираются форматированием."""
+    return reverse(name, args=[PLACEHOLDER]).replace(PLACEHOLDER, '{}')
+
+
+def post_urls(chunk_size):
+    pattern = url_pattern('posts:post_detail')
+    for model in (Post, ArchivedPost):
+        for pk, pub_date in keyset(model.objects, ['pub_date'], chunk_size):
+            yield pattern.format(pk), pub_date
+
+
+def profile_urls(chunk_size):
+    pattern = url_pattern('posts:profile')
+    authors = User.objects.annotate(
+        has_posts=Exists(Post.objects.filter(author=OuterRef('pk'))),
+        has_archived=Exists(
+            ArchivedPost.objects.filter(author=OuterRef('pk'))
+        ),
+    ).filter(Q(has_posts=True) | Q(has_archived=True))
+    for _, username in keyset(authors, ['username'], chunk_size):
+        yield pattern.format(quote(username)), None
+
+
+def group_urls(chunk_size):
+    pattern = url_pattern('posts:group_list')
+    for _, slug, last_post_at in keyset(
+        Group.objects, ['slug', 'stats__last_post_at'], chunk_size
+    ):
+        yield pattern.format(slug), last_post_at
+
+
+SECTIONS = (
+    ('posts', post_urls),
+    ('profiles', profile_urls),
+    ('groups', group_urls),
+)
+
+
+class SitemapWriter:
+    """Пишет адреса раздела в файлы sitemap-<раздел>-<n>.xml.gz."""
+
+    def __init__(self, root, section, limit):
+        self.root = root
+        self.section = section
+        self.limit = limit
+        self.names = []
+        self.file = None
+        self.count = 0
+
+    def open(self):
+        name = f'sitemap-{self.section}-{len(self.names) + 1}.xml.gz'
+        self.names.append(name)
+        self.file = gzip.open(
+            os.path.join(self.root, name + '.tmp'), 'wt', encoding='utf-8'
+        )
+        self.file.write(URLSET_HEAD)
+        self.count = 0
+
+    def add(self, location, lastmod=None):
+        if self.file is None or self.count >= self.limit:
+            self.close()
+            self.open()
+        entry = f'<url><loc>{escape(location)}</loc>'
+        if lastmod:
+            entry += f'<lastmod>{lastmod.date().isoformat()}</lastmod>'
+        self.file.write(entry + '</url>\n')
+        self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.write('</urlset>\n')
+            self.file.close()
+            self.file = None
+
+
+def generate_sitemaps(root=None, base_url=None, limit=None, chunk_size=10000):
+    """Пишет карту сайта; возвращает {раздел: число адресов}."""
+    root = root or settings.SITEMAP_ROOT
+    base_url = (base_url or settings.SITE_URL).rstrip('/')
+    limit = limit or settings.SITEMAP_LIMIT
+    os.makedirs(root, exist_ok=True)
+    counts = {}
+    names = []
+    for section, urls in SECTIONS:
+        writer = SitemapWriter(root, section, limit)
+        counts[section] = 0
+        for path, lastmod in urls(chunk_size):
+            writer.add(base_url + path, lastmod)
+            counts[section] += 1
+        writer.close()
+        names.extend(writer.names)
+    today = timezone.now().date().isoformat()
+    with open(os.path.join(root, INDEX_NAME + '.tmp'), 'w',
+              encoding='utf-8') as index:
+        index.write(INDEX_HEAD)
+        for name in names:
+            index.write(
+                f'<sitemap><loc>{escape(base_url)}/{name}</loc>'
+                f'<lastmod>{today}</lastmod></sitemap>\n'
+            )
+        index.write('</sitemapindex>\n')
+    for name in names + [INDEX_NAME]:
+        os.replace(
+            os.path.join(root, name + '.tmp'), os.path.join(root, name)
+        )
+    # Разделы могли стать короче: лишние файлы прошлых запусков удаляем.
+    for name in os.listdir(root):
+        if name.startswith('sitemap-') and name not in names:
+            os.remove(os.path.join(root, name))
+    return counts
@@ -0,0 +1,92 @@
+"""Хештеги и упоминания в тексте поста.
+
+#тег и @username разбираются при сохранении поста и хранятся
+в PostTag и Mention, поэтому лента тега — выборка по индексу
+(tag, post), а не поиск по тексту. При правке меняется только
+разница со старым набором. Посты, вставленные в обход сигналов,
+индексирует manage.py index_tags. Архивные посты в ленты не входят.
+"""
+import re
+
+from django.db import transaction
+
+from .models import Mention, Post, PostTag, Tag, User
+
+HASHTAG = r'(?<![\w&#])#(\w{1,50})(?!\w)'
+MENTION = r'(?<![\w@])@([\w.+-]*\w)'
+TOKEN = re.compile(f'{HASHTAG}|{MENTION}')
+
+
+def parse(text):
+    """(теги в нижнем регистре, имена пользователей) из текста."""
+    tags, usernames = set(), set()
+    for tag, username in TOKEN.findall(text):
+        if tag:
+            tags.add(tag.lower())
+        else:
+            usernames.add(username)
+    return tags, usernames
+
+
+def sync_links(model, field, wanted, fresh):
+    """Приводит связи постов к wanted: {id поста: {id тега/автора}}."""
+    wanted = {post_id: set(targets) for post_id, targets in wanted.items()}
+    stale = []
+    if not fresh:
+        for pk, post_id, target in model.objects.filter(
+            post_id__in=list(wanted)
+        ).values_list('id', 'post_id', f'{field}_id'):
+            if target in wanted[post_id]:
+                wanted[post_id].discard(target)
+            else:
+                stale.append(pk)
+    if stale:
+        model.objects.filter(id__in=stale).delete()
+    model.objects.bulk_create(
+        [
+            model(post_id=post_id, **{f'{field}_id': target})
+            for post_id, targets in wanted.items()
+            for target in targets
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def index_posts(posts, fresh=False):
+    """Обновляет PostTag и Mention пачки постов по их текстам.
+
+    fresh — посты только что созданы, старых связей у них нет.
+    """
+    parsed = {post.pk: parse(post.text) for post in posts}
+    if fresh and not any(any(found) for found in parsed.values()):
+        return
+    names = set().union(*(tags for tags, _ in parsed.values()))
+    usernames = set().union(*(users for _, users in parsed.values()))
+    with transaction.atomic():
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in names], ignore_conflicts=True
+        )
+        tag_ids = dict(
+            Tag.objects.filter(name__in=names).values_list('name', 'id')
+        )
+        user_ids = dict(
+            User.objects.filter(username__in=usernames)
+            .values_list('username', 'id')
+        )
+        sync_links(PostTag, 'tag', {
+            pk: {tag_ids[name] for name in tags}
+            for pk, (tags, _) in parsed.items()
+        }, fresh)
+        sync_links(Mention, 'user', {
+            pk: {user_ids[name] for name in users if name in user_ids}
+            for pk, (_, users) in parsed.items()
+        }, fresh)
+
+
+def index_range(start, stop):
+    """Индексирует посты с id из [start, stop); возвращает их число."""
+    posts = list(
+        Post.objects.filter(id__gte=start, id__lt=stop).only('id', 'text')
+    )
+    index_posts(posts)
+    return len(posts)
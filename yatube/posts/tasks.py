@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import get_thumbnail
+
+from jobs.queue import task
+
+from .models import Follow, Notification, Post
+from .utils import UNREAD_KEY
+
+
+@task(priority=-1)
+def make_thumbnails(post_id):
+    """Готовит миниатюру заранее, чтобы ее не резала первая страница."""
+    image = Post.objects.filter(pk=post_id).values_list(
+        'image', flat=True
+    ).first()
+    if image:
+        # Те же параметры, что у {% thumbnail %} в шаблонах постов.
+        get_thumbnail(image, '960x339', crop='center', upscale=True)
+
+
+@task
+def notify_followers(post_id):
+    """Уведомления подписчикам автора пачками по chunk_size."""
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None:
+        return
+    followers = Follow.objects.filter(author_id=author_id).order_by('id')
+    last = 0
+    while True:
+        rows = list(followers.filter(id__gt=last).values_list(
+            'id', 'user_id'
+        )[:settings.NOTIFICATIONS['chunk_size']])
+        if not rows:
+            return
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, post_id=post_id)
+             for _, user_id in rows],
+            ignore_conflicts=True,
+        )
+        cache.delete_many([UNREAD_KEY.format(user_id) for _, user_id in rows])
+        last = rows[-1][0]
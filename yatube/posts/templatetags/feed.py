@@ -0,0 +1,36 @@
+from django import template
+from django.template.defaulttags import ForNode
+
+from ..utils import STREAM_MARKER
+
+register = template.Library()
+
+
+class StreamFeedNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+        self.for_node = nodelist.get_nodes_by_type(ForNode)[0]
+
+    def render(self, context):
+        stream = context.get('feed_stream')
+        if stream is None:
+            return self.nodelist.render(context)
+        stream.capture(self.for_node, context)
+        return STREAM_MARKER
+
+
+@register.tag
+def streamfeed(parser, token):
+    """Цикл по постам, который render_feed() может отдать потоком.
+
+    {% streamfeed %}
+      {% for post in page_obj %}...{% endfor %}
+    {% endstreamfeed %}
+    """
+    nodelist = parser.parse(('endstreamfeed',))
+    parser.delete_first_token()
+    if not nodelist.get_nodes_by_type(ForNode):
+        raise template.TemplateSyntaxError(
+            "'streamfeed' должен содержать цикл {% for %}"
+        )
+    return StreamFeedNode(nodelist)
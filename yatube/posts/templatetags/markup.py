@@ -0,0 +1,25 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from ..tags import TOKEN
+
+register = template.Library()
+
+
+def link(match):
+    tag, username = match.groups()
+    if tag:
+        url = reverse('posts:tag_posts', args=[tag.lower()])
+    else:
+        url = reverse('posts:profile', args=[username])
+    return f'<a href="{url}">{match[0]}</a>'
+
+
+@register.filter(needs_autoescape=True)
+def linkify(text, autoescape=True):
+    """Превращает #теги и @упоминания в тексте в ссылки."""
+    if autoescape:
+        text = conditional_escape(text)
+    return mark_safe(TOKEN.sub(link, text))
@@ -1,13 +1,45 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import datetime, timedelta
 from http import HTTPStatus
 
 from django import forms
+from django.apps import apps
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from posts.models import Comment, Follow, Group, Post
+from django.utils import timezone
+from jobs.models import Job
+from jobs.queue import claim, run_batch
+from posts.export import export_rows
+from posts.graph import FollowGraph, get_graph, record_change, reset_graph
+from posts.live import (decode_cursor, encode_cursor, publish,
+                        shared_results, watermark)
+from posts.models import (ArchivedPost, Comment, Follow, FollowStats,
+                          FollowSuggestion, Group, GroupStats, Mention,
+                          Notification, Post, PostMonth, PostTag, Tag,
+                          TrendingPost)
+from posts.archive import archive_batch, author_posts
+from posts.months import date_range, range_page, rebuild_months
+from posts.recommendations import update_follow_suggestions
+from posts.sitemaps import generate_sitemaps
+from posts.trending import update_trending
 
-from yatube.settings import POSTS_COUNT
+from yatube.settings import (FOLLOW_GRAPH, FOLLOW_SUGGESTIONS, LIVE_UPDATES,
+                             NOTIFICATIONS, POSTS_COUNT)
 
 User = get_user_model()
 TEST_POSTS_COUNT = 13
@@ -434,3 +466,1199 @@ class FollowTests(TestCase):
             self.assertEqual(
                 test_obj.image, self.post.image
             )
+
+
+class StreamingFeedTests(TestCase):
+    """потоковая отдача лент"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug1',
+            description='test-slug2',
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_streaming_matches_render(self):
+        """потоковая страница совпадает с обычной и хранит контекст"""
+        reverse_list = [
+            reverse('posts:group_list', kwargs={'slug': 'test-slug1'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        ]
+        for reverse_name in reverse_list:
+            with self.subTest(reverse_name=reverse_name):
+                expected = self.authorized_client.get(reverse_name).content
+                with override_settings(FEED_STREAMING=True):
+                    response = self.authorized_client.get(reverse_name)
+                self.assertTrue(response.streaming)
+                self.assertEqual(len(response.context['page_obj']), 3)
+                content = b''.join(response.streaming_content)
+                self.assertEqual(
+                    content.split(), expected.split()
+                )
+                self.assertEqual(content.count(b'<hr>'), 2)
+
+
+class GroupDirectoryTests(TestCase):
+    """каталог групп и счетчики GroupStats"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug1',
+            description='test-slug2',
+        )
+        cls.quiet_group = Group.objects.create(
+            title='Архив',
+            slug='test-slug3',
+            description='test-slug4',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def test_stats_follow_posts(self):
+        """счетчики меняются при создании, переносе и удалении поста"""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        self.assertEqual(self.stats(self.group).post_count, 1)
+        self.assertEqual(self.stats(self.group).last_post_at, post.pub_date)
+        post.group = self.quiet_group
+        post.save()
+        self.assertEqual(self.stats(self.group).post_count, 0)
+        self.assertIsNone(self.stats(self.group).last_post_at)
+        self.assertEqual(self.stats(self.quiet_group).post_count, 1)
+        post.delete()
+        self.assertEqual(self.stats(self.quiet_group).post_count, 0)
+
+    def test_directory_sorted_and_invalidated(self):
+        """каталог сортируется по активности и сбрасывается новым постом"""
+        url = reverse('posts:group_index')
+        response = self.client.get(url)
+        self.assertEqual(
+            [group['slug'] for group in response.context['page_obj']],
+            ['test-slug3', 'test-slug1'],
+        )
+        Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group
+        )
+        response = self.client.get(url)
+        first = response.context['page_obj'][0]
+        self.assertEqual(first['slug'], 'test-slug1')
+        self.assertEqual(first['post_count'], 1)
+        with self.assertNumQueries(0):
+            response = self.client.get(url + '?sort=title')
+        self.assertEqual(
+            response.context['page_obj'][0]['slug'], 'test-slug3'
+        )
+
+
+class TrendingTests(TestCase):
+    """рейтинг популярных постов"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.quiet = Post.objects.create(author=cls.user, text='Тихий пост')
+        cls.discussed = Post.objects.create(
+            author=cls.user, text='Обсуждаемый пост'
+        )
+        cls.old = Post.objects.create(
+            author=cls.user, text='Старый обсуждаемый пост'
+        )
+        Post.objects.filter(pk=cls.old.pk).update(
+            pub_date=timezone.now() - timedelta(days=3)
+        )
+        for post in (cls.discussed, cls.old):
+            for i in range(3):
+                Comment.objects.create(
+                    post=post, author=cls.reader, text=f'Комментарий {i}'
+                )
+
+    def test_ranking(self):
+        """комментарии поднимают пост, возраст опускает"""
+        self.assertEqual(update_trending(), 3)
+        self.assertEqual(
+            list(TrendingPost.objects.values_list('post_id', flat=True)),
+            [self.discussed.pk, self.quiet.pk, self.old.pk],
+        )
+
+    def test_page(self):
+        """страница читает готовый рейтинг одним запросом"""
+        update_trending()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts:trending'))
+        self.assertEqual(
+            response.context['page_obj'][0].post, self.discussed
+        )
+
+
+class FollowSuggestionTests(TestCase):
+    """рекомендации авторов по графу подписок"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        names = ('reader', 'b', 'c', 'd', 'e', 'twin', 'x')
+        cls.users = {
+            name: User.objects.create_user(username=name) for name in names
+        }
+        for user, author in (
+            ('reader', 'b'), ('reader', 'c'),
+            ('b', 'd'), ('c', 'd'), ('c', 'e'),
+            ('twin', 'b'), ('twin', 'c'), ('twin', 'x'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.users['reader'])
+
+    def suggested(self, name):
+        return list(
+            FollowSuggestion.objects.filter(user=self.users[name])
+            .values_list('author__username', flat=True)
+        )
+
+    def test_ranking(self):
+        """друзья друзей и авторы похожих читателей, без своих подписок"""
+        update_follow_suggestions(dict(FOLLOW_SUGGESTIONS, chunk_size=2))
+        suggested = self.suggested('reader')
+        self.assertEqual(suggested[0], 'd')
+        self.assertCountEqual(suggested, ['d', 'e', 'x'])
+
+    def test_pages(self):
+        """страницы читают готовые рекомендации, подписка их убирает"""
+        update_follow_suggestions()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            response.context['suggestions'][0].author, self.users['d']
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=['b'])
+        )
+        self.assertEqual(response.context['author'], self.users['b'])
+        self.assertEqual(len(response.context['suggestions']), 3)
+        self.client.get(reverse('posts:profile_follow', args=['d']))
+        self.assertNotIn('d', self.suggested('reader'))
+
+
+class FollowListTests(TestCase):
+    """счетчики и списки подписчиков"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}')
+            for i in range(POSTS_COUNT + 2)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=cls.author) for reader in cls.readers
+        )
+        FollowStats.refresh(cls.author.id)
+
+    def test_counters(self):
+        """подписка и отписка сдвигают счетчики обоих пользователей"""
+        client = Client()
+        client.force_login(self.readers[0])
+        client.get(reverse('posts:profile_unfollow', args=['author']))
+        client.get(reverse('posts:profile_unfollow', args=['author']))
+        self.assertEqual(
+            FollowStats.objects.get(user=self.author).followers_count,
+            POSTS_COUNT + 1,
+        )
+        client.get(reverse('posts:profile_follow', args=['author']))
+        response = client.get(reverse('posts:profile', args=['author']))
+        stats = response.context['author'].follow_stats
+        self.assertEqual(stats.followers_count, POSTS_COUNT + 2)
+        self.assertEqual(
+            FollowStats.objects.get(user=self.readers[0]).following_count, 1
+        )
+
+    def test_deleted_follows(self):
+        """удаление подписок в обход views тоже сдвигает счетчики"""
+        User.objects.get(pk=self.readers[1].pk).delete()
+        Follow.objects.filter(user=self.readers[2]).delete()
+        self.assertEqual(
+            FollowStats.objects.get(user=self.author).followers_count,
+            POSTS_COUNT,
+        )
+        self.assertFalse(
+            FollowStats.objects.filter(user_id=self.readers[1].id).exists()
+        )
+
+    def test_keyset_pages(self):
+        """списки листаются по id, новые подписчики первыми"""
+        url = reverse('posts:followers', args=['author'])
+        response = self.client.get(url)
+        people = response.context['people']
+        self.assertEqual(len(people), POSTS_COUNT)
+        self.assertEqual(people[0], self.readers[-1])
+        response = self.client.get(
+            url, {'after': response.context['next_after']}
+        )
+        self.assertEqual(response.context['people'], self.readers[1::-1])
+        self.assertIsNone(response.context['next_after'])
+        response = self.client.get(
+            reverse('posts:following', args=['reader0'])
+        )
+        self.assertEqual(response.context['people'], [self.author])
+
+
+@override_settings(FOLLOW_GRAPH=dict(FOLLOW_GRAPH, enabled=True))
+class FollowGraphTests(TestCase):
+    """граф подписок в памяти"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def setUp(self):
+        cache.clear()
+        reset_graph()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        reset_graph()
+
+    def test_requires_shared_cache(self):
+        """без общего кеша приложение с графом не запускается"""
+        config = apps.get_app_config('posts')
+        with override_settings(CACHE_SHARED=False):
+            with self.assertRaises(ImproperlyConfigured):
+                config.ready()
+        with override_settings(CACHE_SHARED=True):
+            config.ready()
+
+    def test_lookups(self):
+        """поиск подписок, подписчиков и пересечений, журнал изменений"""
+        graph = FollowGraph.from_pairs([(1, 2), (1, 3), (4, 3), (4, 2)])
+        self.assertTrue(graph.is_following(1, 3))
+        self.assertFalse(graph.is_following(3, 1))
+        self.assertFalse(graph.is_following(99, 1))
+        self.assertEqual(graph.followers(3).tolist(), [1, 4])
+        self.assertEqual(graph.common_following(1, 4).tolist(), [2, 3])
+        record_change(False, 1, 3)
+        record_change(True, 2, 4)
+        self.assertTrue(graph.sync())
+        self.assertFalse(graph.is_following(1, 3))
+        self.assertEqual(graph.followers(4).tolist(), [2])
+        self.assertEqual(graph.following(1).tolist(), [2])
+        self.assertEqual(graph.compact().followers(3).tolist(), [4])
+        graph = graph.compact()
+        self.assertEqual((graph.added, graph.removed), (set(), set()))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.bin')
+            graph.save(path)
+            loaded = FollowGraph.load(path)
+            self.assertEqual(loaded.version, 2)
+            self.assertEqual(loaded.following(2).tolist(), [4])
+            self.assertTrue(loaded.is_following(4, 2))
+            del loaded
+
+    def test_snapshot_for_readers(self):
+        """синхронизация и сжатие не меняют граф под читающим потоком"""
+        graph = FollowGraph.from_pairs([(1, 2)])
+        overlay = graph.overlay
+        record_change(True, 1, 3)
+        self.assertTrue(graph.sync())
+        self.assertEqual(overlay, (frozenset(), frozenset()))
+        compacted = graph.compact()
+        self.assertEqual(graph.following(1).tolist(), [2, 3])
+        self.assertEqual(compacted.following(1).tolist(), [2, 3])
+        self.assertFalse(any(compacted.overlay))
+        with override_settings(
+            FOLLOW_GRAPH=dict(FOLLOW_GRAPH, enabled=True, max_overlay=0)
+        ):
+            first = get_graph()
+            record_change(True, self.user.id, self.other.id)
+            second = get_graph()
+        self.assertIsNot(first, second)
+        self.assertFalse(any(second.overlay))
+        self.assertTrue(second.is_following(self.user.id, self.other.id))
+
+    def test_views(self):
+        """профиль и лента подписок читают граф"""
+        get_graph()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:profile', args=['author'])
+            )
+        self.assertIs(response.context['following'], True)
+        self.assertFalse(any(
+            '"posts_follow"' in query['sql'] for query in queries
+        ))
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [self.post])
+        record_change(True, self.user.id, self.other.id)
+        response = self.client.get(
+            reverse('posts:profile', args=['other'])
+        )
+        self.assertIs(response.context['following'], True)
+
+
+class ExportTests(TestCase):
+    """выгрузка данных пользователя"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+        cls.user = User.objects.create_user(username='auth')
+        cls.first = Post.objects.create(author=cls.user, text='Первый')
+        cls.second = Post.objects.create(
+            author=cls.user, text='Второй',
+            image=default_storage.save('posts/small.gif', ContentFile(b'GIF')),
+        )
+        Comment.objects.create(
+            post=cls.first, author=cls.user, text='Комментарий'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.url = reverse('posts:profile_export', args=['auth'])
+
+    def test_jsonl(self):
+        """посты, затем комментарии построчно"""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        rows = [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', 'Первый'), ('post', 'Второй'),
+             ('comment', 'Комментарий')],
+        )
+
+    def test_zip(self):
+        """архив с data.jsonl и картинками"""
+        response = self.client.get(self.url, {'format': 'zip'})
+        self.assertIn('auth.zip', response['Content-Disposition'])
+        archive = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content))
+        )
+        self.assertEqual(
+            archive.namelist(), ['data.jsonl', self.second.image.name]
+        )
+        self.assertEqual(archive.read(self.second.image.name), b'GIF')
+        self.assertEqual(len(archive.read('data.jsonl').splitlines()), 3)
+
+    def test_only_owner(self):
+        """чужие данные выгрузить нельзя"""
+        User.objects.create_user(username='other')
+        response = self.client.get(
+            reverse('posts:profile_export', args=['other'])
+        )
+        self.assertRedirects(
+            response, reverse('posts:profile', args=['other'])
+        )
+
+
+class ImportPostsTests(TestCase):
+    """массовый импорт постов и комментариев"""
+    records = [
+        {'type': 'post', 'id': 1, 'author': 'leo', 'group': 'cats',
+         'text': 'Старый пост', 'pub_date': '2015-03-01T10:00:00Z'},
+        {'type': 'post', 'id': 2, 'author': 'leo', 'group': '',
+         'text': 'Еще пост', 'pub_date': '2015-03-02T10:00:00Z'},
+        {'type': 'comment', 'id': 1, 'post': 1, 'author': 'tom',
+         'text': 'Комментарий', 'pub_date': '2015-03-03T10:00:00Z'},
+        {'type': 'post', 'id': 3, 'author': 'leo', 'group': 'cats',
+         'text': 'Третий пост', 'pub_date': '2015-03-04T10:00:00Z'},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'legacy.jsonl')
+        with open(self.source, 'w', encoding='utf-8') as source:
+            for record in self.records:
+                source.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.offset = 1000
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        cache.clear()
+
+    def run_import(self, *args):
+        call_command(
+            'import_posts', self.source, '--batch-size', '2',
+            '--id-offset', str(self.offset), '--create-missing',
+            *args, stdout=io.StringIO(),
+        )
+
+    def test_import(self):
+        """авторы и группы создаются, даты и ссылки сохраняются"""
+        self.run_import()
+        post = Post.objects.get(id=self.offset + 1)
+        self.assertEqual(post.author.username, 'leo')
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(
+            Comment.objects.get(id=self.offset + 1).post, post
+        )
+        self.assertEqual(post.group.stats.post_count, 2)
+
+    def test_touches_feeds(self):
+        """импорт обновляет метки лент сайта, групп и авторов"""
+        User.objects.create_user(username='leo')
+        Group.objects.create(title='Кошки', slug='cats', description='')
+        urls = [
+            reverse('posts:index_rss'),
+            reverse('posts:profile_rss', args=['leo']),
+            reverse('posts:group_rss', args=['cats']),
+        ]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.run_import()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Третий пост', response.content.decode())
+
+    def test_resume(self):
+        """повтор с checkpoint не дублирует записи"""
+        self.run_import()
+        checkpoint = self.source + '.checkpoint'
+        with open(checkpoint, 'w') as file:
+            json.dump({'line': 2}, file)
+        self.run_import()
+        self.assertEqual(Post.objects.count(), 3)
+        self.run_import('--restart')
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_id_conflict(self):
+        """занятый чужим постом id останавливает импорт"""
+        own = Post.objects.create(
+            author=User.objects.create_user(username='owner'), text='Свой'
+        )
+        self.offset = own.pk - 1
+        with self.assertRaises(CommandError):
+            self.run_import()
+        own.refresh_from_db()
+        self.assertEqual(own.text, 'Свой')
+        self.assertFalse(own.comments.exists())
+
+    def test_archived_ids(self):
+        """id из архива заняты: повтор не дублирует, чужой id — ошибка"""
+        self.run_import()
+        call_command(
+            'archive_posts', '--older-than', '365', '--pause', '0',
+            stdout=io.StringIO(),
+        )
+        output = io.StringIO()
+        call_command(
+            'import_posts', self.source, '--id-offset', str(self.offset),
+            '--restart', stdout=output,
+        )
+        self.assertIn('Импортировано 0 записей', output.getvalue())
+        self.assertIn('без автора или поста: 0.', output.getvalue())
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+        ArchivedPost.objects.filter(id=self.offset + 2).update(text='Чужой')
+        with self.assertRaises(CommandError):
+            self.run_import('--restart')
+        self.assertFalse(Post.objects.exists())
+
+    def test_orphan_comment(self):
+        """комментарий к пропущенному посту тоже пропускается"""
+        User.objects.create_user(username='tom')
+        call_command(
+            'import_posts', self.source, '--id-offset', str(self.offset),
+            stdout=io.StringIO(),
+        )
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+
+class FeedTests(TestCase):
+    """RSS и Atom ленты с условным GET"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        Post.objects.create(
+            author=cls.user, group=cls.group, text='Первый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_feeds(self):
+        """все ленты отдаются и содержат посты"""
+        for name, args, content_type in (
+            ('posts:index_rss', [], 'application/rss+xml'),
+            ('posts:index_atom', [], 'application/atom+xml'),
+            ('posts:group_rss', ['test-slug'], 'application/rss+xml'),
+            ('posts:profile_atom', ['auth'], 'application/atom+xml'),
+        ):
+            with self.subTest(name=name):
+                response = self.client.get(reverse(name, args=args))
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                self.assertIn('Первый пост', response.content.decode())
+        response = self.client.get(reverse('posts:group_rss', args=['no']))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_not_modified(self):
+        """повторный опрос — 304 без запросов к базе, новый пост — 200"""
+        url = reverse('posts:group_rss', args=['test-slug'])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(
+            author=self.user, group=self.group, text='Второй пост'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Второй пост', response.content.decode())
+
+    @override_settings(FEED_LOCAL_CACHE_TIMEOUT=0)
+    def test_local_cache(self):
+        """без общего кеша метка не живет дольше FEED_LOCAL_CACHE_TIMEOUT"""
+        url = reverse('posts:profile_rss', args=['auth'])
+        for shared, status in (
+            (True, HTTPStatus.NOT_MODIFIED), (False, HTTPStatus.OK),
+        ):
+            with self.subTest(shared=shared), override_settings(
+                CACHE_SHARED=shared
+            ):
+                cache.clear()
+                etag = self.client.get(url)['ETag']
+                # Пост изменил другой воркер: до этого кеша сброс не дошел.
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, status)
+
+
+class SitemapTests(TestCase):
+    """карта сайта"""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        User.objects.create_user(username='silent')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=f'Пост {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def read(self, name):
+        with gzip.open(os.path.join(self.root, name), 'rt') as sitemap:
+            return sitemap.read()
+
+    def test_generate(self):
+        """разделы делятся на файлы по лимиту, лишние файлы удаляются"""
+        open(os.path.join(self.root, 'sitemap-posts-9.xml.gz'), 'w').close()
+        counts = generate_sitemaps(
+            self.root, 'https://yatube.test', limit=2, chunk_size=2
+        )
+        self.assertEqual(counts, {'posts': 3, 'profiles': 1, 'groups': 1})
+        self.assertEqual(sorted(os.listdir(self.root)), [
+            'sitemap-groups-1.xml.gz', 'sitemap-posts-1.xml.gz',
+            'sitemap-posts-2.xml.gz', 'sitemap-profiles-1.xml.gz',
+            'sitemap.xml',
+        ])
+        self.assertIn(
+            f'https://yatube.test/posts/{self.posts[2].pk}/',
+            self.read('sitemap-posts-2.xml.gz'),
+        )
+        profiles = self.read('sitemap-profiles-1.xml.gz')
+        self.assertIn('/profile/auth/', profiles)
+        self.assertNotIn('silent', profiles)
+
+    def test_served(self):
+        """файлы отдаются по корневым адресам"""
+        generate_sitemaps(self.root, 'https://yatube.test')
+        with self.settings(SITEMAP_ROOT=self.root):
+            response = self.client.get('/sitemap.xml')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            b'https://yatube.test/sitemap-groups-1.xml.gz',
+            b''.join(response.streaming_content),
+        )
+
+
+@override_settings(
+    NOTIFICATIONS=dict(NOTIFICATIONS, chunk_size=2, cache_timeout=60)
+)
+class NotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.followers = [
+            User.objects.create_user(username=f'follower{number}')
+            for number in range(3)
+        ]
+        Follow.objects.bulk_create([
+            Follow(user=user, author=self.author) for user in self.followers
+        ])
+        self.client.force_login(self.followers[0])
+
+    def tearDown(self):
+        cache.clear()
+
+    def unread(self):
+        return self.client.get(reverse('posts:group_index')).context[
+            'unread_notifications'
+        ]()
+
+    def test_fan_out(self):
+        """рассылка идет задачей вне запроса и сбрасывает счетчики"""
+        self.assertEqual(self.unread(), 0)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(Notification.objects.count(), 0)
+        self.assertTrue(Job.objects.filter(
+            name='posts.tasks.notify_followers'
+        ).exists())
+        while run_batch(claim(10)) != (0, 0):
+            pass
+        self.assertEqual(
+            set(Notification.objects.values_list('user', 'post')),
+            {(user.pk, post.pk) for user in self.followers},
+        )
+        self.assertEqual(self.unread(), 1)
+        response = self.client.get(reverse('posts:notifications'))
+        self.assertContains(response, 'Новый пост')
+        self.assertContains(response, 'badge')
+
+    def test_read_all(self):
+        """все уведомления отмечаются прочитанными одним UPDATE"""
+        posts = [
+            Post.objects.create(author=self.author, text=str(number))
+            for number in range(3)
+        ]
+        Notification.objects.bulk_create([
+            Notification(user=self.followers[0], post=post) for post in posts
+        ])
+        self.assertEqual(self.unread(), 3)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('posts:notifications_read'))
+        notification_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'posts_notification' in query['sql']
+        ]
+        self.assertEqual(len(notification_queries), 1)
+        self.assertTrue(notification_queries[0].startswith('UPDATE'))
+        self.assertEqual(self.unread(), 0)
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+
+    def test_local_cache(self):
+        """без общего кеша счетчик живет local_cache_timeout"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        for shared, expected in ((True, 0), (False, 1)):
+            with self.subTest(shared=shared), override_settings(
+                CACHE_SHARED=shared,
+                NOTIFICATIONS=dict(
+                    NOTIFICATIONS, cache_timeout=60, local_cache_timeout=0
+                ),
+            ):
+                cache.clear()
+                self.assertEqual(self.unread(), 0)
+                # Сброс из run_workers сюда не дошел.
+                Notification.objects.create(user=self.followers[0], post=post)
+                self.assertEqual(self.unread(), expected)
+                Notification.objects.all().delete()
+
+
+class LiveUpdatesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        watermark.latest = None
+        shared_results.clear()
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.first = Post.objects.create(author=self.author, text='Первый')
+        self.cursor = encode_cursor((self.first.pub_date, self.first.pk))
+
+    def tearDown(self):
+        cache.clear()
+        watermark.latest = None
+
+    def poll(self, **params):
+        return self.client.get(reverse('posts:live_posts'), params).json()
+
+    def create(self, author, text):
+        # В TestCase on_commit не срабатывает: публикуем как после коммита.
+        post = Post.objects.create(author=author, text=text)
+        publish((post.pub_date, post.pk))
+        return post
+
+    def test_idle_poll(self):
+        """без новых постов опрос не обращается к базе"""
+        self.assertEqual(self.poll()['cursor'], self.cursor)
+        with self.assertNumQueries(0):
+            data = self.poll(after=self.cursor, wait=0)
+        self.assertEqual(data, {'posts': [], 'cursor': self.cursor})
+
+    def test_wakes_up(self):
+        """ожидающий запрос получает пост сразу после публикации"""
+        self.poll()
+        post = Post.objects.create(author=self.author, text='Второй')
+        timer = threading.Timer(
+            0.2, publish, [(post.pub_date, post.pk)]
+        )
+        timer.start()
+        started = timezone.now()
+        data = self.poll(after=self.cursor, wait=10)
+        timer.join()
+        self.assertLess(timezone.now() - started, timedelta(seconds=5))
+        self.assertEqual([item['id'] for item in data['posts']], [post.pk])
+        self.assertEqual(
+            data['cursor'], encode_cursor((post.pub_date, post.pk))
+        )
+        # Остальные ждавшие клиенты получают тот же ответ без базы.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.poll(after=self.cursor, wait=0), data)
+
+    def test_follow_feed(self):
+        """?feed=follow отдает только посты авторов из подписок"""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.author)
+        self.client.force_login(follower)
+        self.create(self.other, 'Чужой')
+        own = self.create(self.author, 'Свой')
+        data = self.poll(after=self.cursor, wait=0, feed='follow')
+        self.assertEqual([item['id'] for item in data['posts']], [own.pk])
+        self.assertEqual(len(self.poll(after=self.cursor, wait=0)['posts']),
+                         2)
+
+    def test_stream(self):
+        """SSE отдает пачку постов с курсором в id события"""
+        post = self.create(self.other, 'Новость')
+        response = self.client.get(
+            reverse('posts:live_stream'), HTTP_LAST_EVENT_ID=self.cursor
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = iter(response.streaming_content)
+        self.assertEqual(next(events), b'retry: 3000\n\n')
+        event = next(events).decode()
+        response.close()
+        self.assertTrue(event.startswith(
+            f'id: {encode_cursor((post.pub_date, post.pk))}\n'
+            'event: posts\n'
+        ))
+        self.assertIn('"text": "Новость"', event)
+
+    @override_settings(
+        CACHE_SHARED=False, LIVE_UPDATES=dict(LIVE_UPDATES, refresh=0.05)
+    )
+    def test_other_process(self):
+        """без общего кеша пост другого процесса находится запросом"""
+        self.poll()
+        # Публикация в другом процессе: сигнал этого процесса не видит.
+        post = Post.objects.create(author=self.author, text='Чужой процесс')
+        data = self.poll(after=self.cursor, wait=5)
+        self.assertEqual([item['id'] for item in data['posts']], [post.pk])
+
+    def test_bad_cursor(self):
+        """курсор за пределами дат считается отсутствующим"""
+        cursor = '99999999999999999999.1'
+        self.assertEqual(decode_cursor(cursor), None)
+        self.assertEqual(decode_cursor(f'1.{2 ** 64}'), None)
+        self.assertEqual(self.poll(after=cursor)['cursor'], self.cursor)
+        response = self.client.get(
+            reverse('posts:archive_year', args=[2020]), {'before': cursor}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Группа', slug='archive', description=''
+        )
+        self.old = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Старый {number}'
+            )
+            for number in range(POSTS_COUNT + 2)
+        ]
+        Post.objects.filter(pk__in=[post.pk for post in self.old]).update(
+            pub_date=timezone.now() - timedelta(days=1000)
+        )
+        Comment.objects.create(
+            post=self.old[0], author=self.author, text='Старый комментарий'
+        )
+        self.new = Post.objects.create(
+            author=self.author, group=self.group, text='Новый'
+        )
+        call_command(
+            'archive_posts', '--older-than', '365', '--pause', '0',
+            stdout=io.StringIO(),
+        )
+
+    def test_taken_id(self):
+        """пост, чей id в архиве уже занят, остается на месте"""
+        post = Post.objects.create(author=self.author, text='Горячий')
+        past = timezone.now() - timedelta(days=1000)
+        Post.objects.filter(pk=post.pk).update(pub_date=past)
+        ArchivedPost.objects.create(
+            id=post.pk, author=self.author, text='Чужой', pub_date=past
+        )
+        self.assertEqual(archive_batch(past + timedelta(days=1), 10), (0, 0))
+        self.assertEqual(Post.objects.get(pk=post.pk).text, 'Горячий')
+        self.assertEqual(ArchivedPost.objects.get(pk=post.pk).text, 'Чужой')
+
+    def test_moved(self):
+        """старые посты и комментарии уходят в архив с теми же id"""
+        self.assertEqual(list(Post.objects.all()), [self.new])
+        self.assertEqual(
+            set(ArchivedPost.objects.values_list('id', flat=True)),
+            {post.pk for post in self.old},
+        )
+        self.assertFalse(Comment.objects.exists())
+        GroupStats.refresh(self.group.pk)
+        self.assertEqual(
+            GroupStats.objects.get(group=self.group).post_count,
+            len(self.old) + 1,
+        )
+        self.assertEqual(
+            sum(row['type'] == 'post' for row in export_rows(self.author)),
+            len(self.old) + 1,
+        )
+
+    def test_post_detail(self):
+        """архивный пост открывается по старому адресу, только для чтения"""
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.old[0].pk])
+        )
+        self.assertContains(response, 'Старый комментарий')
+        self.assertNotContains(
+            response, reverse('posts:add_comment', args=[self.old[0].pk])
+        )
+
+    def test_profile(self):
+        """профиль листает свежие посты, затем архивные"""
+        url = reverse('posts:profile', args=[self.author.username])
+        first = self.client.get(url).context['page_obj']
+        self.assertEqual(first.paginator.count, len(self.old) + 1)
+        self.assertEqual(first[0], self.new)
+        self.assertIsInstance(first[1], ArchivedPost)
+        last = self.client.get(url, {'page': 2}).context['page_obj']
+        self.assertEqual(len(last), len(self.old) + 1 - POSTS_COUNT)
+
+    def test_profile_interleaved(self):
+        """пост старше архива, импортированный позже, идет последним"""
+        imported = Post.objects.create(author=self.author, text='Импорт')
+        Post.objects.filter(pk=imported.pk).update(
+            pub_date=timezone.now() - timedelta(days=2000)
+        )
+        posts = author_posts(self.author)
+        items = posts[0:len(posts)]
+        self.assertEqual(len(items), len(self.old) + 2)
+        self.assertEqual(items[0], self.new)
+        self.assertEqual(items[-1].pk, imported.pk)
+        self.assertEqual(posts[len(posts) - 1:len(posts)][0].pk, imported.pk)
+
+
+class DateArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(
+            title='Группа', slug='dates', description=''
+        )
+        self.posts = {}
+        for day, author, group in (
+            (datetime(2020, 2, 29, 23, 59), self.author, None),
+            (datetime(2020, 3, 1), self.author, self.group),
+            (datetime(2020, 3, 31, 23, 59), self.other, None),
+            (datetime(2020, 4, 1), self.author, None),
+        ):
+            post = Post.objects.create(author=author, group=group, text='')
+            post.pub_date = timezone.make_aware(day)
+            Post.objects.filter(pk=post.pk).update(pub_date=post.pub_date)
+            self.posts[day] = post
+        rebuild_months()
+
+    def tearDown(self):
+        cache.clear()
+
+    def archive(self, name, *args, **params):
+        return self.client.get(reverse(f'posts:{name}', args=args), params)
+
+    def test_ranges(self):
+        """год и месяц — диапазоны pub_date, с группой и автором"""
+        march = set(self.archive(
+            'archive_month', 2020, 3
+        ).context['items'])
+        self.assertEqual(march, {
+            self.posts[datetime(2020, 3, 1)],
+            self.posts[datetime(2020, 3, 31, 23, 59)],
+        })
+        self.assertEqual(
+            len(self.archive('archive_year', 2020).context['items']), 4
+        )
+        self.assertEqual(
+            list(self.archive(
+                'group_archive_month', self.group.slug, 2020, 3
+            ).context['items']),
+            [self.posts[datetime(2020, 3, 1)]],
+        )
+        self.assertEqual(
+            len(self.archive(
+                'profile_archive_year', self.author.username, 2020
+            ).context['items']),
+            3,
+        )
+        for response in (
+            self.archive('archive_month', 2020, 13),
+            self.archive('group_archive_year', 'missing', 2020),
+        ):
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_keyset(self):
+        """страницы по ?before без повторов, архив идет следом"""
+        for number in range(POSTS_COUNT):
+            Post.objects.filter(pk=Post.objects.create(
+                author=self.author, text=f'Пост {number}'
+            ).pk).update(pub_date=timezone.make_aware(
+                datetime(2020, 3, 10 + number)
+            ))
+        archive_batch(timezone.make_aware(datetime(2020, 3, 5)), 100)
+        first = self.archive('archive_month', 2020, 3).context
+        self.assertEqual(len(first['items']), POSTS_COUNT)
+        second = self.archive(
+            'archive_month', 2020, 3, before=first['next_before']
+        ).context
+        self.assertIsNone(second['next_before'])
+        self.assertEqual(len(second['items']), 2)
+        self.assertIsInstance(second['items'][-1], ArchivedPost)
+        self.assertFalse(set(first['items']) & set(second['items']))
+
+    def test_interleaved_tiers(self):
+        """старый пост, импортированный после архивации, встает по дате"""
+        archive_batch(timezone.make_aware(datetime(2020, 3, 5)), 100)
+        imported = Post.objects.create(author=self.author, text='Импорт')
+        Post.objects.filter(pk=imported.pk).update(
+            pub_date=timezone.make_aware(datetime(2020, 2, 15))
+        )
+        start, end = date_range(2020)
+        pages, before = [], None
+        while True:
+            request = RequestFactory().get('/', {'before': before or ''})
+            page = range_page({}, start, end, request, size=2)
+            pages.append([post.pk for post in page['items']])
+            before = page['next_before']
+            if before is None:
+                break
+        self.assertEqual(pages, [
+            [self.posts[datetime(2020, 4, 1)].pk,
+             self.posts[datetime(2020, 3, 31, 23, 59)].pk],
+            [self.posts[datetime(2020, 3, 1)].pk,
+             self.posts[datetime(2020, 2, 29, 23, 59)].pk],
+            [imported.pk],
+        ])
+
+    def test_histogram(self):
+        """счетчики месяцев меняют сигналы, страницы читают кеш"""
+        months = self.archive('archive_year', 2020).context['months']
+        self.assertEqual(
+            [(item['month'].month, item['count']) for item in months],
+            [(4, 1), (3, 2), (2, 1)],
+        )
+        self.assertEqual(
+            months[1]['url'], reverse('posts:archive_month', args=[2020, 3])
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.archive('archive_year', 2020)
+        self.assertFalse(any(
+            'postmonth' in query['sql'] or 'GROUP BY' in query['sql']
+            for query in queries
+        ))
+        post = Post.objects.create(author=self.author, text='Сейчас')
+        current = self.archive('archive_year', 2020).context['months'][0]
+        self.assertEqual(current['month'], post.pub_date.date().replace(day=1))
+        self.assertEqual(current['count'], 1)
+        self.posts[datetime(2020, 4, 1)].delete()
+        months = self.archive('archive_year', 2020).context['months']
+        self.assertNotIn(4, [item['month'].month for item in months[1:]])
+
+    @override_settings(MONTH_ARCHIVE_LOCAL_TIMEOUT=0)
+    def test_local_cache(self):
+        """без общего кеша гистограмма живет LOCAL_TIMEOUT"""
+        for shared, count in ((True, 1), (False, 2)):
+            with self.subTest(shared=shared), override_settings(
+                CACHE_SHARED=shared
+            ):
+                cache.clear()
+                self.archive('archive_year', 2020)
+                # Счетчик сдвинул другой воркер: его сброс сюда не дошел.
+                PostMonth.objects.filter(
+                    scope='', month='2020-04-01'
+                ).update(count=2)
+                months = self.archive('archive_year', 2020).context['months']
+                self.assertEqual(months[0]['count'], count)
+                PostMonth.objects.filter(
+                    scope='', month='2020-04-01'
+                ).update(count=1)
+
+    def test_uncounted_delete(self):
+        """удаление поста без счетчика месяца не ломается"""
+        PostMonth.objects.all().delete()
+        self.author.delete()
+        self.assertFalse(PostMonth.objects.exists())
+        rebuild_months()
+        self.assertEqual(
+            PostMonth.objects.get(scope='', month='2020-03-01').count, 1
+        )
+
+
+class TagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def tearDown(self):
+        cache.clear()
+
+    def tags(self, post):
+        return set(post.tags.values_list('name', flat=True))
+
+    def test_parse_on_save(self):
+        """теги и упоминания разбираются при сохранении и правке"""
+        post = Post.objects.create(
+            author=self.author,
+            text='#Котики и #котики, @reader, @nobody, mail@reader, #1',
+        )
+        self.assertEqual(self.tags(post), {'котики', '1'})
+        self.assertEqual(
+            list(post.mentions.values_list('user__username', flat=True)),
+            ['reader'],
+        )
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            {'text': '#котики и #собаки'},
+        )
+        self.assertEqual(self.tags(post), {'котики', 'собаки'})
+        self.assertFalse(Mention.objects.exists())
+        Post.objects.create(author=self.author, text='Без тегов')
+        self.assertEqual(PostTag.objects.count(), 2)
+
+    def test_feed(self):
+        """лента тега и упоминаний листается по ?after"""
+        posts = [
+            Post.objects.create(
+                author=self.author, text=f'Пост {number} #лента @reader'
+            )
+            for number in range(POSTS_COUNT + 2)
+        ]
+        Post.objects.create(author=self.author, text='Чужой #тег')
+        url = reverse('posts:tag_posts', args=['Лента'])
+        first = self.client.get(url)
+        self.assertEqual(first.context['items'], posts[::-1][:POSTS_COUNT])
+        self.assertContains(
+            first,
+            f'<a href="{reverse("posts:tag_posts", args=["лента"])}">'
+            '#лента</a>',
+        )
+        second = self.client.get(url, {'after': first.context['next_after']})
+        self.assertEqual(second.context['items'], posts[1::-1])
+        mentions = self.client.get(
+            reverse('posts:profile_mentions', args=['reader'])
+        )
+        self.assertEqual(len(mentions.context['items']), POSTS_COUNT)
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:tag_posts', args=['нет'])
+            ).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_import(self):
+        """импорт размечает только вставленные им посты"""
+        own = Post.objects.create(author=self.author, text='Свой #собаки')
+        source = os.path.join(tempfile.mkdtemp(), 'legacy.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(source))
+        with open(source, 'w', encoding='utf-8') as file:
+            for number in (own.pk, own.pk + 1):
+                file.write(json.dumps({
+                    'type': 'post', 'id': number, 'author': 'author',
+                    'text': '#архив',
+                }) + '\n')
+        with self.assertRaises(CommandError):
+            call_command('import_posts', source, stdout=io.StringIO())
+        self.assertEqual(self.tags(own), {'собаки'})
+        call_command(
+            'import_posts', source, '--id-offset', str(own.pk),
+            '--restart', stdout=io.StringIO(),
+        )
+        self.assertEqual(self.tags(own), {'собаки'})
+        self.assertEqual(Tag.objects.get(name='архив').posts.count(), 2)
+
+    def test_backfill(self):
+        """index_tags размечает посты, вставленные без сигналов"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'#старое {number} @reader')
+            for number in range(25)
+        ])
+        self.assertFalse(PostTag.objects.exists())
+        call_command('index_tags', '--chunk-size', '10',
+                     stdout=io.StringIO())
+        self.assertEqual(
+            Tag.objects.get(name='старое').posts.count(), 25
+        )
+        self.assertEqual(self.reader.mentions.count(), 25)
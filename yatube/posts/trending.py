@@ -0,0 +1,95 @@
+"""Расчет рейтинга популярных постов.
+
+Кандидаты — посты за последние TRENDING['window_days'] дней. Их признаки
+(комментарии, подписчики автора, возраст) загружаются в массивы NumPy
+и оцениваются одной векторной операцией:
+
+    (1 + w_c * комментарии + w_f * log(1 + подписчики))
+    * 0.5 ** (возраст / период полураспада)
+
+Лучшие TRENDING['top'] постов записываются в TrendingPost.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, TrendingPost
+
+
+def load_features(since):
+    """Массивы id, возраста в часах, числа комментариев и подписчиков."""
+    rows = list(
+        Post.objects.filter(pub_date__gte=since)
+        .order_by()
+        .values_list('id', 'author_id', 'pub_date')
+    )
+    comments = dict(
+        Comment.objects.filter(post__pub_date__gte=since)
+        .order_by()
+        .values_list('post_id')
+        .annotate(count=Count('id'))
+    )
+    followers = dict(
+        Follow.objects.filter(
+            author_id__in={author_id for _, author_id, _ in rows}
+        )
+        .order_by()
+        .values_list('author_id')
+        .annotate(count=Count('id'))
+    )
+    now = timezone.now()
+    count = len(rows)
+    ids = np.fromiter((row[0] for row in rows), np.int64, count)
+    ages = np.fromiter(
+        ((now - row[2]).total_seconds() / 3600 for row in rows),
+        np.float64, count,
+    )
+    comment_counts = np.fromiter(
+        (comments.get(row[0], 0) for row in rows), np.float64, count
+    )
+    follower_counts = np.fromiter(
+        (followers.get(row[1], 0) for row in rows), np.float64, count
+    )
+    return ids, ages, comment_counts, follower_counts
+
+
+def score(ages, comment_counts, follower_counts, options=None):
+    options = options or settings.TRENDING
+    popularity = (
+        1
+        + options['comment_weight'] * comment_counts
+        + options['follower_weight'] * np.log1p(follower_counts)
+    )
+    return popularity * np.power(
+        0.5, np.maximum(ages, 0) / options['half_life_hours']
+    )
+
+
+def top(ids, scores, limit):
+    """id и оценки лучших limit постов по убыванию оценки."""
+    if len(ids) > limit:
+        best = np.argpartition(-scores, limit - 1)[:limit]
+        ids, scores = ids[best], scores[best]
+    order = np.argsort(-scores, kind='stable')
+    return ids[order], scores[order]
+
+
+def update_trending():
+    """Пересчитывает рейтинг и атомарно заменяет TrendingPost."""
+    options = settings.TRENDING
+    since = timezone.now() - timedelta(days=options['window_days'])
+    ids, ages, comment_counts, follower_counts = load_features(since)
+    ids, scores = top(
+        ids, score(ages, comment_counts, follower_counts), options['top']
+    )
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            TrendingPost(rank=rank, post_id=int(post_id), score=float(value))
+            for rank, (post_id, value) in enumerate(zip(ids, scores), 1)
+        )
+    return len(ids)
@@ -1,11 +1,77 @@
 from django.urls import path
 
 from . import views
+from .feeds import AuthorFeed, GroupFeed, LatestPostsFeed, atom, cached_feed
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('trending/', views.trending, name='trending'),
+    path(
+        'rss/', cached_feed(LatestPostsFeed, 'index'), name='index_rss'
+    ),
+    path(
+        'atom/', cached_feed(atom(LatestPostsFeed), 'index'),
+        name='index_atom'
+    ),
+    path(
+        'group/<slug:slug>/rss/',
+        cached_feed(GroupFeed, 'group:{slug}'),
+        name='group_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        cached_feed(atom(GroupFeed), 'group:{slug}'),
+        name='group_atom'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        cached_feed(AuthorFeed, 'author:{username}'),
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        cached_feed(atom(AuthorFeed), 'author:{username}'),
+        name='profile_atom'
+    ),
+    path('live/', views.live_posts, name='live_posts'),
+    path('live/stream/', views.live_stream, name='live_stream'),
+    path(
+        'archive/<int:year>/', views.date_archive, name='archive_year'
+    ),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.date_archive,
+        name='archive_month'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/',
+        views.date_archive,
+        name='group_archive_year'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/',
+        views.date_archive,
+        name='group_archive_month'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/',
+        views.date_archive,
+        name='profile_archive_year'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/',
+        views.date_archive,
+        name='profile_archive_month'
+    ),
+    path('tag/<str:name>/', views.tag_posts, name='tag_posts'),
+    path(
+        'profile/<str:username>/mentions/',
+        views.profile_mentions,
+        name='profile_mentions'
+    ),
+    path('groups/', views.group_index, name='group_index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -13,6 +79,14 @@ urlpatterns = [
         views.add_comment, name='add_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'notifications/', views.notifications, name='notifications'
+    ),
+    path(
+        'notifications/read/',
+        views.notifications_read,
+        name='notifications_read'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -23,6 +97,21 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'profile/<str:username>/followers/',
+        views.follow_list, {'kind': 'followers'},
+        name='followers'
+    ),
+    path(
+        'profile/<str:username>/following/',
+        views.follow_list, {'kind': 'following'},
+        name='following'
+    ),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
@@ -1,5 +1,30 @@
+from itertools import chain
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db.models import F, QuerySet
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.template import Context
+from django.template.loader import render_to_string
+
+from .models import FollowSuggestion, Group, Notification
+
+STREAM_MARKER = '<!-- feed-stream -->'
+
+GROUP_DIRECTORY_KEY = 'group_directory'
+
+UNREAD_KEY = 'notifications:unread:{}'
+
+# Список в кеше уже отсортирован по активности, остальное — в памяти.
+GROUP_ORDERINGS = {
+    'activity': None,
+    'posts': lambda group: -group['post_count'],
+    'title': lambda group: group['title'].lower(),
+}
 
 
 def page_content(query, request):
@@ -9,3 +34,150 @@ def page_content(query, request):
     return {
         'page_obj': page_obj,
     }
+
+
+def keyset_page(query, request, size=None, field='id'):
+    """Страница по убыванию field: ?after=<значение> вместо номера.
+
+    Не считает COUNT(*) и не пропускает OFFSET строк на дальних страницах.
+    """
+    size = size or settings.POSTS_COUNT
+    after = request.GET.get('after', '')
+    if after.isdigit():
+        query = query.filter(**{f'{field}__lt': int(after)})
+    items = list(query.order_by(f'-{field}')[:size + 1])
+    return {
+        'items': items[:size],
+        'next_after': (
+            getattr(items[size - 1], field) if len(items) > size else None
+        ),
+    }
+
+
+def group_directory(sort='activity'):
+    """Группы со счетчиками из GroupStats, без обращения к постам."""
+    groups = cache.get(GROUP_DIRECTORY_KEY)
+    if groups is None:
+        groups = list(
+            Group.objects.annotate(
+                post_count=Coalesce('stats__post_count', 0),
+                last_post_at=F('stats__last_post_at'),
+            ).order_by(
+                F('last_post_at').desc(nulls_last=True), 'title'
+            ).values(
+                'title', 'slug', 'description', 'post_count', 'last_post_at'
+            )
+        )
+        cache.set(
+            GROUP_DIRECTORY_KEY, groups,
+            settings.GROUP_DIRECTORY_CACHE_TIMEOUT if settings.CACHE_SHARED
+            else settings.GROUP_DIRECTORY_LOCAL_TIMEOUT,
+        )
+    if GROUP_ORDERINGS.get(sort):
+        return sorted(groups, key=GROUP_ORDERINGS[sort])
+    return groups
+
+
+def unread_timeout():
+    return settings.NOTIFICATIONS[
+        'cache_timeout' if settings.CACHE_SHARED else 'local_cache_timeout'
+    ]
+
+
+def unread_count(user):
+    """Число непрочитанных уведомлений из кеша.
+
+    Рассылка (posts.tasks.notify_followers) сбрасывает счетчик
+    получателей, так что база читается раз на новую порцию уведомлений.
+    """
+    key = UNREAD_KEY.format(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(
+            user=user, is_read=False
+        ).count()
+        cache.set(key, count, unread_timeout())
+    return count
+
+
+def follow_suggestions(user):
+    """Готовые рекомендации пользователя: один запрос по индексу."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        FollowSuggestion.objects.filter(user=user).select_related('author')[
+            :settings.FOLLOW_SUGGESTIONS['count']
+        ]
+    )
+
+
+class FeedStream:
+    """Карточки постов из {% streamfeed %}, которые рендерятся по одной."""
+
+    def capture(self, for_node, context):
+        self.for_node = for_node
+        self.template = context.template
+        self.context = Context(
+            context.flatten(),
+            autoescape=context.autoescape,
+            use_l10n=context.use_l10n,
+            use_tz=context.use_tz,
+        )
+
+    def items(self):
+        items = self.for_node.sequence.resolve(self.context, True) or ()
+        if isinstance(items, Page):
+            items = items.object_list
+        if isinstance(items, QuerySet):
+            items = items.iterator()
+        if self.for_node.is_reversed:
+            items = reversed(list(items))
+        return iter(items)
+
+    def __iter__(self):
+        node, context = self.for_node, self.context
+        end = object()
+        counter = 0
+        with context.bind_template(self.template):
+            items = self.items()
+            item = next(items, end)
+            while item is not end:
+                following = next(items, end)
+                counter += 1
+                forloop = {
+                    'counter0': counter - 1,
+                    'counter': counter,
+                    'first': counter == 1,
+                    'last': following is end,
+                    'parentloop': context.get('forloop', {}),
+                }
+                with context.push(forloop=forloop):
+                    if len(node.loopvars) == 1:
+                        context[node.loopvars[0]] = item
+                    else:
+                        for name, value in zip(node.loopvars, item):
+                            context[name] = value
+                    yield node.nodelist_loop.render(context)
+                item = following
+            if counter == 0:
+                yield node.nodelist_empty.render(context)
+
+
+def render_feed(request, template_name, context):
+    """render() для страниц ленты.
+
+    При FEED_STREAMING шапка и подвал страницы уходят клиенту сразу,
+    а карточки постов — по мере чтения строк из базы.
+    """
+    if not settings.FEED_STREAMING:
+        return render(request, template_name, context)
+    stream = FeedStream()
+    content = render_to_string(
+        template_name, dict(context, feed_stream=stream), request
+    )
+    head, marker, tail = content.partition(STREAM_MARKER)
+    if not marker:
+        return HttpResponse(content)
+    # Карточки рендерятся уже после CsrfViewMiddleware: токен нужен заранее.
+    get_token(request)
+    return StreamingHttpResponse(chain([head], stream, [tail]))
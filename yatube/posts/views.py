@@ -1,49 +1,208 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_POST
 
+from core.ratelimit import ratelimit
+
+from .archive import author_posts, find_post
+from .export import export_filename, export_jsonl, export_zip
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import page_content
+from .live import (decode_cursor, encode_cursor, newer_posts,
+                   stream_events, watermark)
+from .models import (Follow, FollowSuggestion, Group, Mention,
+                     Notification, Post, PostTag, Tag, TrendingPost,
+                     User)
+from .months import archive_links, date_range, range_page, valid_month
+from .utils import (GROUP_ORDERINGS, UNREAD_KEY, follow_suggestions,
+                    group_directory, keyset_page, page_content, render_feed,
+                    unread_timeout)
+
+# Список: (поле владельца, поле показываемого пользователя, заголовок).
+FOLLOW_LISTS = {
+    'followers': ('author', 'user', 'Подписчики'),
+    'following': ('user', 'author', 'Подписки'),
+}
 
 
 @cache_page(20)
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author', 'group')
     context = page_content(posts, request)
     return render(request, 'posts/index.html', context)
 
 
+def trending(request):
+    trending_posts = TrendingPost.objects.select_related(
+        'post__author', 'post__group'
+    )
+    context = page_content(trending_posts, request)
+    return render(request, 'posts/trending.html', context)
+
+
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author', 'group')
     context = {
         'group': group,
         'posts': posts,
     }
     context.update(page_content(posts, request))
-    return render(request, 'posts/group_list.html', context)
+    return render_feed(request, 'posts/group_list.html', context)
+
+
+def group_index(request):
+    sort = request.GET.get('sort')
+    if sort not in GROUP_ORDERINGS:
+        sort = 'activity'
+    context = {
+        'sort': sort,
+    }
+    context.update(page_content(group_directory(sort), request))
+    return render(request, 'posts/groups.html', context)
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('follow_stats'), username=username
+    )
+    posts = author_posts(author)
     if request.user.is_authenticated:
-        following = Follow.objects.filter(user=request.user, author=author)
+        if settings.FOLLOW_GRAPH['enabled']:
+            # NumPy грузится только при включенном графе.
+            from .graph import get_graph
+
+            following = get_graph().is_following(request.user.id, author.id)
+        else:
+            following = Follow.objects.filter(
+                user=request.user, author=author
+            )
         context = {
             'author': author,
             'following': following,
+            'suggestions': follow_suggestions(request.user),
         }
     else:
         context = {
             'author': author,
         }
     context.update(page_content(posts, request))
-    return render(request, 'posts/profile.html', context)
+    return render_feed(request, 'posts/profile.html', context)
+
+
+def date_archive(request, year, month=None, slug=None, username=None):
+    """Посты за год или месяц: всего сайта, группы (slug) или автора."""
+    if not valid_month(year, month):
+        raise Http404
+    filters, scope, title = {}, '', 'Все записи'
+    if slug is not None:
+        group = get_object_or_404(Group, slug=slug)
+        filters, scope, title = {'group': group}, f'group:{group.pk}', (
+            group.title
+        )
+    elif username is not None:
+        author = get_object_or_404(User, username=username)
+        filters, scope = {'author': author}, f'author:{author.pk}'
+        title = author.get_full_name() or author.username
+    start, end = date_range(year, month)
+    context = range_page(filters, start, end, request)
+    context.update({
+        'title': title,
+        'archive_year': year,
+        'period_start': start,
+        'is_month': month is not None,
+        'months': archive_links(scope, slug, username),
+    })
+    return render(request, 'posts/date_archive.html', context)
+
+
+def follow_list(request, username, kind):
+    author = get_object_or_404(
+        User.objects.select_related('follow_stats'), username=username
+    )
+    owner, other, title = FOLLOW_LISTS[kind]
+    follows = Follow.objects.filter(**{owner: author}).select_related(other)
+    page = keyset_page(follows, request)
+    context = {
+        'author': author,
+        'kind': kind,
+        'title': title,
+        'people': [getattr(follow, other) for follow in page['items']],
+        'next_after': page['next_after'],
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+@login_required
+def profile_export(request, username):
+    if request.user.username != username:
+        return redirect('posts:profile', username=username)
+    archive = request.GET.get('format') == 'zip'
+    if archive:
+        response = StreamingHttpResponse(
+            export_zip(request.user), content_type='application/zip'
+        )
+    else:
+        response = StreamingHttpResponse(
+            export_jsonl(request.user), content_type='application/x-ndjson'
+        )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{export_filename(request.user, archive)}"'
+    )
+    return response
+
+
+def live_scope(request):
+    """Подписчик ленты: пользователь для ?feed=follow, иначе None."""
+    if request.GET.get('feed') == 'follow' and request.user.is_authenticated:
+        return request.user
+    return None
+
+
+def live_posts(request):
+    """Long-poll: ждет до ?wait секунд постов новее ?after.
+
+    Без курсора сразу отдает текущий, с которого начинать.
+    """
+    cursor = decode_cursor(request.GET.get('after'))
+    if cursor is None:
+        return JsonResponse({
+            'posts': [], 'cursor': encode_cursor(watermark.current()),
+        })
+    wait = request.GET.get('wait', '')
+    wait = min(
+        int(wait) if wait.isdigit() else settings.LIVE_UPDATES['max_wait'],
+        settings.LIVE_UPDATES['max_wait'],
+    )
+    posts = []
+    if watermark.wait_past(cursor, wait):
+        posts, cursor = newer_posts(cursor, live_scope(request))
+    return JsonResponse({
+        'posts': posts, 'cursor': encode_cursor(cursor),
+    })
+
+
+def live_stream(request):
+    """Server-Sent Events; браузер сам продолжит с Last-Event-ID."""
+    cursor = decode_cursor(
+        request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after')
+    ) or watermark.current()
+    response = StreamingHttpResponse(
+        stream_events(cursor, live_scope(request)),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx не должен копить события в буфере.
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = find_post(post_id)
     comments = post.comments.all()
     form = CommentForm()
 
@@ -56,6 +215,7 @@ def post_detail(request, post_id):
 
 
 @login_required
+@ratelimit('post_create')
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -94,6 +254,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
@@ -107,12 +268,27 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = page_content(posts, request)
-    return render(request, 'posts/index.html', context)
+    posts = Post.objects.select_related('author', 'group')
+    authors = None
+    if settings.FOLLOW_GRAPH['enabled']:
+        from .graph import get_graph
+
+        authors = get_graph().following(request.user.id)
+    if authors is not None and len(authors) <= settings.FOLLOW_GRAPH[
+        'max_in'
+    ]:
+        posts = posts.filter(author_id__in=authors.tolist())
+    else:
+        posts = posts.filter(author__following__user=request.user)
+    context = {
+        'suggestions': follow_suggestions(request.user),
+    }
+    context.update(page_content(posts, request))
+    return render_feed(request, 'posts/index.html', context)
 
 
 @login_required
+@ratelimit('profile_follow', methods=('GET', 'POST'))
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user = request.user
@@ -121,13 +297,59 @@ def profile_follow(request, username):
         author=author
     )
     if not follower.exists() and user != author:
-        Follow.objects.create(
-            user=user,
-            author=author
-        )
+        with transaction.atomic():
+            Follow.objects.create(
+                user=user,
+                author=author
+            )
+        FollowSuggestion.objects.filter(user=user, author=author).delete()
     return redirect('posts:profile', username=username)
 
 
+def tagged_posts(request, links, title):
+    """Лента по таблице связей: ее индекс (тег/автор, пост) уже упорядочен."""
+    context = keyset_page(
+        links.select_related('post__author', 'post__group'),
+        request,
+        field='post_id',
+    )
+    context['items'] = [link.post for link in context['items']]
+    context['title'] = title
+    return render(request, 'posts/tagged.html', context)
+
+
+def tag_posts(request, name):
+    tag = get_object_or_404(Tag, name=name.lower())
+    return tagged_posts(request, PostTag.objects.filter(tag=tag), str(tag))
+
+
+def profile_mentions(request, username):
+    author = get_object_or_404(User, username=username)
+    return tagged_posts(
+        request,
+        Mention.objects.filter(user=author),
+        f'Упоминания @{author.username}',
+    )
+
+
+@login_required
+def notifications(request):
+    context = keyset_page(
+        request.user.notifications.select_related('post__author'), request
+    )
+    return render(request, 'posts/notifications.html', context)
+
+
+@login_required
+@require_POST
+def notifications_read(request):
+    Notification.objects.filter(
+        user=request.user, is_read=False
+    ).update(is_read=True)
+    cache.set(UNREAD_KEY.format(request.user.pk), 0, unread_timeout())
+    return redirect('posts:notifications')
+
+
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
@@ -137,8 +359,9 @@ def profile_unfollow(request, username):
         author=author
     )
     if follower.exists() and user != author:
-        Follow.objects.filter(
-            user=user,
-            author=author
-        ).delete()
+        with transaction.atomic():
+            Follow.objects.filter(
+                user=user,
+                author=author
+            ).delete()
     return redirect('posts:profile', username=username)
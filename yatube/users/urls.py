@@ -7,6 +7,8 @@ from django.contrib.auth.views import (LoginView, LogoutView,
                                        PasswordResetView)
 from django.urls import path
 
+from core.ratelimit import ratelimit
+
 from . import views
 
 app_name = 'users'
@@ -21,12 +23,14 @@ urlpatterns = [
     ),
     path(
         'signup/',
-        views.SignUp.as_view(),
+        ratelimit('signup')(views.SignUp.as_view()),
         name='signup'
     ),
     path(
         'login/',
-        LoginView.as_view(template_name='users/login.html'),
+        ratelimit('login')(
+            LoginView.as_view(template_name='users/login.html')
+        ),
         name='login'
     ),
     path(
@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -44,10 +45,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
+    'core.middleware.SlowQueryMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.auth.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -66,6 +69,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.notifications',
             ],
         },
     },
@@ -129,17 +133,169 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+
+# collectstatic добавляет к именам хеш и кладет рядом .gz/.br копии.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+# Файлы, из которых при сборке удаляются правила с неиспользуемыми
+# в шаблонах классами, например ['css/bootstrap.min.css'].
+STATIC_PRUNE_CSS = []
+
+# Раздавать STATIC_ROOT из yatube/wsgi.py (если нет фронтового сервера).
+WSGI_SERVE_STATIC = not DEBUG
+
 EMPTY = '-пусто-'
 
 POSTS_COUNT = 10
 
+# Рейтинг /trending/ (manage.py update_trending): окно кандидатов,
+# период полураспада оценки, веса признаков и размер рейтинга.
+TRENDING = {
+    'window_days': 7,
+    'half_life_hours': 24,
+    'comment_weight': 1.0,
+    'follower_weight': 0.5,
+    'top': 100,
+}
+
+# Рекомендации авторов (manage.py update_follow_suggestions).
+# chunk_size ограничивает память расчета и длину списков IN в SQLite.
+FOLLOW_SUGGESTIONS = {
+    'count': 5,
+    'chunk_size': 500,
+    'friends_weight': 1.0,
+    'cofollow_weight': 1.0,
+    'popular_limit': 10000,
+}
+
+# Кеш каталога групп сбрасывается сигналами, таймаут — страховка.
+# Без общего кеша (CACHE_SHARED) сброс виден только своему процессу,
+# и каталог живет не дольше LOCAL_TIMEOUT, как главная под cache_page.
+GROUP_DIRECTORY_CACHE_TIMEOUT = 60 * 60
+GROUP_DIRECTORY_LOCAL_TIMEOUT = 20
+
+# Отдавать ленты групп, авторов и подписок потоком (см. posts.utils).
+# Кеш страниц с потоковыми ответами не работает, поэтому главная
+# страница под cache_page всегда рендерится целиком.
+FEED_STREAMING = os.getenv('FEED_STREAMING', '0') == '1'
+
+# Граф подписок в памяти процесса (posts.graph). Снимок пишет
+# manage.py follow_graph snapshot; запускать чаще, чем живет журнал
+# изменений в кеше (log_timeout), иначе воркеры читают posts_follow.
+# Журнал должен лежать в общем для воркеров кеше: без CACHE_SHARED
+# с включенным графом приложение не запустится.
+FOLLOW_GRAPH = {
+    'enabled': os.getenv('FOLLOW_GRAPH', '0') == '1',
+    'snapshot': os.path.join(BASE_DIR, 'follow_graph.bin'),
+    'log_timeout': 24 * 60 * 60,
+    'max_overlay': 10000,
+    # Лента подписок через IN по id авторов, а не JOIN, до этого числа.
+    'max_in': 500,
+}
+
+# RSS/Atom (posts.feeds): число записей и время жизни меток и XML в кеше.
+# Метку обновляет процесс, сохранивший пост; без общего кеша
+# (CACHE_SHARED) другие воркеры узнают о нем через LOCAL_TIMEOUT.
+FEED_ITEMS = 20
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
+FEED_LOCAL_CACHE_TIMEOUT = 30
+
+# Карта сайта (manage.py generate_sitemaps). В проде nginx отдает
+# /sitemap*.xml(.gz) прямо из SITEMAP_ROOT.
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000')
+SITEMAP_ROOT = os.path.join(BASE_DIR, 'sitemaps')
+SITEMAP_LIMIT = 50000
+
+# Уведомления о новых постах: подписчики обходятся пачками по chunk_size
+# (posts.tasks), счетчик непрочитанных живет в кеше cache_timeout секунд.
+# Рассылка сбрасывает его из run_workers, и без общего кеша (CACHE_SHARED)
+# сброс до сайта не доходит: тогда счетчик живет local_cache_timeout.
+NOTIFICATIONS = {
+    'chunk_size': 1000,
+    'cache_timeout': 60 * 60,
+    'local_cache_timeout': 5,
+}
+
+# Живая лента (posts.live): long-poll ждет не дольше max_wait секунд,
+# SSE-соединение живет stream_duration секунд с пингом раз в heartbeat;
+# посты из других процессов видны с задержкой до refresh секунд.
+LIVE_UPDATES = {
+    'max_wait': 30,
+    'max_posts': 50,
+    'refresh': 1,
+    'heartbeat': 15,
+    'stream_duration': 5 * 60,
+    'retry': 3,
+}
+
+# Архив старых постов (manage.py archive_posts): посты старше
+# older_than_days дней переносятся пачками по chunk_size.
+ARCHIVE = {
+    'older_than_days': 2 * 365,
+    'chunk_size': 500,
+}
+
+# Сколько секунд кешируется гистограмма месяцев архива по датам;
+# сигналы Post сбрасывают ее раньше, но без общего кеша (CACHE_SHARED)
+# только в своем процессе: там она живет LOCAL_TIMEOUT.
+MONTH_ARCHIVE_CACHE_TIMEOUT = 24 * 60 * 60
+MONTH_ARCHIVE_LOCAL_TIMEOUT = 30
+
+# Размер пачки строк при выгрузке данных пользователя (posts.export).
+EXPORT_CHUNK_SIZE = 2000
+
+# Лимиты частоты пишущих запросов (core.ratelimit): 'число/период'.
+# Без общего кеша (CACHE_SHARED) лимит считается в каждом процессе
+# отдельно, то есть на воркер, а не на сайт.
+RATE_LIMITS = {
+    'post_create': '30/h',
+    'add_comment': '60/h',
+    'profile_follow': '120/h',
+    'signup': '10/h',
+    'login': '20/m',
+}
+# Заголовок с IP клиента; за nginx — 'HTTP_X_REAL_IP'.
+RATE_LIMIT_IP_HEADER = 'REMOTE_ADDR'
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
 
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма из view ложатся в очередь в базе (core.mail), отправляет их
+# manage.py send_emails.
+EMAIL_BACKEND = 'core.mail.OutboxBackend'
+
+# Очередь писем: backend — чем отправлять на самом деле, lease — на сколько
+# секунд письмо откладывается, пока его отправляют, задержки — в секундах.
+EMAIL_OUTBOX = {
+    'backend': os.getenv(
+        'EMAIL_DELIVERY_BACKEND',
+        'django.core.mail.backends.filebased.EmailBackend',
+    ),
+    'batch_size': 100,
+    'max_attempts': 6,
+    'retry_delay': 60,
+    'max_retry_delay': 60 * 60,
+    'lease': 5 * 60,
+}
+
+# Очередь задач (jobs.queue): сколько задач обработчик берет за раз,
+# на сколько секунд (visibility_timeout), как часто проверяет очередь.
+JOBS = {
+    'batch_size': 10,
+    'max_attempts': 5,
+    'retry_delay': 30,
+    'max_retry_delay': 60 * 60,
+    'visibility_timeout': 5 * 60,
+    'poll_interval': 1,
+}
+
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
@@ -149,9 +305,83 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-CACHES = {
-    'default': {
+# Как отдавать MEDIA_ROOT без DEBUG: 'wsgi' — из yatube/wsgi.py,
+# 'x-accel' (nginx) или 'x-sendfile' (Apache, lighttpd) — через фронтовой
+# сервер, которому приложение только сообщает путь к файлу.
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', 'wsgi')
+
+# internal-location в nginx, смотрящий в MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Имена загрузок и миниатюр sorl не переиспользуются.
+MEDIA_CACHE_CONTROL = 'public, max-age=2592000'
+
+# Адрес memcached (host:port), общего для всех воркеров; клиент —
+# python-memcached из requirements.txt. Без него у каждого процесса
+# свой LocMemCache.
+CACHE_LOCATION = os.getenv('CACHE_LOCATION')
+
+
+def cache_backend(prefix):
+    if CACHE_LOCATION:
+        return {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': CACHE_LOCATION,
+            'KEY_PREFIX': prefix,
+        }
+    return {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'KEY_PREFIX': 'index_page',
+        'LOCATION': prefix,
+        'KEY_PREFIX': prefix,
     }
+
+
+CACHES = {
+    'default': cache_backend('index_page'),
+    # Без общего кеша сессия, удаленная в одном воркере, жива в кеше
+    # другого.
+    'sessions': cache_backend('sessions'),
+}
+
+# Кеш виден всем процессам сайта: memcached или единственный процесс
+# (runserver, CACHE_SHARED=1). Только тогда в нем живут записи, которые
+# один воркер сбрасывает для всех: request.user (core.auth), курсор
+# новых постов (posts.live), каталог групп надолго (posts.utils).
+CACHE_SHARED = bool(CACHE_LOCATION) or os.getenv('CACHE_SHARED') == '1'
+
+# С общим кешем сессии читаются из него, в базу пишутся только при
+# изменении (SESSION_SAVE_EVERY_REQUEST = False). В кеше процесса выход
+# в одном воркере не виден другим, поэтому без CACHE_SHARED — только
+# база. Просроченные сессии удаляет manage.py purge_sessions.
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', (
+    'django.contrib.sessions.backends.cached_db' if CACHE_SHARED
+    else 'django.contrib.sessions.backends.db'
+))
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Сколько секунд request.user живет в кеше (core.auth), если
+# CACHE_SHARED; запись сбрасывается и при сохранении пользователя.
+AUTH_USER_CACHE_TIMEOUT = 15 * 60
+
+# Запросы дольше порога (в миллисекундах) попадают в журнал,
+# отчет: python manage.py slow_queries
+SLOW_QUERY_THRESHOLD = int(os.getenv('SLOW_QUERY_THRESHOLD', 100))
+
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'logs', 'slow_queries.log')
+
+# Прогрев в yatube/wsgi.py: URLconf, шаблоны, переводы.
+WSGI_WARMUP = os.getenv('WSGI_WARMUP', '1') == '1'
+
+# Модули, нужные только при загрузке картинок и создании миниатюр,
+# и NumPy графа подписок, трендов и рекомендаций; manage.py
+# startup_time предупредит, если они попадут в импорт при старте.
+LAZY_MODULES = ['PIL.Image', 'sorl.thumbnail.engines.pil_engine', 'numpy']
+
+# Сжатие ответов: минимальный размер (байт) и уровни gzip (1-9)
+# и brotli (0-11) по типу содержимого. Прочие типы не сжимаются.
+COMPRESSION = {
+    'text/html': {'min_size': 200, 'gzip': 6, 'br': 5},
+    'application/json': {'min_size': 200, 'gzip': 6, 'br': 5},
+    'application/xml': {'min_size': 200, 'gzip': 6, 'br': 5},
+    'text/plain': {'min_size': 200, 'gzip': 6, 'br': 5},
 }
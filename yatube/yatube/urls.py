@@ -1,7 +1,9 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
+
+from core.views import media, sitemap
 
 handler404 = 'core.views.page_not_found'
 handler403 = 'core.views.permission_denied'
@@ -13,9 +15,22 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('', include('posts.urls', namespace='posts')),
+    re_path(
+        r'^(?P<path>sitemap[\w-]*\.xml(?:\.gz)?)$',
+        sitemap,
+        name='sitemap',
+    ),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
     )
+elif settings.MEDIA_SERVE_MODE in ('x-accel', 'x-sendfile'):
+    urlpatterns += [
+        re_path(
+            r'^{}(?P<path>.*)$'.format(settings.MEDIA_URL.lstrip('/')),
+            media,
+            name='media',
+        ),
+    ]
@@ -9,8 +9,25 @@ https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.WSGI_SERVE_STATIC:
+    from core.static import StaticFilesApplication
+
+    application = StaticFilesApplication(application)
+
+if settings.MEDIA_SERVE_MODE == 'wsgi':
+    from core.media import MediaFilesApplication
+
+    application = MediaFilesApplication(application)
+
+# С gunicorn --preload прогрев выполняется один раз в мастере до fork-а.
+if settings.WSGI_WARMUP:
+    from core.warmup import warmup
+
+    warmup()